@@ -6,13 +6,152 @@
 """
 Common base class for scripts with configurable logging
 """
+import atexit
 import os
 import sys
+import threading
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, TextIO
 
 from sys_toolkit.logger import Logger
 
+DEFAULT_OUTPUT_BUFFER_SIZE = 2**16
+
+
+class ConsoleOutputBuffer:
+    """
+    Buffer for console output written to sys.stdout or sys.stderr
+
+    The stream is looked up from sys module by name when the buffer is flushed, so
+    replacing the stream object is supported. Buffered output is flushed when the
+    buffer size exceeds size, after each newline if the stream is a TTY and when the
+    interpreter exits.
+    """
+    def __init__(self, name: str, size: int = DEFAULT_OUTPUT_BUFFER_SIZE) -> None:
+        self.name = name
+        self.size = size
+        self.__parts__: List[str] = []
+        self.__length__ = 0
+        self.__lock__ = threading.Lock()
+        self.__tty_stream__ = None
+        self.__tty__ = False
+
+    def __repr__(self) -> str:
+        return self.name
+
+    @property
+    def stream(self) -> TextIO:
+        """
+        Stream the output is written to
+        """
+        return getattr(sys, self.name)
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of characters waiting in the buffer
+        """
+        return self.__length__
+
+    def __is_tty__(self, stream: TextIO) -> bool:
+        """
+        Check if stream is a TTY, caching the result for the stream object
+        """
+        if stream is not self.__tty_stream__:
+            try:
+                self.__tty__ = stream.isatty()
+            except (AttributeError, ValueError):
+                self.__tty__ = False
+            self.__tty_stream__ = stream
+        return self.__tty__
+
+    def __flush__(self, stream: TextIO) -> None:
+        """
+        Write buffered output to stream
+
+        Must be called with the buffer lock held
+        """
+        if self.__parts__:
+            stream.write(''.join(self.__parts__))
+            self.__parts__ = []
+            self.__length__ = 0
+        stream.flush()
+
+    def write(self, data: str) -> None:
+        """
+        Add data to the buffer, flushing it if necessary
+        """
+        with self.__lock__:
+            self.__parts__.append(data)
+            self.__length__ += len(data)
+            stream = self.stream
+            if self.__length__ >= self.size or (data[-1:] == '\n' and self.__is_tty__(stream)):
+                self.__flush__(stream)
+
+    def flush(self) -> None:
+        """
+        Write all buffered output to the stream
+        """
+        with self.__lock__:
+            if self.__parts__:
+                self.__flush__(self.stream)
+
+
+CONSOLE_OUTPUT_BUFFERS = {
+    'stdout': ConsoleOutputBuffer('stdout'),
+    'stderr': ConsoleOutputBuffer('stderr'),
+}
+
+
+def flush_console_output() -> None:
+    """
+    Flush buffered console output of all streams
+    """
+    for buffer in CONSOLE_OUTPUT_BUFFERS.values():
+        buffer.flush()
+
+
+atexit.register(flush_console_output)
+
+ENVIRONMENT_FLAGS: Dict[str, Any] = {}
+LOGGERS: Dict[Optional[str], Logger] = {}
+
+
+def get_environment_flag(name: str) -> Any:
+    """
+    Return value of environment variable flag, or False if it's not set
+
+    Environment variables are read once per process. Call refresh_environment_flags()
+    after changing the flags in environment.
+    """
+    try:
+        return ENVIRONMENT_FLAGS[name]
+    except KeyError:
+        value = os.environ.get(name, False)
+        ENVIRONMENT_FLAGS[name] = value
+        return value
+
+
+def refresh_environment_flags() -> None:
+    """
+    Read environment variable flags again when they are next accessed
+
+    Only objects created after this call see the new values.
+    """
+    ENVIRONMENT_FLAGS.clear()
+
+
+def get_logger(name: Optional[str] = None) -> Logger:
+    """
+    Return Logger for logger group name, shared by all callers
+    """
+    try:
+        return LOGGERS[name]
+    except KeyError:
+        logger = Logger(name)
+        LOGGERS[name] = logger
+        return logger
+
 
 class LoggingBaseClass:
     """
@@ -20,20 +159,44 @@ class LoggingBaseClass:
     """
     __debug_enabled__: bool
     __silent__: bool
+    __buffered__: bool
+    __logger_name__: Optional[str] = None
+    __logger__: Optional[Logger] = None
     __env_vars__: Dict = {
         'debug_enabled': 'DEBUG',
         'silent': 'SILENT',
+        'buffered': 'BUFFERED_OUTPUT',
     }
 
     def __init__(self,
                  debug_enabled: bool = False,
                  silent: bool = False,
-                 logger: Optional[str] = None):
-        self.__debug_enabled__ = debug_enabled or os.environ.get(self.__env_vars__['debug_enabled'], False)
-        self.__silent__ = silent or os.environ.get(self.__env_vars__['silent'], False)
+                 logger: Optional[str] = None,
+                 buffered: bool = False):
+        self.__debug_enabled__ = debug_enabled or get_environment_flag(self.__env_vars__['debug_enabled'])
+        self.__silent__ = silent or get_environment_flag(self.__env_vars__['silent'])
+        self.__buffered__ = buffered or get_environment_flag(self.__env_vars__['buffered'])
+        if logger is not None and logger != self.__logger_name__:
+            self.__logger_name__ = logger
 
-        # Generic logging class for compatibility
-        self.logger = Logger(logger)
+    @property
+    def logger(self) -> Logger:
+        """
+        Generic logging class for compatibility
+
+        The Logger is created when it's first accessed and shared by all objects with
+        the same logger name.
+        """
+        if self.__logger__ is None:
+            self.__logger__ = get_logger(self.__logger_name__)
+        return self.__logger__
+
+    @logger.setter
+    def logger(self, value: Logger) -> None:
+        """
+        Set Logger of the object
+        """
+        self.__logger__ = value
 
     @property
     def __is_debug_enabled__(self) -> bool:
@@ -49,6 +212,13 @@ class LoggingBaseClass:
         """
         return self.__silent__
 
+    @property
+    def __is_buffered__(self) -> bool:
+        """
+        Check if console output is buffered
+        """
+        return self.__buffered__
+
     @staticmethod
     def __parse_string_args__(*args: List[Any]) -> str:
         """
@@ -65,12 +235,35 @@ class LoggingBaseClass:
             return
         self.error(*args)
 
+    def __write__(self, name: str, output: str) -> None:
+        """
+        Write output to sys.stdout or sys.stderr by name
+
+        Pending buffered output is flushed first to keep the order of messages. Without
+        buffering the output is written and flushed immediately.
+        """
+        buffered = self.__is_buffered__
+        for buffer in CONSOLE_OUTPUT_BUFFERS.values():
+            if buffer.pending and (buffer.name != name or not buffered):
+                buffer.flush()
+        if buffered:
+            CONSOLE_OUTPUT_BUFFERS[name].write(output)
+        else:
+            stream = getattr(sys, name)
+            stream.write(output)
+            stream.flush()
+
+    def flush_output(self) -> None:
+        """
+        Flush buffered console output
+        """
+        flush_console_output()
+
     def error(self, *args: List[Any]) -> None:
         """
         Send error message to stderr
         """
-        sys.stderr.write(f'{self.__parse_string_args__(*args)}\n')
-        sys.stderr.flush()
+        self.__write__('stderr', f'{self.__parse_string_args__(*args)}\n')
 
     def message(self, *args: List[Any]) -> None:
         """
@@ -78,5 +271,14 @@ class LoggingBaseClass:
         """
         if self.__is_silent__:
             return
-        sys.stdout.write(f'{self.__parse_string_args__(*args)}\n')
-        sys.stdout.flush()
+        self.__write__('stdout', f'{self.__parse_string_args__(*args)}\n')
+
+    def messages(self, messages: Iterable[Any]) -> None:
+        """
+        Show messages to stdout as lines with a single write unless silent flag is set
+        """
+        if self.__is_silent__:
+            return
+        output = ''.join(f'{self.__parse_string_args__(message)}\n' for message in messages)
+        if output:
+            self.__write__('stdout', output)
@@ -6,11 +6,12 @@
 """
 Loaders for ini, json and yaml format configuration files
 """
+import inspect
 import os
 import re
 
 from pathlib import Path
-from typing import Any, Iterator, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from sys_toolkit.logger import DEFAULT_TARGET_NAME
 
@@ -20,6 +21,100 @@ from ..exceptions import ConfigurationError
 # Pattern to validate configuration keys
 RE_CONFIGURATIION_KEY = re.compile('^[a-zA-Z0-9_]+$')
 
+# Class attributes defining the configuration schema of a container
+CONFIGURATION_SCHEMA_ATTRIBUTES = frozenset((
+    '__float_settings__',
+    '__integer_settings__',
+    '__path_settings__',
+    '__default_settings__',
+    '__required_settings__',
+    '__environment_variables__',
+    '__section_loaders__',
+    '__key_attribute_map__',
+))
+# Maximum number of attribute names and keys cached in a configuration schema
+CONFIGURATION_SCHEMA_CACHE_SIZE = 1024
+
+
+def expand_path(value: Any) -> Path:
+    """
+    Convert value to pathlib.Path with user home directory expanded
+    """
+    return Path(value).expanduser()
+
+
+def get_class_callbacks(cls: type, prefix: str) -> Dict[str, Any]:
+    """
+    Return callable class attributes with name prefix by name without the prefix
+
+    Values are the attributes as stored in the class, to be bound to instances with
+    their __get__ method.
+    """
+    callbacks = {}
+    for name in dir(cls):
+        if not name.startswith(prefix) or len(name) == len(prefix) or not callable(getattr(cls, name, None)):
+            continue
+        callback = inspect.getattr_static(cls, name)
+        if not hasattr(callback, '__get__'):
+            callback = staticmethod(callback)
+        callbacks[name[len(prefix):]] = callback
+    return callbacks
+
+
+class ConfigurationSchema:
+    """
+    Settings, key maps and callbacks of a configuration container class
+
+    The schema is compiled when the class is first instantiated and shared by all
+    instances of the class. The class attributes listed in CONFIGURATION_SCHEMA_ATTRIBUTES
+    the schema was compiled from are stored in sources. Containers compile a schema of
+    their own if these attributes are replaced, for example by setting them on the
+    instance. Changing the attribute values in place is not detected.
+
+    Validated attribute names and key paths are cached up to CONFIGURATION_SCHEMA_CACHE_SIZE
+    entries each. Validators and formatters are collected from the class, callbacks set
+    on instances are looked up by the containers.
+    """
+    def __init__(self, container: 'ConfigurationItemContainer') -> None:
+        self.sources = {name: getattr(container, name, None) for name in CONFIGURATION_SCHEMA_ATTRIBUTES}
+        self.float_settings = self.sources['__float_settings__']
+        self.integer_settings = self.sources['__integer_settings__']
+        self.path_settings = self.sources['__path_settings__']
+        self.key_attribute_source = self.sources['__key_attribute_map__']
+
+        self.converters: Dict[str, Callable] = {}
+        for attr in container.__path_settings__:
+            self.converters[attr] = expand_path
+        for attr in container.__integer_settings__:
+            self.converters[attr] = int
+        for attr in container.__float_settings__:
+            self.converters[attr] = float
+        self.validators = get_class_callbacks(type(container), 'validate_')
+        self.formatters = get_class_callbacks(type(container), 'format_')
+
+        key_attribute_map = self.key_attribute_source or {}
+        self.key_attribute_map = dict(key_attribute_map)
+        self.attribute_key_map = {}
+        for key, attr in key_attribute_map.items():
+            self.attribute_key_map.setdefault(attr, key)
+
+        self.section_loaders = {}
+        for loader in getattr(container, '__section_loaders__', ()):
+            name = getattr(loader, '__name__', None)
+            self.section_loaders.setdefault(self.key_attribute_map.get(name, name), loader)
+
+        detect_valid_settings = getattr(container, '__detect_valid_settings__', None)
+        self.valid_settings = detect_valid_settings() if detect_valid_settings is not None else []
+        self.valid_attributes = set()
+        self.attribute_paths: Dict[Any, Tuple[str, str]] = {}
+
+    def is_current(self, container: 'ConfigurationItemContainer') -> bool:
+        """
+        Check if schema was compiled from current schema attributes of container
+        """
+        sources = self.sources
+        return all(getattr(container, name, None) is value for name, value in sources.items())
+
 
 class ConfigurationItemContainer(LoggingBaseClass):
     """
@@ -35,16 +130,78 @@ class ConfigurationItemContainer(LoggingBaseClass):
     """Tuple of settings loaded as integers"""
     __path_settings__: Tuple[str] = ()
     """Tuple of settings loaded as pathlib.Path"""
+    __compact_storage__: bool = False
+    """Store settings in a dictionary instead of attributes, see CompactConfigurationSection"""
+    __logger_name__: str = DEFAULT_TARGET_NAME
+
+    __storage__: Optional[Dict[str, Any]] = None
+    __attributes__: List[str] = ()
 
     def __init__(self,
                  parent: Optional[LoggingBaseClass] = None,
                  debug_enabled: bool = False,
                  silent: bool = False,
                  logger: str = DEFAULT_TARGET_NAME) -> None:
-        self.__attributes__ = []
+        self.__schema__ = self.__get_schema__()
+        if self.__compact_storage__:
+            self.__storage__ = {}
+        else:
+            self.__attributes__ = []
         self.__parent__ = parent
         super().__init__(debug_enabled, silent, logger)
 
+    def __has_setting__(self, attr: str) -> bool:
+        """
+        Check if setting exists
+        """
+        storage = self.__storage__
+        if storage is not None:
+            return attr in storage
+        return hasattr(self, attr)
+
+    def __get_setting__(self, attr: str, default: Any = None) -> Any:
+        """
+        Return value of setting or default value
+        """
+        storage = self.__storage__
+        if storage is not None:
+            return storage.get(attr, default)
+        return getattr(self, attr, default)
+
+    def __store_setting__(self, attr: str, value: Any) -> None:
+        """
+        Store value of setting to compact storage or as attribute
+        """
+        storage = self.__storage__
+        if storage is not None:
+            storage[attr] = value
+        else:
+            setattr(self, attr, value)
+            self.__attributes__.append(attr)
+
+    def __get_schema__(self) -> ConfigurationSchema:
+        """
+        Return schema of the class, compiling it on first call
+
+        The class schema is compiled again if schema attributes of the class have been
+        replaced. A schema of its own is compiled if the container has replaced schema
+        attributes.
+        """
+        cls = type(self)
+        schema = cls.__dict__.get('__configuration_schema__', None)
+        if schema is None or not schema.is_current(self):
+            schema = ConfigurationSchema(self)
+            if all(schema.sources[name] is getattr(cls, name, None) for name in CONFIGURATION_SCHEMA_ATTRIBUTES):
+                cls.__configuration_schema__ = schema
+        return schema
+
+    def __update_schema__(self) -> ConfigurationSchema:
+        """
+        Compile schema from replaced schema attributes of the container
+        """
+        self.__schema__ = self.__get_schema__()
+        return self.__schema__
+
     @property
     def __config_root__(self) -> LoggingBaseClass:
         """
@@ -100,28 +257,59 @@ class ConfigurationItemContainer(LoggingBaseClass):
         if not RE_CONFIGURATIION_KEY.match(attr):
             raise ConfigurationError(f'Invalid attribute name: {attr}')
 
+    def __check_attribute__(self, attr) -> None:
+        """
+        Validate attribute to be set, skipping attributes already validated for the schema
+        """
+        valid_attributes = self.__schema__.valid_attributes
+        if attr not in valid_attributes:
+            self.__validate_attribute__(attr)
+            if len(valid_attributes) < CONFIGURATION_SCHEMA_CACHE_SIZE:
+                valid_attributes.add(attr)
+
+    def __get_instance_callback__(self, name: str) -> Optional[Callable]:
+        """
+        Return callback set on the instance with name, if any
+        """
+        attributes = getattr(self, '__dict__', None)
+        if attributes:
+            callback = attributes.get(name, None)
+            if callable(callback):
+                return callback
+        return None
+
     def __format_attribute_value__(self, attr: str, value: Any) -> Any:
         """
         Format an attribute's value by attribute name
         """
-        if attr in self.__float_settings__:
-            return float(value)
-        if attr in self.__integer_settings__:
-            return int(value)
-        if attr in self.__path_settings__:
-            return Path(value).expanduser()
-
-        validator_callback = getattr(self, f'validate_{attr}', None)
-        if callable(validator_callback):
+        schema = self.__schema__
+        if self.__float_settings__ is not schema.float_settings or \
+                self.__integer_settings__ is not schema.integer_settings or \
+                self.__path_settings__ is not schema.path_settings:
+            schema = self.__update_schema__()
+        converter = schema.converters.get(attr, None)
+        if converter is not None:
+            return converter(value)
+
+        validator_callback = self.__get_instance_callback__(f'validate_{attr}')
+        if validator_callback is None:
+            validator_callback = schema.validators.get(attr, None)
+            if validator_callback is not None:
+                validator_callback = validator_callback.__get__(self, type(self))
+        if validator_callback is not None:
             try:
-                value = validator_callback(value)  # pylint: disable=not-callable
+                value = validator_callback(value)
             except Exception as error:
                 raise ConfigurationError(f'Error validating setting {attr}: {error}') from error
 
-        formatter_callback = getattr(self, f'format_{attr}', None)
+        formatter_callback = self.__get_instance_callback__(f'format_{attr}')
+        if formatter_callback is None:
+            formatter_callback = schema.formatters.get(attr, None)
+            if formatter_callback is not None:
+                formatter_callback = formatter_callback.__get__(self, type(self))
         try:
-            if callable(formatter_callback):
-                value = formatter_callback(value)  # pylint: disable=not-callable
+            if formatter_callback is not None:
+                value = formatter_callback(value)
             else:
                 value = self.default_formatter(value)
         except Exception as error:
@@ -133,6 +321,12 @@ class ConfigurationItemContainer(LoggingBaseClass):
         """
         Return VS code configuration section as dictionary
         """
+        storage = self.__storage__
+        if storage is not None:
+            return {
+                attribute: item.as_dict() if hasattr(item, 'as_dict') else item
+                for attribute, item in storage.items()
+            }
         data = {}
         for attribute in self.__attributes__:
             item = getattr(self, attribute)
@@ -146,30 +340,27 @@ class ConfigurationItemContainer(LoggingBaseClass):
         """
         Load item with correct class
         """
-        self.__validate_attribute__(attr)
+        self.__check_attribute__(attr)
 
-        section = getattr(self, attr, None)
+        section = self.__get_setting__(attr)
         if section is not None and callable(getattr(section, 'set', None)):
             section.set(attr, value)
             return
 
         if isinstance(value, dict):
             item = self.__dict_loader__(value, parent=self)  # pylint: disable=not-callable
-            setattr(self, attr, item)
-            self.__attributes__.append(attr)
+            self.__store_setting__(attr, item)
             return
 
         if isinstance(value, (list, tuple)):
             item = self.__list_loader__(attr, value, parent=self)  # pylint: disable=not-callable
-            setattr(self, item.__setting__, item)
-            self.__attributes__.append(item.__setting__)
+            self.__store_setting__(item.__setting__, item)
             return
 
         if value is not None:
             value = self.__format_attribute_value__(attr, value)
 
-        setattr(self, attr, value)
-        self.__attributes__.append(attr)
+        self.__store_setting__(attr, value)
 
 
 class ConfigurationList(ConfigurationItemContainer):
@@ -267,6 +458,8 @@ class ConfigurationSection(ConfigurationItemContainer):
     __key_attribute_map__: dict = {}
     """Map configuration keys to python compatible attributes"""
 
+    __subsections__: List['ConfigurationSection'] = ()
+
     def __init__(self,
                  data: dict = dict,
                  parent: ConfigurationItemContainer = None,
@@ -280,9 +473,9 @@ class ConfigurationSection(ConfigurationItemContainer):
             silent=silent,
         )
 
-        self.__subsections__ = []
+        if self.__storage__ is None:
+            self.__subsections__ = []
 
-        self.__valid_settings__ = self.__detect_valid_settings__()
         for attr in self.__valid_settings__:
             self.set(attr, None)
 
@@ -297,7 +490,15 @@ class ConfigurationSection(ConfigurationItemContainer):
             self.validate()
 
     def __repr__(self) -> str:
-        return self.__name__ if self.__name__ is not None else ''
+        name = getattr(self, '__name__', None)
+        return name if name is not None else ''
+
+    @property
+    def __valid_settings__(self) -> List[str]:
+        """
+        Return settings detected from the class schema
+        """
+        return self.__schema__.valid_settings
 
     def __initialize_sub_sections__(self) -> None:
         """
@@ -313,33 +514,49 @@ class ConfigurationSection(ConfigurationItemContainer):
             name = self.__attribute_from_key__(subsection.__name__)
             if name is None:
                 raise ConfigurationError(f'Subsection class defines no name: {loader}')
-            setattr(self, name, subsection)
-            self.__attributes__.append(name)
+            self.__store_setting__(name, subsection)
 
     def __attribute_from_key__(self, key: str) -> Any:
         """
         Map settings key to python attribute
         """
-        return self.__key_attribute_map__.get(key, key)
+        return self.__get_key_schema__().key_attribute_map.get(key, key)
 
     def __key_from_attribute__(self, attr: str) -> Any:
         """
         Map settings file key from attribute
         """
-        for key, value in self.__key_attribute_map__.items():
-            if attr == value:
-                return key
-        return attr
+        return self.__get_key_schema__().attribute_key_map.get(attr, attr)
+
+    def __get_key_schema__(self) -> ConfigurationSchema:
+        """
+        Return schema, compiling it again if the key attribute map has been replaced
+        """
+        schema = self.__schema__
+        if self.__key_attribute_map__ is not schema.key_attribute_source:
+            schema = self.__update_schema__()
+        return schema
 
     def __split_attribute_path__(self, key: str) -> Tuple[str, List[str]]:
         """
         Return section attribute from key
+
+        Results are cached in the schema by key
         """
-        key = self.__attribute_from_key__(key)
-        if isinstance(key, str):
-            parts = key.split('.')
-            return parts[0], '.'.join(parts[1:])
-        return key, []
+        schema = self.__get_key_schema__()
+        try:
+            return schema.attribute_paths[key]
+        except KeyError:
+            pass
+        attr = schema.key_attribute_map.get(key, key)
+        if isinstance(attr, str):
+            parts = attr.split('.')
+            value = (parts[0], '.'.join(parts[1:]))
+        else:
+            value = (attr, [])
+        if len(schema.attribute_paths) < CONFIGURATION_SCHEMA_CACHE_SIZE:
+            schema.attribute_paths[key] = value
+        return value
 
     def __detect_valid_settings__(self) -> List[str]:
         """
@@ -385,10 +602,12 @@ class ConfigurationSection(ConfigurationItemContainer):
             raise ConfigurationError('Configuration section name not defined')
 
         section_name = self.__attribute_from_key__(section_name)
-        for loader in self.__section_loaders__:
-            loader_name = self.__attribute_from_key__(getattr(loader, '__name__', None))
-            if loader_name == section_name:
-                return loader
+        schema = self.__schema__
+        if self.__section_loaders__ is not schema.sources['__section_loaders__']:
+            schema = self.__update_schema__()
+        loader = schema.section_loaders.get(section_name, None)
+        if loader is not None:
+            return loader
         return self.__dict_loader__
 
     def __get_or_create_subsection__(
@@ -397,13 +616,22 @@ class ConfigurationSection(ConfigurationItemContainer):
             parent: Optional[LoggingBaseClass] = None) -> Any:
         if parent is None:
             parent = self
-        if not hasattr(parent, name):
+        if not parent.__has_setting__(name):
             loader = parent.__get_section_loader__(name)
             item = loader({}, parent=parent, debug_enabled=self.__debug_enabled__, silent=self.__silent__)
             item.__name__ = name
-            setattr(parent, name, item)
-            parent.__subsections__.append(item)
-        return getattr(parent, name)
+            parent.__store_subsection__(name, item)
+        return parent.__get_setting__(name)
+
+    def __store_subsection__(self, name: str, item: 'ConfigurationSection') -> None:
+        """
+        Store subsection to compact storage or as attribute
+        """
+        if self.__storage__ is not None:
+            self.__storage__[name] = item
+        else:
+            setattr(self, name, item)
+            self.__subsections__.append(item)
 
     def __init_subsection_path__(self, section_name: str, path: Path) -> Tuple[Any, str]:
         """
@@ -485,7 +713,7 @@ class ConfigurationSection(ConfigurationItemContainer):
             self.__load_section__(attr, value, path)
             return
 
-        self.__validate_attribute__(attr)
+        self.__check_attribute__(attr)
         super().set(attr, value)
 
     def validate(self) -> None:
@@ -495,6 +723,179 @@ class ConfigurationSection(ConfigurationItemContainer):
         Default implementation checks if required settings are set.
         """
         for attr in self.__required_settings__:
-            value = getattr(self, attr, None)
+            value = self.__get_setting__(attr)
             if value is None:
                 raise ConfigurationError(f'{self} required setting {attr} has no value')
+
+
+class CompactConfigurationStorage:
+    """
+    Mixin for configuration containers storing settings in a dictionary
+
+    Settings are stored in __storage__ dictionary of the object instead of instance
+    attributes and lists of attributes and subsections, and are read from the
+    dictionary with __getattr__. Settings with names of attributes of the class are
+    only available from as_dict().
+
+    Attribute access is slower for classes defining __getattr__, so the mode is
+    limited to classes inheriting this mixin. The compact classes store per-instance
+    state in __slots__, so the instances have no attribute dictionary unless other
+    attributes are set.
+    """
+    __slots__ = ()
+    __compact_storage__ = True
+
+    def __getattr__(self, attr: str) -> Any:
+        """
+        Return value of setting in compact storage
+        """
+        if attr != '__storage__':
+            storage = self.__storage__
+            if storage is not None and attr in storage:
+                return storage[attr]
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
+
+
+# Per-instance state of compact configuration containers
+COMPACT_CONTAINER_SLOTS = (
+    '__schema__',
+    '__storage__',
+    '__parent__',
+    '__debug_enabled__',
+    '__silent__',
+    '__buffered__',
+)
+
+
+class CompactConfigurationList(CompactConfigurationStorage, ConfigurationList):
+    """
+    Configuration list loading dictionaries as compact configuration sections
+    """
+    __slots__ = COMPACT_CONTAINER_SLOTS + ('__setting__', '__values__')
+
+
+class CompactConfigurationSection(CompactConfigurationStorage, ConfigurationSection):
+    """
+    Configuration section storing settings in a dictionary
+
+    Nested dictionaries and lists are loaded with compact classes by default.
+    """
+    __slots__ = COMPACT_CONTAINER_SLOTS + ('__name__',)
+
+
+CompactConfigurationList.__dict_loader_class__ = CompactConfigurationSection
+CompactConfigurationSection.__dict_loader_class__ = CompactConfigurationSection
+CompactConfigurationSection.__list_loader_class__ = CompactConfigurationList
+
+
+class LazyConfigurationLoading:
+    """
+    Mixin for configuration sections loading nested dictionaries on first access
+
+    Nested dictionaries loaded with __load_dictionary__ are kept as unprocessed data
+    and loaded as subsections, with formatting and validation of settings, when the
+    subsection is accessed or updated for the first time. Errors in unprocessed data
+    are raised on first access. Data is not copied, so dictionaries given to lazy
+    sections should not be modified afterwards.
+
+    Use validate(materialize=True) to load all unprocessed data in the tree.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        self.__pending__: Dict[str, List[dict]] = {}
+        super().__init__(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        """
+        Return subsection loaded from unprocessed data
+        """
+        pending = self.__dict__.get('__pending__', None)
+        if pending and attr in pending:
+            return self.__get_setting__(attr)
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
+
+    def __has_setting__(self, attr: str) -> bool:
+        """
+        Check if setting exists, loading unprocessed subsection data
+        """
+        if attr in self.__pending__:
+            self.__materialize__(attr)
+        return super().__has_setting__(attr)
+
+    def __get_setting__(self, attr: str, default: Any = None) -> Any:
+        """
+        Return value of setting or default value, loading unprocessed subsection data
+        """
+        if attr in self.__pending__:
+            self.__materialize__(attr)
+        return super().__get_setting__(attr, default)
+
+    def __load_section__(self, section: str, data: Any, path: Optional[str] = None) -> None:
+        """
+        Store dictionary data for subsection to be loaded on first access
+
+        Data for a subsection with unprocessed data is stored without loading the
+        subsection.
+        """
+        if path is None and isinstance(data, dict):
+            pending = self.__pending__.get(section, None)
+            if pending is not None:
+                pending.append(data)
+                return
+            if not super().__has_setting__(section):
+                self.__pending__[section] = [data]
+                return
+        super().__load_section__(section, data, path)
+
+    def __materialize__(self, name: str) -> None:
+        """
+        Load unprocessed data of a subsection in the order it was given
+        """
+        pending = self.__pending__.pop(name)
+        subsection = self.__get_or_create_subsection__(name)
+        for data in pending:
+            subsection.__load_dictionary__(data)
+
+    def __materialize_all__(self) -> None:
+        """
+        Load all unprocessed data of the section and child items
+        """
+        for name in list(self.__pending__):
+            if name in self.__pending__:
+                self.__materialize__(name)
+        items = list(self.__subsections__)
+        items.extend(self.__get_setting__(attr) for attr in self.__attributes__)
+        while items:
+            item = items.pop()
+            if isinstance(item, LazyConfigurationLoading):
+                item.__materialize_all__()
+            elif isinstance(item, ConfigurationList):
+                items.extend(item)
+
+    def as_dict(self) -> dict:
+        """
+        Return configuration section as dictionary, loading all unprocessed data
+        """
+        self.__materialize_all__()
+        return super().as_dict()
+
+    def validate(self, materialize: bool = False) -> None:
+        """
+        Validate loaded configuration settings
+
+        With materialize all unprocessed data in the tree is loaded first, raising any
+        errors in the data.
+        """
+        if materialize:
+            self.__materialize_all__()
+        super().validate()
+
+
+class LazyConfigurationSection(LazyConfigurationLoading, ConfigurationSection):
+    """
+    Configuration section loading nested dictionaries on first access
+
+    Nested dictionaries are loaded with lazy sections by default.
+    """
+
+
+LazyConfigurationSection.__dict_loader_class__ = LazyConfigurationSection
@@ -0,0 +1,151 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+On-disk cache of data parsed from configuration files
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, Union
+
+from ..exceptions import ConfigurationError
+
+# Version of cache file format, stored in cache entries
+CACHE_FORMAT_VERSION = 2
+
+CACHE_DIRECTORY_NAME = 'sys-toolkit/configuration'
+
+
+def get_default_cache_directory() -> Path:
+    """
+    Return default directory for cached configuration data in user cache directory
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME', None)
+    if not cache_home:
+        cache_home = '~/.cache'
+    return Path(cache_home, CACHE_DIRECTORY_NAME).expanduser()
+
+
+class ParsedDataCache:
+    """
+    Cache of data parsed from configuration files
+
+    Parsed data is stored with pickle in a cache file per parser namespace, parser key and
+    file path. The parser key identifies parser settings affecting the parsed data, for
+    example the parsing class, file encoding and loader. Cache entries are identified by
+    parser key, file size, modification time in nanoseconds and SHA-256 hash of the file
+    contents. Entries not matching the file are replaced when the file is parsed again.
+
+    The cache directory is created with permissions for the user only, and cache files
+    not owned by the user are ignored, because loading pickled data can execute code.
+    Cache files are written to a temporary file and renamed in place, and errors reading
+    or writing cache files only cause the file to be parsed.
+    """
+    def __init__(self, directory: Union[str, Path]) -> None:
+        self.directory = Path(directory).expanduser()
+
+    def get_cache_path(self, path: Path, namespace: str, parser_key: Tuple = ()) -> Path:
+        """
+        Return path to cache file for parsed data of path
+        """
+        key = f'{namespace}:{parser_key!r}:{path.resolve()}'.encode('utf-8')
+        return self.directory.joinpath(f'{namespace}-{hashlib.sha256(key).hexdigest()}.cache')
+
+    @staticmethod
+    def __is_trusted__(stat: os.stat_result) -> bool:
+        """
+        Check if cache file or directory is owned by the user and not writable by others
+        """
+        getuid = getattr(os, 'getuid', None)
+        if getuid is not None and stat.st_uid != getuid():
+            return False
+        return not stat.st_mode & 0o022
+
+    def __read__(self, cache_path: Path, identity: Tuple) -> Tuple[bool, Any]:
+        """
+        Read cached data matching identity from cache file
+
+        Returns tuple of boolean indicating if cached data was found and the data
+        """
+        try:
+            with cache_path.open('rb') as handle:
+                if not self.__is_trusted__(os.fstat(handle.fileno())):
+                    return False, None
+                cached_identity, data = pickle.load(handle)
+        except Exception:  # pylint: disable=broad-except
+            return False, None
+        if cached_identity != identity:
+            return False, None
+        return True, data
+
+    def __write__(self, cache_path: Path, identity: Tuple, data: Any) -> None:
+        """
+        Write parsed data to cache file atomically
+        """
+        try:
+            self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+            if not self.__is_trusted__(self.directory.stat()):
+                return
+            fd, tempfile_path = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                pickle.dump((identity, data), handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tempfile_path, cache_path)
+        except Exception:  # pylint: disable=broad-except
+            try:
+                os.unlink(tempfile_path)
+            except OSError:
+                pass
+
+    def load(self,
+             path: Path,
+             parser: Callable[[bytes], Any],
+             namespace: str,
+             parser_key: Tuple = ()) -> Any:
+        """
+        Return data parsed from file contents with parser, using cached data if the file
+        has not changed and the data was parsed with the same parser key
+        """
+        try:
+            stat = path.stat()
+            content = path.read_bytes()
+        except OSError as error:
+            raise ConfigurationError(f'Error reading {path}: {error}') from error
+
+        identity = (
+            CACHE_FORMAT_VERSION,
+            parser_key,
+            str(path.resolve()),
+            stat.st_size,
+            stat.st_mtime_ns,
+            hashlib.sha256(content).hexdigest(),
+        )
+        cache_path = self.get_cache_path(path, namespace, parser_key)
+        found, data = self.__read__(cache_path, identity)
+        if found:
+            return data
+
+        data = parser(content)
+        self.__write__(cache_path, identity, data)
+        return data
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Remove cache files, optionally only for specified parser namespace
+        """
+        if not self.directory.is_dir():
+            return
+        pattern = f'{namespace}-*.cache' if namespace is not None else '*.cache'
+        for cache_path in self.directory.glob(pattern):
+            try:
+                cache_path.unlink()
+            except OSError:
+                pass
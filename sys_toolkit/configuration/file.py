@@ -9,10 +9,11 @@ Configuration file parser base classes
 import os
 
 from pathlib import Path
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Tuple, Union
 
 from ..exceptions import ConfigurationError
 from .base import ConfigurationSection, LoggingBaseClass
+from .cache import ParsedDataCache
 
 
 class ConfigurationFile(ConfigurationSection):
@@ -20,6 +21,8 @@ class ConfigurationFile(ConfigurationSection):
     Common base class for configuration file parsers
     """
     __default_paths__ = []
+    __cache_directory__: Optional[Union[str, Path]] = None
+    """Directory for caching parsed file data, see ParsedDataCache"""
 
     def __init__(self,
                  path: Union[str, Path] = None,
@@ -56,6 +59,25 @@ class ConfigurationFile(ConfigurationSection):
             raise ConfigurationError(f'Permission denied: {path}')
         return path
 
+    def __get_parser_key__(self) -> Tuple:
+        """
+        Return key identifying settings of the class affecting parsed file data
+        """
+        cls = type(self)
+        return (f'{cls.__module__}.{cls.__qualname__}', getattr(self, 'encoding', None))
+
+    def __parse_file__(self, path: Path, parser: Callable[[bytes], Any], namespace: str) -> Any:
+        """
+        Return data parsed from file contents with parser
+
+        Parsed data is cached in __cache_directory__ by parser namespace and parser key
+        if the cache directory is defined
+        """
+        if self.__cache_directory__ is not None:
+            cache = ParsedDataCache(self.__cache_directory__)
+            return cache.load(path, parser, namespace, self.__get_parser_key__())
+        return parser(path.read_bytes())
+
     def load(self, path: Union[str, Path]) -> None:
         """
         Load specified configuration file
@@ -9,7 +9,7 @@ Loader for configuration files in json format
 import json
 
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
 from ..constants import DEFAULT_ENCODING
 from ..exceptions import ConfigurationError
@@ -26,7 +26,8 @@ class JsonConfiguration(ConfigurationFile):
     """
     Configuration parser for JSON configuration files
 
-    You can pass arguments to json.loads with loader_args
+    You can pass arguments to json.loads with loader_args. Data parsed with loader_args
+    is not cached in __cache_directory__.
     """
     encoding = DEFAULT_ENCODING
 
@@ -39,14 +40,23 @@ class JsonConfiguration(ConfigurationFile):
         self.__loader_args__ = loader_args
         super().__init__(path, parent=parent, debug_enabled=debug_enabled, silent=silent)
 
+    def __parse_json__(self, content: bytes) -> Any:
+        """
+        Parse JSON file contents
+        """
+        return json.loads(content.decode(self.encoding), **self.__loader_args__)
+
     def load(self, path: Union[str, Path]) -> None:
         """
         Load specified JSON configuration file
         """
         path = self.__check_file_access__(path)
         try:
-            with path.open('r', encoding=self.encoding) as handle:
-                self.parse_data(json.loads(handle.read(), **self.__loader_args__))
+            if self.__loader_args__:
+                data = self.__parse_json__(path.read_bytes())
+            else:
+                data = self.__parse_file__(path, self.__parse_json__, 'json')
+            self.parse_data(data)
         except Exception as error:
             raise ConfigurationError(f'Error loading {path}: {error}') from error
 
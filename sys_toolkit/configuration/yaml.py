@@ -7,10 +7,15 @@
 Loader for configuration files in yaml format
 """
 from pathlib import Path
-from typing import Union
+from typing import Any, Tuple, Union
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as YamlSafeLoader
+
 from ..constants import DEFAULT_ENCODING
 from ..exceptions import ConfigurationError
 from .directory import ConfigurationFileDirectory
@@ -27,6 +32,21 @@ class YamlConfiguration(ConfigurationFile):
     Configuration parser for yaml configuration files
     """
     encoding = DEFAULT_ENCODING
+    __yaml_loader__ = YamlSafeLoader
+    """Safe YAML loader class, libyaml based yaml.CSafeLoader when available"""
+
+    def __get_parser_key__(self) -> Tuple:
+        """
+        Return key identifying settings of the class affecting parsed file data
+        """
+        loader = self.__yaml_loader__
+        return super().__get_parser_key__() + (f'{loader.__module__}.{loader.__qualname__}',)
+
+    def __parse_yaml__(self, content: bytes) -> Any:
+        """
+        Parse YAML file contents
+        """
+        return yaml.load(content.decode(self.encoding), Loader=self.__yaml_loader__)
 
     def load(self, path: Union[str, Path]) -> None:
         """
@@ -35,8 +55,7 @@ class YamlConfiguration(ConfigurationFile):
         path = self.__check_file_access__(path)
 
         try:
-            with path.open('r', encoding=self.encoding) as handle:
-                self.parse_data(yaml.safe_load(handle))
+            self.parse_data(self.__parse_file__(path, self.__parse_yaml__, 'yaml'))
         except Exception as error:
             raise ConfigurationError(f'Error loading {path}: {error}') from error
 
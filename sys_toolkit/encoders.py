@@ -65,6 +65,21 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+class YamlDataDumper(yaml.Dumper):
+    """
+    Yaml data dumper implementation with parameters overridden for
+    forced indentation
+
+    The libyaml based yaml.CDumper can't be used, because the libyaml emitter does not
+    support overriding indentation of sequences in mappings.
+    """
+    def increase_indent(self, flow: bool = False, indentless: bool = False) -> Any:
+        """
+        AIgnore 'indentless' flag and always indent dumped data
+        """
+        return super().increase_indent(flow, False)
+
+
 def yaml_dump(data):
     """
     Call yaml.dump with dumper enforcing indentation and with explicit start
@@ -72,17 +87,6 @@ def yaml_dump(data):
 
     This function generates yaml output that is compatible with yamlllint
     """
-    class YamlDataDumper(yaml.Dumper):
-        """
-        Yaml data dumper implementation with parameters overridden for
-        forced indentation
-        """
-        def increase_indent(self, flow: bool = False, indentless: bool = False) -> Any:
-            """
-            AIgnore 'indentless' flag and always indent dumped data
-            """
-            return super().increase_indent(flow, False)
-
     return yaml.dump(
         data,
         Dumper=YamlDataDumper,
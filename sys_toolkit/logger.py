@@ -11,18 +11,43 @@ handler name. Any registered log targets are available to all instances of the
 logger group.
 """
 
+import atexit
+import copy
 import fnmatch
 import logging
 import logging.handlers
+import os
+import queue
+import subprocess
 import sys
+import threading
 
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 from .exceptions import LoggerError
+from .logs.central import CentralFileHandler, LOG_WRITER_SOCKET_ENV, start_log_writer
+from .logs.formatters import CachedTimeFormatter, JSONFormatter
+from .logs.http import (
+    BatchHTTPHandler,
+    DEFAULT_HTTP_BATCH_LATENCY,
+    DEFAULT_HTTP_BATCH_SIZE,
+)
+from .logs.ring import (
+    DEFAULT_RING_BUFFER_SIZE,
+    DEFAULT_RING_BUFFER_TRIGGER_LEVEL,
+    RingBufferHandler,
+)
+from .logs.rotating import CompressingRotatingFileHandler
+from .logs.syslog import (
+    BatchSysLogHandler,
+    DEFAULT_SYSLOG_BATCH_LATENCY,
+    DEFAULT_SYSLOG_BATCH_SIZE,
+)
 
 DEFAULT_TARGET_NAME = 'default'
+LOG_FORMAT_JSON = 'json'
 DEFAULT_LOGFORMAT = '%(asctime)s %(levelname)s %(message)s'
 DEFAULT_LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
@@ -34,6 +59,12 @@ DEFAULT_SYSLOG_FORMAT = '%(message)s'
 DEFAULT_SYSLOG_LEVEL = logging.handlers.SysLogHandler.LOG_WARNING
 DEFAULT_SYSLOG_FACILITY = logging.handlers.SysLogHandler.LOG_USER
 
+LOG_QUEUE_POLICY_DROP = 'drop'
+LOG_QUEUE_POLICY_BLOCK = 'block'
+LOG_QUEUE_POLICIES = (LOG_QUEUE_POLICY_DROP, LOG_QUEUE_POLICY_BLOCK)
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_LOG_QUEUE_POLICY = LOG_QUEUE_POLICY_DROP
+
 LOGGING_LEVEL_NAMES = ('DEBUG', 'INFO', 'WARN', 'ERROR', 'CRITICAL')
 SYSLOG_LEVEL_MAP = {
     logging.handlers.SysLogHandler.LOG_DEBUG:   logging.DEBUG,
@@ -56,6 +87,129 @@ def get_default_syslog_address() -> Union[str, Tuple[str, int]]:
     return ('localhost', 514)
 
 
+def get_handler_key(handler: logging.Handler) -> Tuple:
+    """
+    Return identity of handler for detecting duplicate handlers
+
+    File handlers are identified by file name only, so a file is written by a single
+    handler regardless of the handler type. Other handlers are identified by type and
+    address and facility or URL and method, or can be registered to a logger only once.
+    """
+    if isinstance(handler, (logging.FileHandler, CentralFileHandler)):
+        return (logging.FileHandler, handler.baseFilename)
+    if isinstance(handler, (logging.handlers.SysLogHandler, BatchSysLogHandler)):
+        address = handler.address
+        return (type(handler), tuple(address) if isinstance(address, list) else address, handler.facility)
+    if isinstance(handler, BatchHTTPHandler):
+        return (type(handler), handler.url, handler.method)
+    if isinstance(handler, logging.handlers.HTTPHandler):
+        return (type(handler), handler.host, handler.url, handler.method)
+    return (type(handler),)
+
+
+def create_formatter(logformat: Union[str, logging.Formatter],
+                     timeformat: Optional[str] = None) -> logging.Formatter:
+    """
+    Create formatter for log format string
+
+    Formatter instances are returned as is, LOG_FORMAT_JSON returns a JSONFormatter and
+    other format strings a CachedTimeFormatter
+    """
+    if isinstance(logformat, logging.Formatter):
+        return logformat
+    if logformat == LOG_FORMAT_JSON:
+        return JSONFormatter()
+    return CachedTimeFormatter(logformat, timeformat)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler for bounded queues with drop or block policy for full queue
+
+    With drop policy records not fitting to the queue are counted in dropped
+    attribute. With block policy the logging call waits for space in the queue.
+
+    Records are queued with the name of the logger the handler is attached to, so records
+    propagated from child loggers are passed to handlers of the logger which queued them.
+
+    Messages of records are formatted before queuing, except for records below
+    format_level, which are queued unformatted to keep the logging call cheap.
+    """
+    def __init__(self,
+                 log_queue: queue.Queue,
+                 policy: str = DEFAULT_LOG_QUEUE_POLICY,
+                 logger_name: Optional[str] = None) -> None:
+        if policy not in LOG_QUEUE_POLICIES:
+            raise LoggerError(f'Invalid log queue policy: {policy}')
+        super().__init__(log_queue)
+        self.policy = policy
+        self.logger_name = logger_name
+        self.format_level = logging.NOTSET
+        self.dropped = 0
+        self.__dropped_lock__ = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Return copy of record to be queued, with formatted message if the record is at
+        format_level or above
+        """
+        if record.levelno < self.format_level:
+            return copy.copy(record)
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Enqueue a record with logger name, dropping or blocking when the queue is full
+        """
+        item = (self.logger_name if self.logger_name is not None else record.name, record)
+        if self.policy == LOG_QUEUE_POLICY_BLOCK:
+            self.queue.put(item, block=True)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.__dropped_lock__:
+                self.dropped += 1
+
+
+class LoggerGroupQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener thread dispatching records of a logger group to the handlers
+    of the logger that queued the record
+    """
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.logger_handlers: Dict[str, Tuple[logging.Handler]] = {}
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Enqueue sentinel to stop the listener, waiting for space in a full queue
+        """
+        self.queue.put(self._sentinel, block=True)
+
+    def add_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Add handler for records of named logger
+        """
+        self.logger_handlers[name] = self.logger_handlers.get(name, ()) + (handler,)
+
+    def remove_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Remove handler for records of named logger
+        """
+        self.logger_handlers[name] = tuple(item for item in self.logger_handlers.get(name, ()) if item is not handler)
+
+    def handle(self, record: Tuple[str, logging.LogRecord]) -> None:
+        """
+        Pass record queued as tuple of logger name and record to handlers of the logger
+        """
+        name, record = record
+        record = self.prepare(record)
+        for handler in self.logger_handlers.get(name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
 class Logger:
     """
     Singleton class for extended loggers
@@ -63,22 +217,37 @@ class Logger:
     :param name: name of logger group, defaults to DEFAULT_TARGET_NAME
     :type name: str
 
-    :param logformat: Log message format string, defaults to DEFAULT_LOGFORMAT
+    :param logformat: Log message format string, 'json' for JSON lines or a logging
+                      Formatter instance, defaults to DEFAULT_LOGFORMAT
     :type name: str
 
     :param timeformat: Log message time format, defaults to DEFAULT_LOG_TIME_FORMAT
     :type name: str
+
+    :param asynchronous: Handle log records in a queue listener thread
+    :type asynchronous: bool
+
+    :param queue_size: Size of queue for asynchronous logging
+    :type queue_size: int
+
+    :param queue_policy: Policy for full asynchronous log queue, 'drop' or 'block'
+    :type queue_policy: str
     """
 
     groups: Dict = {}
     """LoggerGroup objects by group name"""
     name: Optional[str] = None
     """Name of this logger group"""
+    central_log_socket: Optional[str] = None
+    """Socket of log writer process receiving records of file handlers"""
 
     def __init__(self,
                  name: Optional[str] = None,
-                 logformat: str = DEFAULT_LOGFORMAT,
-                 timeformat: str = DEFAULT_LOG_TIME_FORMAT) -> None:
+                 logformat: Union[str, logging.Formatter] = DEFAULT_LOGFORMAT,
+                 timeformat: str = DEFAULT_LOG_TIME_FORMAT,
+                 asynchronous: bool = False,
+                 queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+                 queue_policy: str = DEFAULT_LOG_QUEUE_POLICY) -> None:
 
         name = name if name is not None else DEFAULT_TARGET_NAME
         self.__dict__['_Loggergroups'] = Logger.groups
@@ -99,13 +268,25 @@ class Logger:
             setattr(self, name, self.groups[name][name])
             self.level = logging.Logger.root.level
 
+        if asynchronous:
+            self.enable_async(queue_size, queue_policy)
+
     class LoggerGroup(dict):
         """
         Singleton implementation of logging configuration for named logging group
         """
-        def __init__(self, name: str, logformat: str, timeformat: str) -> logging.Logger:
+        def __init__(self, name: str, logformat: Union[str, logging.Formatter], timeformat: str) -> logging.Logger:
             super().__init__()
             self.name = name
+            self.__queue_handlers__: Dict[str, AsyncQueueHandler] = {}
+            self.__queue_policy__ = DEFAULT_LOG_QUEUE_POLICY
+            self.__listener__ = None
+            self.__ring_buffer__ = None
+            self.__ring_handlers__: Dict[str, logging.Handler] = {}
+            self.__capture_level__ = logging.DEBUG
+            self.__handler_index__: Dict[str, Dict[Tuple, logging.Handler]] = {}
+            self.__handler_counts__: Dict[str, int] = {}
+            self.__filters__: List[logging.Filter] = []
             self.__register_stream_handler__(name, logformat, timeformat)
             self.__level__ = None
 
@@ -113,70 +294,285 @@ class Logger:
             """
             Get or create a named logger linked to singleton instance
             """
-            if name not in self:
-                for logging_manager in logging.Logger.manager.loggerDict.values():
-                    if name == getattr(logging_manager, 'name', None):
-                        self[name] = logging.getLogger(name)
-                        break
-
             if name not in self:
                 self[name] = logging.getLogger(name)
+                for log_filter in self.__filters__:
+                    self[name].addFilter(log_filter)
+
+            if self.__ring_buffer__ is not None:
+                self.__attach_ring_buffer__(self[name])
+            if self.__listener__ is not None:
+                self.__attach_queue_handler__(self[name])
 
             return self[name]
 
-        @staticmethod
-        def __match_handlers__(handler_list, handler):
+        @property
+        def asynchronous(self) -> bool:
+            """
+            Check if records of the group are handled in queue listener thread
+            """
+            return self.__listener__ is not None
+
+        @property
+        def dropped_records(self) -> int:
             """
-            Match handlers by type and name, facility or method
+            Number of records dropped because the log queue was full
             """
-            def match_handler(item_a, item_b):  # pylint: disable=too-many-return-statements
-                """
-                Compare two handlers
-                """
-                if not isinstance(item_a, type(item_b)):
-                    return False
+            return sum(handler.dropped for handler in self.__queue_handlers__.values())
 
-                if isinstance(item_b, logging.handlers.RotatingFileHandler):
-                    if item_a.baseFilename != item_b.baseFilename:
-                        return False
-                    return True
+        @property
+        def ring_buffer(self) -> Optional[RingBufferHandler]:
+            """
+            Ring buffer handler of the group, if enabled
+            """
+            return self.__ring_buffer__
 
-                if isinstance(item_b, logging.handlers.SysLogHandler):
-                    for attr in ('address', 'facility'):
-                        if getattr(item_a, attr) != getattr(item_b, attr):
-                            return False
-                    return True
+        def add_filter(self, log_filter: logging.Filter) -> None:
+            """
+            Add filter to all current and future loggers of the group
+            """
+            if log_filter not in self.__filters__:
+                self.__filters__.append(log_filter)
+            for logger in self.values():
+                logger.addFilter(log_filter)
 
-                if isinstance(item_b, logging.handlers.HTTPHandler):
-                    for attr in ('host', 'url', 'method'):
-                        if getattr(item_a, attr) != getattr(item_b, attr):
-                            return False
-                    return True
+        def remove_filter(self, log_filter: logging.Filter) -> None:
+            """
+            Remove filter from loggers of the group
+            """
+            if log_filter in self.__filters__:
+                self.__filters__.remove(log_filter)
+            for logger in self.values():
+                logger.removeFilter(log_filter)
 
-                return True
+        def __attach_queue_handler__(self, logger: logging.Logger) -> None:
+            """
+            Move handlers of logger to queue listener and attach queue handler of the
+            logger in their place
+            """
+            queue_handler = self.__queue_handlers__.get(logger.name, None)
+            if queue_handler is None:
+                queue_handler = AsyncQueueHandler(self.__listener__.queue, self.__queue_policy__, logger.name)
+                self.__queue_handlers__[logger.name] = queue_handler
+                self.__set_queue_format_level__(queue_handler)
+            if queue_handler in logger.handlers:
+                return
+            for handler in list(logger.handlers):
+                self.__listener__.add_handler(logger.name, handler)
+                logger.removeHandler(handler)
+            logger.addHandler(queue_handler)
+
+        def __logger_handlers__(self, logger: logging.Logger) -> List[logging.Handler]:
+            """
+            Return handlers processing records of logger
+            """
+            if self.__ring_buffer__ is not None:
+                return list(self.__ring_buffer__.logger_handlers.get(logger.name, ()))
+            if self.__listener__ is not None:
+                return list(self.__listener__.logger_handlers.get(logger.name, ()))
+            return logger.handlers
 
-            assert isinstance(handler_list, list)
-            assert isinstance(handler, logging.Handler)
+        def __add_handler__(self, logger: logging.Logger, handler: logging.Handler) -> None:
+            """
+            Add handler to logger, to ring buffer or to queue listener in asynchronous mode
+            """
+            index = self.__get_handler_index__(logger)
+            if self.__ring_buffer__ is not None:
+                self.__ring_buffer__.add_handler(logger.name, handler)
+            elif self.__listener__ is not None:
+                self.__listener__.add_handler(logger.name, handler)
+            else:
+                logger.addHandler(handler)
+            index.setdefault(get_handler_key(handler), handler)
+            self.__handler_counts__[logger.name] += 1
 
-            for match in handler_list:
-                if match_handler(match, handler):
-                    return True
+        def remove_handler(self, name: str, handler: logging.Handler) -> None:
+            """
+            Remove handler from named logger, from ring buffer or from queue listener
+            in asynchronous mode
+            """
+            logger = self.get(name, None)
+            if logger is None:
+                return
+            if self.__ring_buffer__ is not None:
+                self.__ring_buffer__.remove_handler(logger.name, handler)
+            elif self.__listener__ is not None:
+                self.__listener__.remove_handler(logger.name, handler)
+            else:
+                logger.removeHandler(handler)
+            self.__handler_index__.pop(logger.name, None)
 
-            return False
+        def __get_handler_index__(self, logger: logging.Logger) -> Dict[Tuple, logging.Handler]:
+            """
+            Return handlers of logger indexed by handler identity
+
+            The index is updated when handlers are added or removed by the group. It is
+            rebuilt if the number of handlers of the logger has changed, when handlers
+            were added or removed outside of the group. Replacing a handler outside of
+            the group is not detected, use remove_handler to remove handlers.
+            """
+            index = self.__handler_index__.get(logger.name, None)
+            handlers = self.__logger_handlers__(logger)
+            if index is None or self.__handler_counts__[logger.name] != len(handlers):
+                index = {}
+                for handler in handlers:
+                    index.setdefault(get_handler_key(handler), handler)
+                self.__handler_index__[logger.name] = index
+                self.__handler_counts__[logger.name] = len(handlers)
+            return index
+
+        def __has_handler__(self, logger: logging.Logger, key: Tuple) -> bool:
+            """
+            Check if logger has a handler with identity key
+            """
+            return key in self.__get_handler_index__(logger)
+
+        def enable_async(self,
+                         queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+                         policy: str = DEFAULT_LOG_QUEUE_POLICY) -> None:
+            """
+            Handle records of the group in a queue listener thread
+
+            Each logger of the group gets a queue handler putting records to a bounded queue
+            and the existing handlers are moved to a queue listener thread. When the queue
+            is full records are dropped or the logging call blocks, depending on policy.
+            Queued records are flushed when the interpreter exits.
+            """
+            if self.__listener__ is not None:
+                return
+            if policy not in LOG_QUEUE_POLICIES:
+                raise LoggerError(f'Invalid log queue policy: {policy}')
+            self.__queue_policy__ = policy
+            self.__queue_handlers__ = {}
+            self.__listener__ = LoggerGroupQueueListener(queue.Queue(maxsize=queue_size))
+            for logger in self.values():
+                self.__attach_queue_handler__(logger)
+            self.__listener__.start()
+            atexit.register(self.disable_async)
+
+        def disable_async(self) -> None:
+            """
+            Stop queue listener thread, flushing queued records, and move handlers back
+            to loggers of the group
+            """
+            if self.__listener__ is None:
+                return
+            atexit.unregister(self.disable_async)
+            listener = self.__listener__
+            listener.stop()
+            for logger in self.values():
+                logger.removeHandler(self.__queue_handlers__.get(logger.name, None))
+                for handler in listener.logger_handlers.get(logger.name, ()):
+                    logger.addHandler(handler)
+            self.__listener__ = None
+
+        def __set_queue_format_level__(self, queue_handler: AsyncQueueHandler) -> None:
+            """
+            Skip formatting records only stored in the ring buffer in queue handler
+            """
+            if self.__ring_buffer__ is not None and self.level is not None:
+                queue_handler.format_level = self.level
+            else:
+                queue_handler.format_level = logging.NOTSET
+
+        def __set_logger_level__(self, logger: logging.Logger) -> None:
+            """
+            Set level of logger to group level, or to capture level of the ring buffer
+            """
+            level = self.level
+            if self.__ring_buffer__ is not None:
+                level = min(level, self.__capture_level__) if level is not None else self.__capture_level__
+            logger.setLevel(level)
+
+        def __attach_ring_buffer__(self, logger: logging.Logger) -> None:
+            """
+            Move handlers of logger to ring buffer and attach a ring buffer logger handler
+            in their place
+
+            Propagation of the logger is handled by the ring buffer, so that records below
+            group level are not passed to handlers of ancestor loggers.
+            """
+            ring_buffer = self.__ring_buffer__
+            ring_handler = self.__ring_handlers__.get(logger.name, None)
+            if ring_handler is None:
+                ring_handler = ring_buffer.get_logger_handler(logger.name)
+                self.__ring_handlers__[logger.name] = ring_handler
+            if self.__listener__ is not None:
+                handlers = self.__listener__.logger_handlers.get(logger.name, ())
+                if ring_handler in handlers:
+                    return
+                self.__listener__.logger_handlers[logger.name] = (ring_handler,)
+            else:
+                handlers = tuple(logger.handlers)
+                if ring_handler in handlers:
+                    return
+                for handler in handlers:
+                    logger.removeHandler(handler)
+                logger.addHandler(ring_handler)
+            ring_buffer.logger_handlers[logger.name] = tuple(handlers)
+            ring_buffer.propagate[logger.name] = logger.propagate
+            logger.propagate = False
+            self.__set_logger_level__(logger)
+
+        def enable_ring_buffer(self,
+                               capacity: int = DEFAULT_RING_BUFFER_SIZE,
+                               trigger_level: int = DEFAULT_RING_BUFFER_TRIGGER_LEVEL,
+                               capture_level: int = logging.DEBUG) -> None:
+            """
+            Keep last capacity records of the group at capture_level and above in a ring
+            buffer, passing them to handlers when a record at trigger_level arrives
+
+            Loggers of the group are set to capture_level and records below the group level
+            are only stored in the ring buffer. Records at group level and above are passed
+            to handlers as before. Records are passed to handlers of ancestor loggers by the
+            ring buffer, so records below group level do not reach them.
+            """
+            if self.__ring_buffer__ is not None:
+                return
+            self.__capture_level__ = capture_level
+            self.__ring_buffer__ = RingBufferHandler(capacity, trigger_level, pass_level=self.level)
+            self.__ring_handlers__ = {}
+            for logger in self.values():
+                self.__attach_ring_buffer__(logger)
+            for queue_handler in self.__queue_handlers__.values():
+                self.__set_queue_format_level__(queue_handler)
+
+        def disable_ring_buffer(self) -> None:
+            """
+            Drop records stored in ring buffer and move handlers back to their loggers
+            """
+            if self.__ring_buffer__ is None:
+                return
+            ring_buffer = self.__ring_buffer__
+            self.__ring_buffer__ = None
+            for logger in self.values():
+                handlers = ring_buffer.logger_handlers.get(logger.name, ())
+                if self.__listener__ is not None:
+                    self.__listener__.logger_handlers[logger.name] = handlers
+                else:
+                    logger.removeHandler(self.__ring_handlers__.get(logger.name, None))
+                    for handler in handlers:
+                        logger.addHandler(handler)
+                logger.propagate = ring_buffer.propagate.get(logger.name, logger.propagate)
+                self.__set_logger_level__(logger)
+            self.__ring_handlers__ = {}
+            for queue_handler in self.__queue_handlers__.values():
+                self.__set_queue_format_level__(queue_handler)
+            ring_buffer.close()
 
         def __register_stream_handler__(self,
                                         name: str,
-                                        logformat: str,
+                                        logformat: Union[str, logging.Formatter],
                                         timeformat: str) -> logging.Logger:
             """
             Register stream handler to singleton instance
             """
             logger = self.__get_or_create_logger__(name)
-            handler = logging.StreamHandler()
 
-            if not self.__match_handlers__(logger.handlers, handler):
-                handler.setFormatter(logging.Formatter(logformat, timeformat))
-                logger.addHandler(handler)
+            if not self.__has_handler__(logger, (logging.StreamHandler,)):
+                handler = logging.StreamHandler()
+                handler.setFormatter(create_formatter(logformat, timeformat))
+                self.__add_handler__(logger, handler)
 
             return logger
 
@@ -186,18 +582,52 @@ class Logger:
                                         facility: int,
                                         default_level: int,
                                         socktype,
-                                        logformat: str) -> logging.Logger:
+                                        logformat: Union[str, logging.Formatter]) -> logging.Logger:
             """
             Register syslog handler to singleton instance
             """
             logger = self.__get_or_create_logger__(name)
-            handler = logging.handlers.SysLogHandler(address, facility, socktype)
-            handler.level = default_level
+            key = (
+                logging.handlers.SysLogHandler,
+                tuple(address) if isinstance(address, list) else address,
+                facility
+            )
 
-            if not self.__match_handlers__(logger.handlers, handler):
-                handler.setFormatter(logging.Formatter(logformat))
-                logger.addHandler(handler)
-                logger.setLevel(self.level)
+            if not self.__has_handler__(logger, key):
+                handler = logging.handlers.SysLogHandler(address, facility, socktype)
+                handler.level = default_level
+                handler.setFormatter(create_formatter(logformat))
+                self.__add_handler__(logger, handler)
+                self.__set_logger_level__(logger)
+
+            return logger
+
+        def __register_batch_syslog_handler__(self,
+                                              name: str,
+                                              address: Union[str, Tuple[str, int]],
+                                              facility: int,
+                                              default_level: int,
+                                              logformat: Union[str, logging.Formatter],
+                                              **kwargs: Dict) -> logging.Logger:
+            """
+            Register batched syslog handler to singleton instance
+            """
+            logger = self.__get_or_create_logger__(name)
+            if isinstance(facility, str):
+                facility = logging.handlers.SysLogHandler.facility_names[facility]
+            key = (
+                BatchSysLogHandler,
+                tuple(address) if isinstance(address, list) else address,
+                facility
+            )
+
+            # Key is checked before creating the handler, which starts a sender thread
+            if not self.__has_handler__(logger, key):
+                handler = BatchSysLogHandler(address, facility, **kwargs)
+                handler.level = default_level
+                handler.setFormatter(create_formatter(logformat))
+                self.__add_handler__(logger, handler)
+                self.__set_logger_level__(logger)
 
             return logger
 
@@ -214,11 +644,32 @@ class Logger:
                 raise LoggerError(f'Invalid URL: {url}')
 
             logger = self.__get_or_create_logger__(name)
-            handler = logging.handlers.HTTPHandler(netloc, url, method)
 
-            if not self.__match_handlers__(logger.handlers, handler):
-                logger.addHandler(handler)
-                logger.setLevel(self.level)
+            if not self.__has_handler__(logger, (logging.handlers.HTTPHandler, netloc, url, method.upper())):
+                handler = logging.handlers.HTTPHandler(netloc, url, method)
+                self.__add_handler__(logger, handler)
+                self.__set_logger_level__(logger)
+
+            return logger
+
+        def __register_batch_http_handler__(self,
+                                            name: str,
+                                            url: str,
+                                            method: str,
+                                            logformat: Optional[Union[str, logging.Formatter]],
+                                            **kwargs: Dict) -> logging.Logger:
+            """
+            Register batched HTTP handler to singleton instance
+            """
+            logger = self.__get_or_create_logger__(name)
+
+            # Key is checked before creating the handler, which starts a sender thread
+            if not self.__has_handler__(logger, (BatchHTTPHandler, url, method.upper())):
+                handler = BatchHTTPHandler(url, method, **kwargs)
+                if logformat is not None:
+                    handler.setFormatter(create_formatter(logformat))
+                self.__add_handler__(logger, handler)
+                self.__set_logger_level__(logger)
 
             return logger
 
@@ -226,12 +677,20 @@ class Logger:
                                       name: str,
                                       directory: Union[str, Path],
                                       filename: str,
-                                      logformat: str,
+                                      logformat: Union[str, logging.Formatter],
                                       timeformat: str,
                                       max_bytes: int,
-                                      backup_count: int) -> logging.Logger:
+                                      backup_count: int,
+                                      compress: Optional[str] = None,
+                                      rotate_interval: Optional[float] = None,
+                                      max_total_bytes: Optional[int] = None) -> logging.Logger:
             """
             Register log file based logging handler to singleton instance
+
+            In centralized file logging mode records are sent to the log writer process
+            with CentralFileHandler. Otherwise CompressingRotatingFileHandler is used if
+            compression, time based rotation or total size limit is requested. A file
+            already registered to the logger is not registered again with other settings.
             """
 
             if filename is None:
@@ -245,17 +704,39 @@ class Logger:
                     raise LoggerError(f'Error creating directory: {path.parent}') from error
 
             logger = self.__get_or_create_logger__(name)
-            handler = logging.handlers.RotatingFileHandler(
-                filename=path,
-                mode='a+',
-                maxBytes=max_bytes,
-                backupCount=backup_count
-            )
-
-            if not self.__match_handlers__(logger.handlers, handler):
-                handler.setFormatter(logging.Formatter(logformat, timeformat))
-                logger.addHandler(handler)
-                logger.setLevel(self.level)
+            central_log_socket = Logger.central_log_socket or os.environ.get(LOG_WRITER_SOCKET_ENV, None)
+            compressing = compress is not None or rotate_interval is not None or max_total_bytes is not None
+            if not self.__has_handler__(logger, (logging.FileHandler, os.path.abspath(path))):
+                if central_log_socket:
+                    handler = CentralFileHandler(
+                        central_log_socket,
+                        path,
+                        max_bytes=max_bytes,
+                        backup_count=backup_count,
+                        compress=compress,
+                        rotate_interval=rotate_interval,
+                        max_total_bytes=max_total_bytes
+                    )
+                elif compressing:
+                    handler = CompressingRotatingFileHandler(
+                        filename=path,
+                        mode='a+',
+                        maxBytes=max_bytes,
+                        backupCount=backup_count,
+                        compress=compress,
+                        rotate_interval=rotate_interval,
+                        max_total_bytes=max_total_bytes
+                    )
+                else:
+                    handler = logging.handlers.RotatingFileHandler(
+                        filename=path,
+                        mode='a+',
+                        maxBytes=max_bytes,
+                        backupCount=backup_count
+                    )
+                handler.setFormatter(create_formatter(logformat, timeformat))
+                self.__add_handler__(logger, handler)
+                self.__set_logger_level__(logger)
 
             return logger
 
@@ -280,13 +761,26 @@ class Logger:
                 except ValueError as error:
                     raise LoggerError(f'Invalid logging level value: {value}') from error
 
-            for logger in self.values():
-                logger.setLevel(value)
             self.__level__ = value
+            if self.__ring_buffer__ is not None:
+                self.__ring_buffer__.pass_level = value
+            for queue_handler in self.__queue_handlers__.values():
+                self.__set_queue_format_level__(queue_handler)
+            for logger in self.values():
+                self.__set_logger_level__(logger)
 
     def __repr__(self) -> str:
         return str(self.name)
 
+    def __getattr__(self, attr: str) -> logging.Logger:
+        """
+        Return logger registered to the logger group after this object was created
+        """
+        group = Logger.groups.get(self.name, None)
+        if group is not None and attr in group:
+            return group[attr]
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
+
     @property
     def level(self) -> int:
         """
@@ -301,9 +795,96 @@ class Logger:
         """
         self.groups[self.name].level = value
 
+    @property
+    def dropped_records(self) -> int:
+        """
+        Number of records dropped because asynchronous log queue was full
+        """
+        return self.groups[self.name].dropped_records
+
+    def enable_async(self,
+                     queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+                     policy: str = DEFAULT_LOG_QUEUE_POLICY) -> None:
+        """
+        Handle log records of the logger group in a queue listener thread
+        """
+        self.groups[self.name].enable_async(queue_size, policy)
+
+    def disable_async(self) -> None:
+        """
+        Flush queued log records and handle log records in the calling thread
+        """
+        self.groups[self.name].disable_async()
+
+    def enable_ring_buffer(self,
+                           capacity: int = DEFAULT_RING_BUFFER_SIZE,
+                           trigger_level: int = DEFAULT_RING_BUFFER_TRIGGER_LEVEL,
+                           capture_level: int = logging.DEBUG) -> None:
+        """
+        Keep last capacity log records of the logger group in memory at any level and
+        pass them to log handlers when a record at trigger_level or above is logged
+        """
+        self.groups[self.name].enable_ring_buffer(capacity, trigger_level, capture_level)
+
+    def disable_ring_buffer(self) -> None:
+        """
+        Drop log records kept in memory and pass records directly to log handlers
+        """
+        self.groups[self.name].disable_ring_buffer()
+
+    def add_filter(self, log_filter: logging.Filter) -> None:
+        """
+        Add filter, for example RateLimitFilter or SamplingFilter, to all loggers of the
+        logger group
+
+        Filters are applied before records are queued or passed to handlers, so records
+        dropped by filters are never formatted.
+        """
+        self.groups[self.name].add_filter(log_filter)
+
+    def remove_filter(self, log_filter: logging.Filter) -> None:
+        """
+        Remove filter from loggers of the logger group
+        """
+        self.groups[self.name].remove_filter(log_filter)
+
+    def remove_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Remove handler from named logger of the logger group
+        """
+        self.groups[self.name].remove_handler(name, handler)
+
+    @classmethod
+    def enable_central_file_logging(cls,
+                                    socket_path: Union[str, Path],
+                                    start_writer: bool = False,
+                                    directories: Optional[List[Union[str, Path]]] = None
+                                    ) -> Optional[subprocess.Popen]:
+        """
+        Send records of file handlers registered after this call to a log writer process
+
+        If start_writer is True the writer is started now for log files in directories,
+        otherwise it's started by the first process sending records for the directory
+        of its log file. Returns the writer process if it was started.
+
+        Forked child processes inherit the mode. Pass the socket path to other child
+        processes with environment variable SYS_TOOLKIT_LOG_WRITER_SOCKET.
+        """
+        cls.central_log_socket = str(socket_path)
+        if start_writer:
+            return start_log_writer(socket_path, directories if directories is not None else [])
+        return None
+
+    @classmethod
+    def disable_central_file_logging(cls) -> None:
+        """
+        Write logs of file handlers registered after this call directly to the files
+        """
+        cls.central_log_socket = None
+
     def register_stream_handler(self,
                                 name: str,
-                                logformat: str = DEFAULT_LOGFORMAT,
+                                logformat: Union[str, logging.Formatter] = DEFAULT_LOGFORMAT,
                                 timeformat: str = DEFAULT_LOG_TIME_FORMAT) -> logging.Logger:
         """
         Register a common log stream handler
@@ -322,7 +903,7 @@ class Logger:
                                 facility: int = DEFAULT_SYSLOG_FACILITY,
                                 default_level: int = DEFAULT_SYSLOG_LEVEL,
                                 socktype: Optional[int] = None,
-                                logformat: str = DEFAULT_SYSLOG_FORMAT) -> logging.Logger:
+                                logformat: Union[str, logging.Formatter] = DEFAULT_SYSLOG_FORMAT) -> logging.Logger:
         """
         Register handler for syslog messages
         """
@@ -342,6 +923,41 @@ class Logger:
         setattr(self, logger.name, logger)
         return logger
 
+    def register_batch_syslog_handler(self,
+                                      name: str,
+                                      address: Optional[Union[str, Tuple[str, int]]] = None,
+                                      facility: int = DEFAULT_SYSLOG_FACILITY,
+                                      default_level: int = DEFAULT_SYSLOG_LEVEL,
+                                      socktype: Optional[int] = None,
+                                      logformat: Union[str, logging.Formatter] = DEFAULT_SYSLOG_FORMAT,
+                                      batch_size: int = DEFAULT_SYSLOG_BATCH_SIZE,
+                                      max_latency: float = DEFAULT_SYSLOG_BATCH_LATENCY,
+                                      **kwargs: Dict) -> logging.Logger:
+        """
+        Register handler for syslog messages sent in batches from a background thread
+
+        Records are sent when batch_size records are queued or max_latency seconds after
+        the first queued record. Other keyword arguments are passed to BatchSysLogHandler.
+        """
+        if address is None:
+            address = get_default_syslog_address()
+        if default_level not in SYSLOG_LEVEL_MAP:
+            raise LoggerError('Unsupported syslog level value')
+
+        logger = self.groups[self.name].__register_batch_syslog_handler__(
+            name,
+            address,
+            facility,
+            default_level,
+            logformat,
+            socktype=socktype,
+            batch_size=batch_size,
+            max_latency=max_latency,
+            **kwargs
+        )
+        setattr(self, logger.name, logger)
+        return logger
+
     def register_http_handler(self,
                               name: str,
                               url: str,
@@ -353,18 +969,56 @@ class Logger:
         setattr(self, logger.name, logger)
         return logger
 
+    def register_batch_http_handler(self,
+                                    name: str,
+                                    url: str,
+                                    method: str = 'POST',
+                                    batch_size: int = DEFAULT_HTTP_BATCH_SIZE,
+                                    max_latency: float = DEFAULT_HTTP_BATCH_LATENCY,
+                                    compress: bool = False,
+                                    spool_directory: Optional[Union[str, Path]] = None,
+                                    logformat: Optional[Union[str, logging.Formatter]] = None,
+                                    **kwargs: Dict) -> logging.Logger:
+        """
+        Register a HTTP logging handler sending records as batches of JSON lines
+
+        Records are sent when batch_size records are queued or max_latency seconds after
+        the first queued record. Batches failing to send are spooled to spool_directory.
+        If logformat is set, the formatted records are sent as lines. Other keyword
+        arguments are passed to BatchHTTPHandler.
+        """
+        logger = self.groups[self.name].__register_batch_http_handler__(
+            name,
+            url,
+            method,
+            logformat,
+            batch_size=batch_size,
+            max_latency=max_latency,
+            compress=compress,
+            spool_directory=spool_directory,
+            **kwargs
+        )
+        setattr(self, logger.name, logger)
+        return logger
+
     def register_file_handler(self,
                               name: str,
                               directory: Union[str, Path],
                               filename: Optional[str] = None,
-                              logformat: str = DEFAULT_LOGFILE_FORMAT,
+                              logformat: Union[str, logging.Formatter] = DEFAULT_LOGFILE_FORMAT,
                               timeformat: str = DEFAULT_LOG_TIME_FORMAT,
                               max_bytes: int = DEFAULT_LOGFILE_SIZE_LIMIT,
-                              backup_count: int = DEFAULT_LOGFILE_BACKUP_COUNT) -> logging.Logger:
+                              backup_count: int = DEFAULT_LOGFILE_BACKUP_COUNT,
+                              compress: Optional[str] = None,
+                              rotate_interval: Optional[float] = None,
+                              max_total_bytes: Optional[int] = None) -> logging.Logger:
 
         """
         Register a common log file handler for rotating file based logs
 
+        Rotated files are compressed in a background thread if compress is 'gzip' or
+        'xz'. Files are also rotated every rotate_interval seconds if it's set, and
+        oldest rotated files are removed when their total size exceeds max_total_bytes.
         """
         logger = self.groups[self.name].__register_file_handler__(
             name,
@@ -373,7 +1027,10 @@ class Logger:
             logformat,
             timeformat,
             max_bytes,
-            backup_count
+            backup_count,
+            compress,
+            rotate_interval,
+            max_total_bytes
         )
         setattr(self, logger.name, logger)
         return logger
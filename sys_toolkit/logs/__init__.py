@@ -0,0 +1,8 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Logging handlers, formatters and filters used by sys_toolkit.logger
+"""
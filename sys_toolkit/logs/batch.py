@@ -0,0 +1,219 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Base class for logging handlers sending encoded records in batches
+
+Records are encoded in the logging thread and queued. A background thread collects
+queued records to batches and passes them to the transport of the handler, so the
+logging thread never waits for network I/O.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+
+from typing import List, Optional
+
+DEFAULT_BATCH_MAX_QUEUED = 100000
+DEFAULT_BATCH_RETRY_INTERVAL = 1.0
+
+
+class BatchHandler(logging.Handler):
+    """
+    Logging handler sending records to a transport in batches
+
+    Records are sent when batch_size records are queued or the oldest queued record is
+    max_latency seconds old. If sending a batch fails, the batch is queued again and
+    sending is retried after retry_interval seconds. Records exceeding max_queued are
+    dropped and counted in dropped attribute.
+
+    Child classes must implement encode_record and send_batch methods.
+    """
+    def __init__(self,
+                 batch_size: int,
+                 max_latency: float,
+                 max_queued: int = DEFAULT_BATCH_MAX_QUEUED,
+                 retry_interval: float = DEFAULT_BATCH_RETRY_INTERVAL) -> None:
+        super().__init__()
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_queued = max_queued
+        self.retry_interval = retry_interval
+        self.dropped = 0
+
+        self.__records__: List[bytes] = []
+        self.__first_queued__ = None
+        self.__retry_after__ = None
+        self.__closed__ = False
+        self.__condition__ = threading.Condition()
+        self.__send_lock__ = threading.Lock()
+        self.__sender__ = None
+
+        if hasattr(os, 'register_at_fork'):
+            after_fork = weakref.WeakMethod(self.after_fork)
+            os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def encode_record(self, record: logging.LogRecord) -> bytes:
+        """
+        Encode record to bytes to be sent in a batch
+        """
+        raise NotImplementedError
+
+    def send_batch(self, batch: List[bytes]) -> bool:
+        """
+        Send batch of encoded records. Returns False if the batch should be retried
+
+        Records which were sent before a failure can be removed from the batch list to
+        not retry them. Called with send lock held from the sender thread or flush()
+        """
+        raise NotImplementedError
+
+    def after_fork(self) -> None:
+        """
+        Reset state in a forked child process
+
+        The sender thread does not exist in the child and records queued by the parent
+        are sent by the parent. Child classes must also drop connections inherited from
+        the parent process.
+        """
+        self.createLock()
+        self.__records__ = []
+        self.__first_queued__ = None
+        self.__retry_after__ = None
+        self.__condition__ = threading.Condition()
+        self.__send_lock__ = threading.Lock()
+        self.__sender__ = None
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of records waiting to be sent
+        """
+        return len(self.__records__)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Queue encoded record to be sent in next batch
+        """
+        try:
+            data = self.encode_record(record)
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+            return
+
+        with self.__condition__:
+            if self.__sender__ is None and not self.__closed__:
+                self.__sender__ = threading.Thread(
+                    target=self.__run_sender__,
+                    name=repr(self),
+                    daemon=True
+                )
+                self.__sender__.start()
+            if len(self.__records__) >= self.max_queued:
+                self.dropped += 1
+                return
+            if not self.__records__:
+                self.__first_queued__ = time.monotonic()
+            self.__records__.append(data)
+            if len(self.__records__) >= self.batch_size:
+                self.__condition__.notify()
+
+    def __take_batch__(self) -> List[bytes]:
+        """
+        Remove next batch from queued records
+
+        Must be called with the condition lock held
+        """
+        batch = self.__records__[:self.batch_size]
+        del self.__records__[:self.batch_size]
+        self.__first_queued__ = time.monotonic() if self.__records__ else None
+        return batch
+
+    def __requeue_batch__(self, batch: List[bytes]) -> None:
+        """
+        Queue failed batch again in front of queued records, dropping oldest records
+        exceeding max_queued
+        """
+        with self.__condition__:
+            records = batch + self.__records__
+            overflow = len(records) - self.max_queued
+            if overflow > 0:
+                self.dropped += overflow
+                del records[:overflow]
+            self.__records__ = records
+            self.__first_queued__ = time.monotonic() if records else None
+            self.__retry_after__ = time.monotonic() + self.retry_interval
+
+    def __next_batch__(self) -> Optional[List[bytes]]:
+        """
+        Wait for next batch to send. Returns None when the handler is closed
+
+        Must be called with the condition lock held
+        """
+        while True:
+            if self.__closed__:
+                return None
+            if self.__retry_after__ is not None:
+                delay = self.__retry_after__ - time.monotonic()
+                if delay > 0:
+                    self.__condition__.wait(delay)
+                    continue
+                self.__retry_after__ = None
+            if self.__records__:
+                age = time.monotonic() - self.__first_queued__
+                if len(self.__records__) >= self.batch_size or age >= self.max_latency:
+                    return self.__take_batch__()
+                self.__condition__.wait(self.max_latency - age)
+            else:
+                self.__condition__.wait()
+
+    def __run_sender__(self) -> None:
+        """
+        Background thread sending batches of records
+        """
+        while True:
+            with self.__condition__:
+                batch = self.__next_batch__()
+            if batch is None:
+                return
+            with self.__send_lock__:
+                if not self.send_batch(batch):
+                    self.__requeue_batch__(batch)
+
+    def flush(self) -> None:
+        """
+        Send all queued records in the calling thread
+
+        Records failing to send are queued again for the sender thread
+        """
+        with self.__send_lock__:
+            while True:
+                with self.__condition__:
+                    batch = self.__take_batch__()
+                if not batch:
+                    break
+                if not self.send_batch(batch):
+                    self.__requeue_batch__(batch)
+                    break
+
+    def close(self) -> None:
+        """
+        Stop background sender and send queued records
+
+        Records which can't be sent when the handler is closed are dropped
+        """
+        with self.__condition__:
+            self.__closed__ = True
+            self.__condition__.notify_all()
+            sender = self.__sender__
+        if sender is not None:
+            sender.join()
+        self.flush()
+        with self.__condition__:
+            self.dropped += len(self.__records__)
+            self.__records__ = []
+        super().close()
@@ -0,0 +1,436 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Throughput and latency benchmarks for logging formatters and handlers
+
+Run with python -m sys_toolkit.logs.benchmark to print results as JSON. Handlers are
+benchmarked against local stand-ins: a temporary directory for log files, a Unix
+datagram socket for syslog and a local HTTP server for HTTP handlers.
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .formatters import (
+    CachedTimeFormatter,
+    JSON_BACKEND_JSON,
+    JSON_BACKEND_ORJSON,
+    JSONFormatter,
+    orjson,
+)
+from .http import BatchHTTPHandler
+from .rotating import CompressingRotatingFileHandler
+from .syslog import BatchSysLogHandler
+
+DEFAULT_BENCHMARK_RECORDS = 100000
+DEFAULT_HANDLER_BENCHMARK_RECORDS = 10000
+BENCHMARK_LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s %(message)s'
+BENCHMARK_LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+BENCHMARK_LOGGER_NAME = 'sys_toolkit.benchmark'
+BENCHMARK_LOGGER_LEVEL = logging.INFO
+BENCHMARK_LOG_LEVELS = ('DEBUG', 'INFO', 'ERROR')
+BENCHMARK_MESSAGE_SIZES = (64, 1024)
+BENCHMARK_LOGFILE_SIZE_LIMIT = 2**20
+BENCHMARK_LOGFILE_BACKUP_COUNT = 10
+
+
+class BenchmarkSyslogServer:
+    """
+    Unix datagram socket standing in for a syslog daemon, discarding received messages
+    """
+    def __init__(self, path: Path) -> None:
+        self.path = str(path)
+        self.received = 0
+        self.__socket__ = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.__socket__.bind(self.path)
+        self.__socket__.settimeout(0.1)
+        self.__stopped__ = threading.Event()
+        self.__thread__ = threading.Thread(target=self.__receive__, daemon=True)
+        self.__thread__.start()
+
+    def __receive__(self) -> None:
+        """
+        Receive and discard messages until stopped
+        """
+        while not self.__stopped__.is_set():
+            try:
+                self.__socket__.recv(2**16)
+                self.received += 1
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+
+    def close(self) -> None:
+        """
+        Stop receiving messages and remove the socket
+        """
+        self.__stopped__.set()
+        self.__thread__.join()
+        self.__socket__.close()
+        os.unlink(self.path)
+
+
+class BenchmarkHTTPRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP request handler discarding received log records
+    """
+    protocol_version = 'HTTP/1.1'
+
+    # pylint: disable=invalid-name
+    def do_POST(self) -> None:
+        """
+        Read and discard request body
+        """
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format: str, *args) -> None:
+        """
+        Do not log requests
+        """
+
+
+class BenchmarkHTTPServer(ThreadingHTTPServer):
+    """
+    Local HTTP server standing in for a log collection endpoint
+    """
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), BenchmarkHTTPRequestHandler)
+        self.__thread__ = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread__.start()
+
+    @property
+    def url(self) -> str:
+        """
+        URL for sending logs to the server
+        """
+        return f'http://127.0.0.1:{self.server_address[1]}/logs'
+
+    def close(self) -> None:
+        """
+        Stop the server
+        """
+        self.shutdown()
+        self.server_close()
+
+
+class BenchmarkEnvironment:
+    """
+    Context manager for local log targets of handler benchmarks
+    """
+    def __init__(self) -> None:
+        self.__tmpdir__ = None
+        self.directory: Optional[Path] = None
+        self.syslog_server: Optional[BenchmarkSyslogServer] = None
+        self.http_server: Optional[BenchmarkHTTPServer] = None
+
+    def __enter__(self) -> 'BenchmarkEnvironment':
+        self.__tmpdir__ = tempfile.TemporaryDirectory(prefix='sys-toolkit-benchmark-')
+        self.directory = Path(self.__tmpdir__.name)
+        self.syslog_server = BenchmarkSyslogServer(self.directory.joinpath('syslog.sock'))
+        self.http_server = BenchmarkHTTPServer()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.http_server.close()
+        self.syslog_server.close()
+        self.__tmpdir__.cleanup()
+
+
+class BenchmarkStreamHandler(logging.StreamHandler):
+    """
+    Stream handler closing the stream when the handler is closed
+    """
+    def close(self) -> None:
+        """
+        Flush and close the stream and the handler
+        """
+        with self.lock:
+            try:
+                if not self.stream.closed:
+                    self.flush()
+                    self.stream.close()
+            finally:
+                super().close()
+
+
+def create_stream_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create stream handler writing to a file in benchmark directory
+    """
+    # pylint: disable=consider-using-with
+    stream = environment.directory.joinpath('stream.log').open('a', encoding='utf-8')
+    return BenchmarkStreamHandler(stream)
+
+
+def create_rotating_file_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create rotating file handler
+    """
+    return logging.handlers.RotatingFileHandler(
+        environment.directory.joinpath('rotating.log'),
+        maxBytes=BENCHMARK_LOGFILE_SIZE_LIMIT,
+        backupCount=BENCHMARK_LOGFILE_BACKUP_COUNT
+    )
+
+
+def create_compressing_file_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create rotating file handler compressing rotated files
+    """
+    return CompressingRotatingFileHandler(
+        environment.directory.joinpath('compressing.log'),
+        maxBytes=BENCHMARK_LOGFILE_SIZE_LIMIT,
+        backupCount=BENCHMARK_LOGFILE_BACKUP_COUNT
+    )
+
+
+def create_syslog_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create syslog handler sending to local syslog stand-in
+    """
+    return logging.handlers.SysLogHandler(environment.syslog_server.path)
+
+
+def create_batch_syslog_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create batched syslog handler sending to local syslog stand-in
+    """
+    return BatchSysLogHandler(environment.syslog_server.path)
+
+
+def create_http_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create HTTP handler sending to local HTTP server
+    """
+    host, port = environment.http_server.server_address
+    return logging.handlers.HTTPHandler(f'{host}:{port}', '/logs', 'POST')
+
+
+def create_batch_http_handler(environment: BenchmarkEnvironment) -> logging.Handler:
+    """
+    Create batched HTTP handler sending to local HTTP server
+    """
+    return BatchHTTPHandler(environment.http_server.url)
+
+
+BENCHMARK_HANDLERS: Dict[str, Callable[[BenchmarkEnvironment], logging.Handler]] = {
+    'stream': create_stream_handler,
+    'rotating_file': create_rotating_file_handler,
+    'compressing_rotating_file': create_compressing_file_handler,
+    'syslog': create_syslog_handler,
+    'batch_syslog': create_batch_syslog_handler,
+    'http': create_http_handler,
+    'batch_http': create_batch_http_handler,
+}
+
+
+def create_benchmark_records(count: int) -> List[logging.LogRecord]:
+    """
+    Create log records for benchmarks
+    """
+    records = []
+    for index in range(count):
+        record = logging.LogRecord(
+            'benchmark', logging.INFO, __file__, index, 'benchmark message %d from %s', (index, 'bench'), None
+        )
+        record.request_id = index
+        records.append(record)
+    return records
+
+
+def benchmark_callable(callback: Callable, records: List[logging.LogRecord]) -> Dict[str, float]:
+    """
+    Call callback for each record and return records per second
+    """
+    start = time.perf_counter()
+    for record in records:
+        callback(record)
+    elapsed = time.perf_counter() - start
+    return {
+        'records': len(records),
+        'seconds': elapsed,
+        'records_per_second': len(records) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def get_percentile(values: List[int], percent: float) -> int:
+    """
+    Return percentile of sorted values with nearest rank method
+    """
+    if not values:
+        return 0
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def get_benchmark_formatters() -> Dict[str, logging.Formatter]:
+    """
+    Return formatters to benchmark by name
+    """
+    formatters = {
+        'logging.Formatter': logging.Formatter(BENCHMARK_LOG_FORMAT, BENCHMARK_LOG_TIME_FORMAT),
+        'CachedTimeFormatter': CachedTimeFormatter(BENCHMARK_LOG_FORMAT, BENCHMARK_LOG_TIME_FORMAT),
+        'JSONFormatter(json)': JSONFormatter(backend=JSON_BACKEND_JSON),
+    }
+    if orjson is not None:
+        formatters['JSONFormatter(orjson)'] = JSONFormatter(backend=JSON_BACKEND_ORJSON)
+    return formatters
+
+
+def benchmark_formatters(count: int = DEFAULT_BENCHMARK_RECORDS) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark formatting throughput of formatters
+    """
+    records = create_benchmark_records(count)
+    return {
+        name: benchmark_callable(formatter.format, records)
+        for name, formatter in get_benchmark_formatters().items()
+    }
+
+
+def benchmark_handler(handler: logging.Handler, level: int, message_size: int, count: int) -> Dict[str, float]:
+    """
+    Benchmark logging calls at level with messages of message_size characters
+
+    The handler is attached to logger BENCHMARK_LOGGER_NAME with level
+    BENCHMARK_LOGGER_LEVEL for the benchmark, so calls below it measure the cost of
+    disabled logging calls. Latency of each logging call
+    is measured separately. Closing the handler, which flushes batched handlers, is
+    included in total time but not in call latencies. The handler is closed.
+    """
+    logger = logging.getLogger(BENCHMARK_LOGGER_NAME)
+    logger.propagate = False
+    logger.setLevel(BENCHMARK_LOGGER_LEVEL)
+    logger.addHandler(handler)
+    message = f'benchmark message %d {"x" * max(0, message_size - 20)}'
+    latencies = [0] * count
+    clock = time.perf_counter_ns
+
+    try:
+        start = clock()
+        for index in range(count):
+            call_start = clock()
+            logger.log(level, message, index)
+            latencies[index] = clock() - call_start
+        handler.close()
+        elapsed = (clock() - start) / 1e9
+    finally:
+        logger.removeHandler(handler)
+
+    latencies.sort()
+    return {
+        'records': count,
+        'seconds': elapsed,
+        'records_per_second': count / elapsed if elapsed > 0 else 0.0,
+        'p50_us': get_percentile(latencies, 50) / 1000,
+        'p99_us': get_percentile(latencies, 99) / 1000,
+    }
+
+
+def benchmark_handlers(count: int = DEFAULT_HANDLER_BENCHMARK_RECORDS,
+                       handlers: Optional[List[str]] = None,
+                       levels: Optional[List[str]] = None,
+                       message_sizes: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Benchmark handlers at log levels and message sizes
+
+    Returns a list of results with handler name, level and message size. A new handler
+    is created for each result.
+    """
+    handlers = handlers if handlers else list(BENCHMARK_HANDLERS)
+    levels = levels if levels else list(BENCHMARK_LOG_LEVELS)
+    message_sizes = message_sizes if message_sizes else list(BENCHMARK_MESSAGE_SIZES)
+
+    results = []
+    with BenchmarkEnvironment() as environment:
+        for name in handlers:
+            for level in levels:
+                for message_size in message_sizes:
+                    handler = BENCHMARK_HANDLERS[name](environment)
+                    handler.setFormatter(CachedTimeFormatter(BENCHMARK_LOG_FORMAT, BENCHMARK_LOG_TIME_FORMAT))
+                    result = {
+                        'handler': name,
+                        'level': level,
+                        'message_size': message_size,
+                    }
+                    result.update(benchmark_handler(handler, getattr(logging, level), message_size, count))
+                    results.append(result)
+    return results
+
+
+def get_package_version() -> Optional[str]:
+    """
+    Return installed version of sys-toolkit
+    """
+    try:
+        return version('sys-toolkit')
+    except PackageNotFoundError:
+        return None
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(prog='python -m sys_toolkit.logs.benchmark')
+    parser.add_argument('count', nargs='?', type=int, default=DEFAULT_BENCHMARK_RECORDS,
+                        help='Number of records for formatter benchmarks')
+    parser.add_argument('--handler-count', type=int, default=DEFAULT_HANDLER_BENCHMARK_RECORDS,
+                        help='Number of records for each handler benchmark')
+    parser.add_argument('--handlers', nargs='*', choices=list(BENCHMARK_HANDLERS),
+                        help='Handlers to benchmark')
+    parser.add_argument('--levels', nargs='*', choices=list(BENCHMARK_LOG_LEVELS),
+                        help='Log levels to benchmark')
+    parser.add_argument('--message-sizes', nargs='*', type=int,
+                        help='Message sizes to benchmark')
+    parser.add_argument('--output', type=Path,
+                        help='File to write results to instead of stdout')
+    return parser.parse_args(args)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Run benchmarks and print results as JSON
+    """
+    args = parse_args(args)
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'version': get_package_version(),
+        'python': platform.python_version(),
+        'logger_level': logging.getLevelName(BENCHMARK_LOGGER_LEVEL),
+        'formatters': benchmark_formatters(args.count),
+        'handlers': benchmark_handlers(args.handler_count, args.handlers, args.levels, args.message_sizes),
+    }
+    output = f'{json.dumps(results, indent=2)}\n'
+    if args.output is not None:
+        args.output.write_text(output, encoding='utf-8')
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == '__main__':
+    main()
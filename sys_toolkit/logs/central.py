@@ -0,0 +1,571 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Centralized file logging for multiple processes
+
+A single log writer process owns the log files and receives batches of formatted
+records from other processes over a unix stream socket. Only the writer process
+writes and rotates the files, so processes logging to the same file never race on
+rotation or interleave partial lines.
+
+The writer is started by the parent process with start_log_writer() or lazily by the
+first process sending records. Run the writer directly with
+
+    python -m sys_toolkit.logs.central <socket path> --directory <log directory>
+
+The writer only writes files in the directories it was started with. Each frame is
+acknowledged by the writer, and clients write batches rejected by the writer to the
+log file directly. The socket is created with permissions for the owner only, and
+connections from processes of other users are closed where peer credentials are
+available.
+"""
+import argparse
+import logging
+import marshal
+import os
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from ..exceptions import LoggerError
+from .batch import BatchHandler
+from .rotating import CompressingRotatingFileHandler
+
+LOG_WRITER_SOCKET_ENV = 'SYS_TOOLKIT_LOG_WRITER_SOCKET'
+DEFAULT_LOG_WRITER_IDLE_TIMEOUT = 60.0
+DEFAULT_LOG_WRITER_START_TIMEOUT = 10.0
+DEFAULT_LOG_WRITER_ACK_TIMEOUT = 10.0
+DEFAULT_CENTRAL_BATCH_SIZE = 1000
+DEFAULT_CENTRAL_BATCH_LATENCY = 0.1
+
+LOG_WRITER_READ_SIZE = 2**16
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 2**26
+PEER_CREDENTIALS = struct.Struct('3i')
+# Acknowledgements sent by the writer for each received frame
+FRAME_ACCEPTED = b'\x00'
+FRAME_REJECTED = b'\x01'
+
+
+def encode_frame(path: str, options: Dict, data: bytes) -> bytes:
+    """
+    Encode batch of formatted records for a log file as a length prefixed frame
+    """
+    payload = marshal.dumps((path, options, data))
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def decode_frame(payload: bytes) -> Tuple[str, Dict, bytes]:
+    """
+    Decode payload of a frame, raising LoggerError if it's not a valid frame
+    """
+    try:
+        frame = marshal.loads(payload)
+    except (EOFError, TypeError, ValueError) as error:
+        raise LoggerError(f'Invalid log writer frame: {error}') from error
+    if not isinstance(frame, tuple) or len(frame) != 3:
+        raise LoggerError('Invalid log writer frame')
+    path, options, data = frame
+    if not isinstance(path, str) or not isinstance(options, dict) or not isinstance(data, bytes):
+        raise LoggerError('Invalid log writer frame')
+    return frame
+
+
+def decode_frames(buffer: bytearray) -> List[Tuple[str, Dict, bytes]]:
+    """
+    Decode complete frames from buffer, removing them from the buffer
+
+    Raises LoggerError for invalid frames
+    """
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= FRAME_HEADER.size:
+        size = FRAME_HEADER.unpack_from(buffer, offset)[0]
+        if size > MAX_FRAME_SIZE:
+            raise LoggerError(f'Log writer frame too large: {size}')
+        end = offset + FRAME_HEADER.size + size
+        if len(buffer) < end:
+            break
+        frames.append(decode_frame(bytes(buffer[offset + FRAME_HEADER.size:end])))
+        offset = end
+    del buffer[:offset]
+    return frames
+
+
+def get_peer_uid(connection: socket.socket) -> Optional[int]:
+    """
+    Return user ID of the process connected to unix socket, or None if peer credentials
+    are not available on the platform
+    """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+    return PEER_CREDENTIALS.unpack(credentials)[1]
+
+
+def connect_log_writer(socket_path: Union[str, Path]) -> socket.socket:
+    """
+    Connect to log writer socket, raising OSError if the writer is not running
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def is_log_writer_running(socket_path: Union[str, Path]) -> bool:
+    """
+    Check if a log writer accepts connections on socket path
+    """
+    try:
+        connect_log_writer(socket_path).close()
+    except OSError:
+        return False
+    return True
+
+
+def start_log_writer(socket_path: Union[str, Path],
+                     directories: Iterable[Union[str, Path]],
+                     idle_timeout: Optional[float] = None,
+                     timeout: float = DEFAULT_LOG_WRITER_START_TIMEOUT) -> Optional[subprocess.Popen]:
+    """
+    Start log writer process for socket path unless it's already running
+
+    The writer only writes log files in directories. The writer runs in a new session,
+    so it's not killed with the process group of the caller. If idle_timeout is set, the
+    writer exits when it has had no clients for idle_timeout seconds. Returns the writer
+    process or None if a writer was already running.
+    """
+    if fcntl is None:  # pragma: no cover
+        raise LoggerError('Centralized file logging is not supported on this platform')
+    directories = [str(directory) for directory in directories]
+    if not directories:
+        raise LoggerError('Log writer requires directories for log files')
+    socket_path = Path(socket_path)
+    lockfile = socket_path.with_name(f'{socket_path.name}.lock')
+    with lockfile.open('a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if is_log_writer_running(socket_path):
+            return None
+        args = [sys.executable, '-m', __name__, str(socket_path)]
+        for directory in directories:
+            args.extend(('--directory', directory))
+        if idle_timeout is not None:
+            args.extend(('--idle-timeout', str(idle_timeout)))
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            args,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while not is_log_writer_running(socket_path):
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise LoggerError(f'Error starting log writer for {socket_path}')
+            time.sleep(0.01)
+    return process
+
+
+class LogWriter:
+    """
+    Log writer server writing batches of records received over unix socket to files
+
+    Files are written and rotated with CompressingRotatingFileHandler, with compression
+    only if requested by the clients. Options of the first batch received for a file
+    are used. Each frame is acknowledged to the client with FRAME_ACCEPTED, or with
+    FRAME_REJECTED if the file is outside directories or can't be opened.
+
+    The socket is created with permissions for the owner only. Connections from other
+    users are closed if peer credentials are available, and connections sending invalid
+    frames are closed.
+    """
+    def __init__(self,
+                 socket_path: Union[str, Path],
+                 idle_timeout: Optional[float] = None,
+                 directories: Iterable[Union[str, Path]] = ()) -> None:
+        self.socket_path = Path(socket_path)
+        self.idle_timeout = idle_timeout
+        self.directories = tuple(Path(directory).resolve() for directory in directories)
+        self.handlers: Dict[str, logging.Handler] = {}
+        self.__rejected__ = set()
+        self.__running__ = False
+        self.__selector__ = None
+        self.__listener__ = None
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} {self.socket_path}>'
+
+    def is_allowed(self, path: str) -> bool:
+        """
+        Check if log file path is in directories of the writer
+        """
+        resolved = Path(path).resolve()
+        return any(resolved.is_relative_to(directory) for directory in self.directories)
+
+    def get_handler(self, path: str, options: Dict) -> logging.Handler:
+        """
+        Return handler writing to log file path
+
+        Raises LoggerError if path is not in directories of the writer
+        """
+        handler = self.handlers.get(path, None)
+        if handler is None:
+            if not self.is_allowed(path):
+                raise LoggerError('Log file is not in log writer directories')
+            handler = CompressingRotatingFileHandler(
+                path,
+                mode='a',
+                maxBytes=options.get('max_bytes', 0),
+                backupCount=options.get('backup_count', 0),
+                encoding='utf-8',
+                compress=options.get('compress', None),
+                rotate_interval=options.get('rotate_interval', None),
+                max_total_bytes=options.get('max_total_bytes', None),
+            )
+            handler.terminator = ''
+            self.handlers[path] = handler
+        return handler
+
+    def write(self, frames: List[Tuple[str, Dict, bytes]]) -> Set[str]:
+        """
+        Write decoded frames, joining batches for the same file to a single write
+
+        Returns paths of rejected frames
+        """
+        rejected = set()
+        batches = {}
+        for path, options, data in frames:
+            if path not in batches:
+                batches[path] = (options, [])
+            batches[path][1].append(data)
+        for path, (options, chunks) in batches.items():
+            try:
+                handler = self.get_handler(path, options)
+            except (OSError, LoggerError) as error:
+                if path not in self.__rejected__:
+                    self.__rejected__.add(path)
+                    sys.stderr.write(f'Error opening log file {path}: {error}\n')
+                rejected.add(path)
+                continue
+            handler.handle(logging.makeLogRecord({'msg': b''.join(chunks).decode('utf-8', 'replace')}))
+            handler.flush()
+        return rejected
+
+    def __bind__(self) -> socket.socket:
+        """
+        Bind listening socket, removing stale socket file of a stopped writer
+        """
+        if self.socket_path.exists():
+            if is_log_writer_running(self.socket_path):
+                raise LoggerError(f'Log writer is already running: {self.socket_path}')
+            self.socket_path.unlink()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            listener.bind(str(self.socket_path))
+        finally:
+            os.umask(umask)
+        listener.listen(socket.SOMAXCONN)
+        listener.setblocking(False)
+        return listener
+
+    def stop(self, *args) -> None:  # pylint: disable=unused-argument
+        """
+        Stop serving after current batch
+        """
+        self.__running__ = False
+
+    def serve_forever(self) -> None:
+        """
+        Receive and write records until stopped or idle timeout is reached
+        """
+        self.__listener__ = self.__bind__()
+        self.__selector__ = selectors.DefaultSelector()
+        self.__selector__.register(self.__listener__, selectors.EVENT_READ)
+        self.__running__ = True
+        last_active = time.monotonic()
+        try:
+            while self.__running__:
+                received = []
+                for key, _events in self.__selector__.select(timeout=0.5):
+                    if key.fileobj is self.__listener__:
+                        self.__accept__()
+                    else:
+                        self.__receive__(key, received)
+                if received:
+                    rejected = self.write([frame for _connection, frames in received for frame in frames])
+                    for connection, frames in received:
+                        self.__acknowledge__(connection, frames, rejected)
+                if len(self.__selector__.get_map()) > 1:
+                    last_active = time.monotonic()
+                elif self.idle_timeout is not None and time.monotonic() - last_active > self.idle_timeout:
+                    break
+        finally:
+            self.close()
+
+    def __accept__(self) -> None:
+        """
+        Accept client connection
+        """
+        try:
+            connection, _address = self.__listener__.accept()
+        except BlockingIOError:
+            return
+        peer_uid = get_peer_uid(connection)
+        if peer_uid is not None and peer_uid != os.getuid():
+            connection.close()
+            return
+        connection.setblocking(False)
+        self.__selector__.register(connection, selectors.EVENT_READ, bytearray())
+
+    def __receive__(self, key: selectors.SelectorKey, received: List) -> None:
+        """
+        Receive data from client connection and decode complete frames
+
+        Decoded frames are added to received with the connection
+        """
+        try:
+            data = key.fileobj.recv(LOG_WRITER_READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.__selector__.unregister(key.fileobj)
+            key.fileobj.close()
+            return
+        key.data.extend(data)
+        try:
+            frames = decode_frames(key.data)
+        except LoggerError as error:
+            sys.stderr.write(f'Closing log writer connection: {error}\n')
+            self.__selector__.unregister(key.fileobj)
+            key.fileobj.close()
+            return
+        if frames:
+            received.append((key.fileobj, frames))
+
+    def __acknowledge__(self, connection: socket.socket, frames: List, rejected: Set[str]) -> None:
+        """
+        Send acknowledgement of each received frame to client connection
+        """
+        status = b''.join(FRAME_REJECTED if path in rejected else FRAME_ACCEPTED for path, _options, _data in frames)
+        try:
+            connection.setblocking(True)
+            connection.sendall(status)
+            connection.setblocking(False)
+        except OSError:
+            self.__selector__.unregister(connection)
+            connection.close()
+
+    def close(self) -> None:
+        """
+        Close client connections, listening socket and log files
+        """
+        if self.__selector__ is not None:
+            for key in list(self.__selector__.get_map().values()):
+                if key.data:
+                    try:
+                        self.write(decode_frames(key.data))
+                    except LoggerError:
+                        pass
+                key.fileobj.close()
+            self.__selector__.close()
+            self.__selector__ = None
+        if self.__listener__ is not None:
+            try:
+                self.socket_path.unlink()
+            except OSError:
+                pass
+            self.__listener__ = None
+        for handler in self.handlers.values():
+            handler.close()
+        self.handlers = {}
+
+
+class CentralFileHandler(BatchHandler):
+    """
+    Logging handler sending formatted records to a log writer process
+
+    Records are formatted in the logging process and sent to the writer in batches over
+    a unix stream socket. If the writer is not running and start_writer is True, the
+    first process sending records starts it with DEFAULT_LOG_WRITER_IDLE_TIMEOUT for the
+    directory of the log file.
+
+    Batches rejected by the writer, for example for files outside the directories of a
+    writer started for another file, are written to the log file directly with a
+    CompressingRotatingFileHandler and counted in local_records.
+
+    The log file options max_bytes, backup_count, compress, rotate_interval and
+    max_total_bytes are passed to the writer, which rotates the file.
+    """
+    def __init__(self,
+                 socket_path: Union[str, Path],
+                 filename: Union[str, Path],
+                 max_bytes: int = 0,
+                 backup_count: int = 0,
+                 compress: Optional[str] = None,
+                 rotate_interval: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None,
+                 batch_size: int = DEFAULT_CENTRAL_BATCH_SIZE,
+                 max_latency: float = DEFAULT_CENTRAL_BATCH_LATENCY,
+                 start_writer: bool = True) -> None:
+        super().__init__(batch_size, max_latency)
+        self.socket_path = Path(socket_path)
+        self.baseFilename = os.path.abspath(filename)  # pylint: disable=invalid-name
+        self.start_writer = start_writer
+        self.options = {
+            'max_bytes': max_bytes,
+            'backup_count': backup_count,
+            'compress': compress,
+            'rotate_interval': rotate_interval,
+            'max_total_bytes': max_total_bytes,
+        }
+        self.sent_records = 0
+        self.local_records = 0
+        self.local_handler: Optional[CompressingRotatingFileHandler] = None
+        self.__socket__ = None
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} {self.baseFilename} via {self.socket_path}>'
+
+    def after_fork(self) -> None:
+        """
+        Reset state and drop writer connection inherited from parent process
+        """
+        super().after_fork()
+        self.__disconnect__()
+
+    def encode_record(self, record: logging.LogRecord) -> bytes:
+        """
+        Encode formatted record as a line
+        """
+        return f'{self.format(record)}\n'.encode('utf-8')
+
+    def __connect__(self) -> socket.socket:
+        """
+        Return connection to log writer, starting the writer if necessary
+        """
+        if self.__socket__ is None:
+            try:
+                self.__socket__ = connect_log_writer(self.socket_path)
+            except OSError:
+                if not self.start_writer:
+                    raise
+                try:
+                    start_log_writer(
+                        self.socket_path,
+                        directories=[os.path.dirname(self.baseFilename)],
+                        idle_timeout=DEFAULT_LOG_WRITER_IDLE_TIMEOUT,
+                    )
+                except LoggerError as error:
+                    raise OSError(str(error)) from error
+                self.__socket__ = connect_log_writer(self.socket_path)
+            self.__socket__.settimeout(DEFAULT_LOG_WRITER_ACK_TIMEOUT)
+        return self.__socket__
+
+    def __disconnect__(self) -> None:
+        """
+        Close connection to log writer
+        """
+        if self.__socket__ is not None:
+            self.__socket__.close()
+            self.__socket__ = None
+
+    def send_batch(self, batch: List[bytes]) -> bool:
+        """
+        Send batch of formatted records to the log writer as a single frame
+
+        Batches rejected by the writer are written to the log file directly
+        """
+        data = b''.join(batch)
+        try:
+            connection = self.__connect__()
+            connection.sendall(encode_frame(self.baseFilename, self.options, data))
+            status = connection.recv(1)
+            if not status:
+                raise OSError('Log writer closed connection')
+        except OSError:
+            self.__disconnect__()
+            return False
+        if status == FRAME_REJECTED:
+            self.__write_local__(data)
+            self.local_records += len(batch)
+        else:
+            self.sent_records += len(batch)
+        return True
+
+    def __write_local__(self, data: bytes) -> None:
+        """
+        Write batch rejected by the log writer to the log file
+        """
+        if self.local_handler is None:
+            self.local_handler = CompressingRotatingFileHandler(
+                self.baseFilename,
+                mode='a',
+                maxBytes=self.options['max_bytes'],
+                backupCount=self.options['backup_count'],
+                encoding='utf-8',
+                compress=self.options['compress'],
+                rotate_interval=self.options['rotate_interval'],
+                max_total_bytes=self.options['max_total_bytes'],
+            )
+            self.local_handler.terminator = ''
+        self.local_handler.handle(logging.makeLogRecord({'msg': data.decode('utf-8', 'replace')}))
+
+    def close(self) -> None:
+        """
+        Stop background sender, send queued records and close writer connection
+        """
+        super().close()
+        with self.__send_lock__:
+            self.__disconnect__()
+            if self.local_handler is not None:
+                self.local_handler.close()
+                self.local_handler = None
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments of log writer
+    """
+    parser = argparse.ArgumentParser(prog=f'python -m {__name__}')
+    parser.add_argument('socket_path', help='Unix socket path of the log writer')
+    parser.add_argument('--directory', dest='directories', action='append', required=True,
+                        help='Directory for log files, may be given multiple times')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Exit after seconds without clients')
+    return parser.parse_args(args)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Run log writer for socket path
+    """
+    args = parse_args(args)
+    writer = LogWriter(args.socket_path, args.idle_timeout, args.directories)
+    signal.signal(signal.SIGTERM, writer.stop)
+    signal.signal(signal.SIGINT, writer.stop)
+    writer.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Log record filters for rate limiting and sampling
+
+Filters are keyed with unformatted record attributes, so records dropped by filters
+are never formatted.
+"""
+import logging
+import random
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_RATE_LIMIT_RATE = 10.0
+DEFAULT_RATE_LIMIT_BURST = 20
+DEFAULT_RATE_LIMIT_SUMMARY_INTERVAL = 60.0
+DEFAULT_RATE_LIMIT_MAX_KEYS = 10000
+# Fraction of max_keys kept when buckets are pruned at the key limit
+RATE_LIMIT_PRUNE_RATIO = 0.9
+
+DEFAULT_SAMPLING_RATES = {
+    logging.DEBUG: 0.1,
+    logging.INFO: 0.5,
+}
+
+RATE_LIMIT_SUMMARY_ATTRIBUTE = 'rate_limit_summary'
+
+
+class TokenBucket:
+    """
+    Token bucket for a rate limited record key
+    """
+    __slots__ = ('tokens', 'updated', 'suppressed', 'template', 'args')
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+        self.suppressed = 0
+        self.template = None
+        self.args = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket rate limiting filter for log records
+
+    Records are keyed by logger name, level and unformatted message template. Each key
+    may pass burst records at once and rate records per second on average. Records
+    exceeding the rate are dropped and counted.
+
+    Every summary_interval seconds a summary record with the number of suppressed records
+    is passed to the logger of the suppressed records for each key with suppressed
+    records. Summaries are sent when the filter processes the next record after the
+    interval or when send_summaries() is called. The filter should be added to loggers,
+    not to handlers, for summaries to reach all handlers of the logger.
+    """
+    def __init__(self,
+                 rate: float = DEFAULT_RATE_LIMIT_RATE,
+                 burst: int = DEFAULT_RATE_LIMIT_BURST,
+                 summary_interval: Optional[float] = DEFAULT_RATE_LIMIT_SUMMARY_INTERVAL,
+                 max_keys: int = DEFAULT_RATE_LIMIT_MAX_KEYS) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self.__buckets__: OrderedDict[Tuple, TokenBucket] = OrderedDict()
+        self.__lock__ = threading.Lock()
+        self.__next_summary__ = self.__get_next_summary__()
+
+    def __get_next_summary__(self) -> Optional[float]:
+        """
+        Return time for next summaries
+        """
+        if self.summary_interval is None:
+            return None
+        return time.monotonic() + self.summary_interval
+
+    @staticmethod
+    def get_key(record: logging.LogRecord) -> Tuple:
+        """
+        Return rate limiting key for record without formatting the message
+        """
+        msg = record.msg
+        try:
+            hash(msg)
+        except TypeError:
+            msg = type(msg)
+        return (record.name, record.levelno, msg)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Check if record is within rate limit of its key
+        """
+        if getattr(record, RATE_LIMIT_SUMMARY_ATTRIBUTE, False):
+            return True
+
+        now = time.monotonic()
+        key = self.get_key(record)
+        with self.__lock__:
+            bucket = self.__buckets__.get(key, None)
+            if bucket is None:
+                if len(self.__buckets__) >= self.max_keys:
+                    self.__prune__(now)
+                bucket = TokenBucket(self.burst, now)
+                self.__buckets__[key] = bucket
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+                self.__buckets__.move_to_end(key)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                allowed = True
+            else:
+                if not bucket.suppressed:
+                    bucket.template = record.msg
+                    bucket.args = record.args
+                bucket.suppressed += 1
+                self.suppressed += 1
+                allowed = False
+
+            summaries_due = self.__next_summary__ is not None and now >= self.__next_summary__
+
+        if summaries_due:
+            self.send_summaries()
+        return allowed
+
+    def __prune__(self, now: float) -> None:
+        """
+        Remove least recently used buckets until RATE_LIMIT_PRUNE_RATIO of max_keys are
+        left, preferring buckets which have refilled and have no suppressed records
+
+        Buckets are ordered by last use, so pruning in batches keeps the cost per new key
+        constant on average. Must be called with the lock held
+        """
+        excess = max(len(self.__buckets__) - int(self.max_keys * RATE_LIMIT_PRUNE_RATIO), 1)
+        refilled = []
+        for key, bucket in self.__buckets__.items():
+            tokens = bucket.tokens + (now - bucket.updated) * self.rate
+            if tokens >= self.burst and not bucket.suppressed:
+                refilled.append(key)
+                if len(refilled) == excess:
+                    break
+        for key in refilled:
+            del self.__buckets__[key]
+        for _count in range(excess - len(refilled)):
+            self.__buckets__.popitem(last=False)
+
+    def __collect_summaries__(self) -> List[logging.LogRecord]:
+        """
+        Return summary records for keys with suppressed records and reset the counters
+        """
+        summaries = []
+        with self.__lock__:
+            self.__next_summary__ = self.__get_next_summary__()
+            for (name, levelno, _msg), bucket in self.__buckets__.items():
+                if not bucket.suppressed:
+                    continue
+                record = logging.makeLogRecord({
+                    'name': name,
+                    'levelno': levelno,
+                    'levelname': logging.getLevelName(levelno),
+                    'msg': '%d similar messages suppressed: %s',
+                    'args': (bucket.suppressed, self.__format_template__(bucket)),
+                    RATE_LIMIT_SUMMARY_ATTRIBUTE: True,
+                })
+                summaries.append(record)
+                bucket.suppressed = 0
+                bucket.template = None
+                bucket.args = None
+        return summaries
+
+    @staticmethod
+    def __format_template__(bucket: TokenBucket) -> str:
+        """
+        Format first suppressed message of bucket for summary
+        """
+        try:
+            return str(bucket.template) % bucket.args if bucket.args else str(bucket.template)
+        except (TypeError, ValueError):
+            return str(bucket.template)
+
+    def send_summaries(self) -> None:
+        """
+        Pass summary records of suppressed records to their loggers
+        """
+        for record in self.__collect_summaries__():
+            logging.getLogger(record.name).handle(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Filter passing a random sample of records by level
+
+    Rates map log levels to the probability of passing a record at the level. Records
+    at levels not in rates are always passed.
+    """
+    def __init__(self, rates: Optional[Dict[int, float]] = None) -> None:
+        super().__init__()
+        self.rates = dict(rates if rates is not None else DEFAULT_SAMPLING_RATES)
+        self.dropped = 0
+        self.__random__ = random.random
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Check if record is included in the sample
+        """
+        rate = self.rates.get(record.levelno, None)
+        if rate is None or self.__random__() < rate:
+            return True
+        self.dropped += 1
+        return False
@@ -0,0 +1,257 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Log record formatters
+"""
+import json
+import logging
+import re
+import time
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..encoders import DateTimeEncoder
+from ..exceptions import LoggerError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND_JSON = 'json'
+JSON_BACKEND_ORJSON = 'orjson'
+JSON_BACKENDS = (JSON_BACKEND_JSON, JSON_BACKEND_ORJSON)
+
+DEFAULT_JSON_LOG_FIELDS = ('timestamp', 'level', 'logger', 'message', 'extra', 'exc_info')
+
+# Attributes of every LogRecord, other attributes are extra fields given to the logging call
+LOG_RECORD_ATTRIBUTES = frozenset(
+    tuple(vars(logging.LogRecord('', logging.NOTSET, '', 0, '', (), None))) + ('message', 'asctime', 'taskName')
+)
+
+DATETIME_ENCODER = DateTimeEncoder()
+
+# Named conversion specifiers of %-style log format strings
+PERCENT_FORMAT_FIELD_PATTERN = re.compile(
+    r'%(?:\((?P<name>[^)]+)\)(?P<spec>[#0+ -]*\d*(?:\.\d+)?[diouxXeEfFgGcrsa])|(?P<percent>%))'
+)
+
+
+def encode_json_default(value: Any) -> Any:
+    """
+    Encode values not supported by JSON encoders
+
+    Dates and times are encoded like DateTimeEncoder does and other unsupported values
+    as strings, so unexpected extra fields never prevent logging the record
+    """
+    try:
+        return DATETIME_ENCODER.default(value)
+    except TypeError:
+        return str(value)
+
+
+def get_record_extra(record: logging.LogRecord) -> Dict[str, Any]:
+    """
+    Return extra fields of a log record
+    """
+    attributes = record.__dict__
+    if attributes.keys() <= LOG_RECORD_ATTRIBUTES:
+        return {}
+    return {key: value for key, value in attributes.items() if key not in LOG_RECORD_ATTRIBUTES}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter for log records as JSON objects on a single line
+
+    Fields are names of output fields in output order. Following fields are supported
+    in addition to attributes of LogRecord:
+
+    - timestamp: record creation time in UTC as ISO format string
+    - level: record level name
+    - logger: logger name
+    - message: formatted log message
+    - extra: object with extra fields given to the logging call, omitted if empty
+    - exc_info: formatted exception and stack information, omitted if empty
+
+    Datetime values in extra fields are encoded like DateTimeEncoder does and other
+    values not supported by JSON as strings. The orjson backend is used if it's
+    installed, unless backend is set explicitly.
+    """
+    def __init__(self,
+                 fields: Tuple[str] = DEFAULT_JSON_LOG_FIELDS,
+                 backend: Optional[str] = None) -> None:
+        super().__init__()
+        if backend is None:
+            backend = JSON_BACKEND_ORJSON if orjson is not None else JSON_BACKEND_JSON
+        if backend not in JSON_BACKENDS:
+            raise LoggerError(f'Unknown JSON backend: {backend}')
+        if backend == JSON_BACKEND_ORJSON and orjson is None:
+            raise LoggerError('JSON backend orjson is not installed')
+        self.fields = tuple(fields)
+        self.backend = backend
+        self.__getters__ = self.__compile__()
+        self.__encoder__ = self.__get_encoder__()
+
+    def __compile__(self) -> List[Tuple[str, Callable, bool]]:
+        """
+        Compile field names to list of field name, value getter and flag to omit
+        empty values
+        """
+        getters = {
+            'timestamp': self.__get_timestamp__,
+            'level': lambda record: record.levelname,
+            'logger': lambda record: record.name,
+            'message': lambda record: record.getMessage(),
+            'extra': get_record_extra,
+            'exc_info': self.__get_exc_info__,
+        }
+        fields = []
+        for field in self.fields:
+            if field in getters:
+                fields.append((field, getters[field], field in ('extra', 'exc_info')))
+            elif field in LOG_RECORD_ATTRIBUTES:
+                fields.append((field, lambda record, attr=field: getattr(record, attr, None), False))
+            else:
+                raise LoggerError(f'Unknown JSON log field: {field}')
+        return fields
+
+    def __get_encoder__(self) -> Callable:
+        """
+        Return function to encode a dictionary as JSON string
+        """
+        if self.backend == JSON_BACKEND_ORJSON:
+            options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+            def encode(data: Dict) -> str:
+                return orjson.dumps(data, default=encode_json_default, option=options).decode('utf-8')
+            return encode
+
+        encoder = json.JSONEncoder(default=encode_json_default, ensure_ascii=False, separators=(',', ':'))
+        return encoder.encode
+
+    @staticmethod
+    def __get_timestamp__(record: logging.LogRecord) -> str:
+        """
+        Return record creation time as ISO format string in UTC
+        """
+        return datetime.fromtimestamp(record.created, timezone.utc).isoformat()
+
+    def __get_exc_info__(self, record: logging.LogRecord) -> Optional[str]:
+        """
+        Return formatted exception and stack information for record
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        value = record.exc_text
+        if record.stack_info:
+            stack = self.formatStack(record.stack_info)
+            value = f'{value}\n{stack}' if value else stack
+        return value
+
+    def as_dict(self, record: logging.LogRecord) -> Dict[str, Any]:
+        """
+        Return fields of record as dictionary
+        """
+        data = {}
+        for field, getter, omit_empty in self.__getters__:
+            value = getter(record)
+            if omit_empty and not value:
+                continue
+            data[field] = value
+        return data
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format record as a JSON object
+        """
+        return self.__encoder__(self.as_dict(record))
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Formatter caching rendered timestamps and parsing the format string only once
+
+    The timestamp is rendered with strftime only when the second of record creation
+    time changes. Format strings with %-style named fields are parsed to a list of
+    literal text and field specifiers when the formatter is created, instead of
+    interpolating the record attribute dictionary for every record. Output is identical
+    to logging.Formatter. Other format styles are formatted by logging.Formatter.
+    """
+    def __init__(self,
+                 fmt: Optional[str] = None,
+                 datefmt: Optional[str] = None,
+                 style: str = '%',
+                 validate: bool = True) -> None:
+        super().__init__(fmt, datefmt, style, validate)
+        self.__fields__ = self.__parse__() if style == '%' else None
+        self.__uses_time__ = super().usesTime()
+        self.__time_cache__: Tuple[Optional[int], Optional[str], str] = (None, None, '')
+
+    def __parse__(self) -> Optional[List[Tuple[str, str, Optional[str]]]]:
+        """
+        Parse format string to list of preceding literal text, record attribute name and
+        conversion specifier, or None for plain %s conversions
+
+        Literal text after the last field is stored as a field with empty name. Returns
+        None if the format string can't be parsed.
+        """
+        fields = []
+        literal = ''
+        offset = 0
+        for match in PERCENT_FORMAT_FIELD_PATTERN.finditer(self._fmt):
+            literal += self._fmt[offset:match.start()]
+            offset = match.end()
+            if match.group('percent'):
+                literal += '%'
+                continue
+            spec = match.group('spec')
+            fields.append((literal, match.group('name'), None if spec == 's' else f'%{spec}'))
+            literal = ''
+        literal += self._fmt[offset:]
+        if '%' in literal.replace('%%', ''):
+            return None
+        fields.append((literal, '', None))
+        return fields
+
+    def usesTime(self) -> bool:
+        """
+        Check if format string uses asctime
+        """
+        return self.__uses_time__
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """
+        Return creation time of record, rendering it only if the second has changed
+        """
+        second = int(record.created)
+        cached = self.__time_cache__
+        if cached[0] != second or cached[1] != datefmt:
+            rendered = time.strftime(datefmt or self.default_time_format, self.converter(record.created))
+            cached = (second, datefmt, rendered)
+            self.__time_cache__ = cached
+        if datefmt or not self.default_msec_format:
+            return cached[2]
+        return self.default_msec_format % (cached[2], record.msecs)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """
+        Format record attributes with parsed format string fields
+        """
+        if self.__fields__ is None:
+            return super().formatMessage(record)
+        values = record.__dict__
+        parts = []
+        try:
+            for literal, name, spec in self.__fields__:
+                parts.append(literal)
+                if name:
+                    value = values[name]
+                    parts.append(str(value) if spec is None else spec % (value,))
+        except KeyError as error:
+            raise ValueError(f'Formatting field not found in record: {error}') from error
+        return ''.join(parts)
@@ -0,0 +1,264 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Batched HTTP log handler
+
+Log records are encoded as newline delimited JSON and sent in batches from a
+background thread over a persistent HTTP connection. Batches that can't be sent
+after retries are spooled to disk and sent again when the endpoint recovers.
+Batches that can't be spooled are dropped.
+"""
+import gzip
+import http.client
+import json
+import logging
+import os
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+from ..encoders import DateTimeEncoder
+from ..exceptions import LoggerError
+from .batch import BatchHandler
+
+DEFAULT_HTTP_BATCH_SIZE = 100
+DEFAULT_HTTP_BATCH_LATENCY = 1.0
+DEFAULT_HTTP_TIMEOUT = 10.0
+DEFAULT_HTTP_RETRIES = 3
+DEFAULT_HTTP_BACKOFF = 0.5
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+SPOOL_FILE_EXTENSION = '.ndjson'
+SPOOL_FILE_COMPRESSED_EXTENSION = '.ndjson.gz'
+SPOOL_FILE_CLAIMED_EXTENSION = '.sending'
+
+
+class BatchHTTPHandler(BatchHandler):
+    """
+    Logging handler sending records to a HTTP endpoint in batches
+
+    Records are encoded as JSON lines and collected to batches sent when batch_size
+    records are queued or the oldest queued record is max_latency seconds old. Batches
+    are sent from a background thread over a keep-alive connection, optionally gzip
+    compressed. Failed requests are retried retries times with exponential backoff,
+    after which the batch is written to spool_directory if it is set. Spooled batches
+    are sent after the next successful request. Batches which can't be spooled are
+    counted in dropped attribute and reported with handleError.
+
+    Spooled files are claimed by renaming them before sending, so handlers sharing a
+    spool directory send each file once.
+
+    If the handler has a formatter, the formatted record is used as the JSON line.
+    Otherwise the line contains time, level, logger and message of the record.
+    """
+    def __init__(self,
+                 url: str,
+                 method: str = 'POST',
+                 batch_size: int = DEFAULT_HTTP_BATCH_SIZE,
+                 max_latency: float = DEFAULT_HTTP_BATCH_LATENCY,
+                 compress: bool = False,
+                 timeout: float = DEFAULT_HTTP_TIMEOUT,
+                 retries: int = DEFAULT_HTTP_RETRIES,
+                 backoff: float = DEFAULT_HTTP_BACKOFF,
+                 spool_directory: Optional[Union[str, Path]] = None,
+                 headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(batch_size, max_latency)
+        scheme, netloc, path, _params, query = urlparse(url)[:5]
+        if not netloc or scheme not in ('http', 'https'):
+            raise LoggerError(f'Invalid URL: {url}')
+        self.url = url
+        self.host = netloc
+        self.secure = scheme == 'https'
+        self.path = f'{path or "/"}?{query}' if query else path or '/'
+        self.method = method.upper()
+        self.compress = compress
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.spool_directory = Path(spool_directory) if spool_directory is not None else None
+        self.headers = headers if headers is not None else {}
+
+        self.sent_batches = 0
+        self.sent_records = 0
+        self.spooled_batches = 0
+        self.__connection__ = None
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} {self.method} {self.url}>'
+
+    def encode_record(self, record: logging.LogRecord) -> bytes:
+        """
+        Encode record as a JSON line
+        """
+        if self.formatter is not None:
+            line = self.format(record)
+        else:
+            line = json.dumps(
+                {
+                    'time': datetime.fromtimestamp(record.created, timezone.utc),
+                    'level': record.levelname,
+                    'logger': record.name,
+                    'message': record.getMessage(),
+                },
+                cls=DateTimeEncoder
+            )
+        return f'{line}\n'.encode('utf-8')
+
+    def after_fork(self) -> None:
+        """
+        Reset state and drop connection inherited from parent process
+        """
+        super().after_fork()
+        self.__close_connection__()
+
+    def __get_connection__(self) -> http.client.HTTPConnection:
+        """
+        Return persistent connection to the endpoint
+        """
+        if self.__connection__ is None:
+            if self.secure:
+                self.__connection__ = http.client.HTTPSConnection(self.host, timeout=self.timeout)
+            else:
+                self.__connection__ = http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return self.__connection__
+
+    def __close_connection__(self) -> None:
+        """
+        Close persistent connection to the endpoint
+        """
+        if self.__connection__ is not None:
+            self.__connection__.close()
+            self.__connection__ = None
+
+    def __post__(self, body: bytes, compressed: bool) -> None:
+        """
+        Send request body to the endpoint, raising LoggerError for error responses
+        """
+        headers = {
+            'Content-Type': NDJSON_CONTENT_TYPE,
+            **self.headers,
+        }
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        connection = self.__get_connection__()
+        connection.request(self.method, self.path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.will_close:
+            self.__close_connection__()
+        if not 200 <= response.status < 300:
+            raise LoggerError(f'Error sending logs to {self.url}: HTTP {response.status} {response.reason}')
+
+    def __post_with_retries__(self, body: bytes, compressed: bool) -> None:
+        """
+        Send request body with retries, raising the error of the last attempt
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                self.__post__(body, compressed)
+                return
+            except (OSError, http.client.HTTPException, LoggerError):
+                self.__close_connection__()
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def send_batch(self, batch: List[bytes]) -> bool:
+        """
+        Send batch of encoded records, spooling the batch if sending fails
+
+        Batches which can't be spooled are dropped
+        """
+        body = b''.join(batch)
+        if self.compress:
+            body = gzip.compress(body)
+        try:
+            self.__post_with_retries__(body, self.compress)
+        except (OSError, http.client.HTTPException, LoggerError):
+            if not self.__spool__(body, self.compress):
+                self.dropped += len(batch)
+                self.handleError(logging.makeLogRecord({
+                    'msg': 'Dropped batch of %d records to %s',
+                    'args': (len(batch), self.url),
+                }))
+            return True
+        self.sent_batches += 1
+        self.sent_records += len(batch)
+        self.__send_spooled__()
+        return True
+
+    def __spool__(self, body: bytes, compressed: bool) -> bool:
+        """
+        Write request body to spool directory. Returns True if the body was spooled
+        """
+        if self.spool_directory is None:
+            return False
+        extension = SPOOL_FILE_COMPRESSED_EXTENSION if compressed else SPOOL_FILE_EXTENSION
+        path = self.spool_directory.joinpath(f'{time.time_ns():020d}-{os.getpid()}{extension}')
+        tmpfile = path.with_name(f'.{path.name}.tmp')
+        try:
+            self.spool_directory.mkdir(parents=True, exist_ok=True)
+            tmpfile.write_bytes(body)
+            os.replace(tmpfile, path)
+        except OSError:
+            return False
+        self.spooled_batches += 1
+        return True
+
+    @property
+    def spooled_files(self) -> List[Path]:
+        """
+        Spooled request bodies in spool directory, oldest first
+        """
+        if self.spool_directory is None or not self.spool_directory.is_dir():
+            return []
+        return sorted(
+            path
+            for path in self.spool_directory.iterdir()
+            if not path.name.startswith('.') and path.name.endswith(
+                (SPOOL_FILE_EXTENSION, SPOOL_FILE_COMPRESSED_EXTENSION)
+            )
+        )
+
+    def __send_spooled__(self) -> None:
+        """
+        Send spooled request bodies, stopping at first failure
+
+        Each file is claimed by renaming it to a hidden file before sending. Files
+        claimed by another handler sharing the spool directory are skipped, and files
+        failing to send are renamed back to be sent again.
+        """
+        for path in self.spooled_files:
+            claimed = path.with_name(f'.{path.name}{SPOOL_FILE_CLAIMED_EXTENSION}')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return
+            try:
+                body = claimed.read_bytes()
+                self.__post__(body, path.name.endswith(SPOOL_FILE_COMPRESSED_EXTENSION))
+            except (OSError, http.client.HTTPException, LoggerError):
+                self.__close_connection__()
+                try:
+                    os.rename(claimed, path)
+                except OSError:
+                    pass
+                return
+            claimed.unlink(missing_ok=True)
+            self.sent_batches += 1
+
+    def close(self) -> None:
+        """
+        Stop background sender, send queued records and close the connection
+        """
+        super().close()
+        with self.__send_lock__:
+            self.__close_connection__()
@@ -0,0 +1,191 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Ring buffer log handler keeping recent records for context of errors
+"""
+import logging
+
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_RING_BUFFER_SIZE = 1000
+DEFAULT_RING_BUFFER_TRIGGER_LEVEL = logging.ERROR
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Handler keeping last capacity records in a preallocated ring buffer
+
+    Records below pass_level are stored unformatted in the ring, overwriting the oldest
+    record when the ring is full. When a record at or above trigger_level arrives, the
+    stored records are passed to the target handlers in order before the triggering
+    record. Records at or above pass_level are passed to target handlers immediately.
+
+    Target handlers are looked up by record logger name from logger_handlers, falling
+    back to handlers given to the constructor. Levels of target handlers are respected.
+
+    Loggers with handlers replaced by RingBufferLoggerHandler objects should not
+    propagate records, because records below their previous level would reach handlers
+    of ancestor loggers. The propagate dictionary maps names of such loggers to their
+    original propagate flag, and the handler passes records to handlers of ancestor
+    loggers when the flag was set.
+    """
+    def __init__(self,
+                 capacity: int = DEFAULT_RING_BUFFER_SIZE,
+                 trigger_level: int = DEFAULT_RING_BUFFER_TRIGGER_LEVEL,
+                 pass_level: Optional[int] = None,
+                 handlers: Optional[List[logging.Handler]] = None) -> None:
+        super().__init__()
+        self.capacity = capacity
+        self.trigger_level = trigger_level
+        self.pass_level = pass_level
+        self.targets: Tuple[logging.Handler] = tuple(handlers) if handlers is not None else ()
+        self.logger_handlers: Dict[str, Tuple[logging.Handler]] = {}
+        self.propagate: Dict[str, bool] = {}
+        self.__records__: List[Optional[logging.LogRecord]] = [None] * capacity
+        self.__names__: List[Optional[str]] = [None] * capacity
+        self.__index__ = 0
+        self.__count__ = 0
+
+    def __len__(self) -> int:
+        return self.__count__
+
+    def add_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Add target handler for records of named logger
+        """
+        self.logger_handlers[name] = self.logger_handlers.get(name, ()) + (handler,)
+
+    def remove_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Remove target handler for records of named logger
+        """
+        self.logger_handlers[name] = tuple(item for item in self.logger_handlers.get(name, ()) if item is not handler)
+
+    @property
+    def records(self) -> List[logging.LogRecord]:
+        """
+        Stored records, oldest first
+        """
+        start = (self.__index__ - self.__count__) % self.capacity
+        return [self.__records__[(start + offset) % self.capacity] for offset in range(self.__count__)]
+
+    def __take__(self) -> List[Tuple[str, logging.LogRecord]]:
+        """
+        Remove stored records from the ring, returning records with logger names oldest first
+        """
+        capacity = self.capacity
+        records = self.__records__
+        names = self.__names__
+        start = (self.__index__ - self.__count__) % capacity
+        items = []
+        for offset in range(self.__count__):
+            index = (start + offset) % capacity
+            items.append((names[index], records[index]))
+            records[index] = None
+            names[index] = None
+        self.__index__ = 0
+        self.__count__ = 0
+        return items
+
+    @staticmethod
+    def __call_handlers__(handlers: Tuple[logging.Handler], record: logging.LogRecord) -> None:
+        """
+        Pass record to handlers with level at or below record level
+        """
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def dispatch(self, record: logging.LogRecord, name: Optional[str] = None) -> None:
+        """
+        Pass record to target handlers of named logger, by default the record logger, and
+        to handlers of its ancestors if the logger propagated records
+        """
+        name = name if name is not None else record.name
+        self.__call_handlers__(self.logger_handlers.get(name, self.targets), record)
+        if not self.propagate.get(name, False):
+            return
+        logger = logging.getLogger(name).parent
+        while logger is not None:
+            if logger.name in self.propagate:
+                self.__call_handlers__(self.logger_handlers.get(logger.name, ()), record)
+                if not self.propagate[logger.name]:
+                    break
+            else:
+                self.__call_handlers__(logger.handlers, record)
+                if not logger.propagate:
+                    break
+            logger = logger.parent
+
+    def dump(self) -> None:
+        """
+        Pass stored records to target handlers and clear the ring
+        """
+        for name, record in self.__take__():
+            self.dispatch(record, name)
+
+    def clear(self) -> None:
+        """
+        Remove stored records
+        """
+        self.__take__()
+
+    def process(self, name: str, record: logging.LogRecord) -> None:
+        """
+        Store record of named logger, or pass it to target handlers with stored records
+        """
+        levelno = record.levelno
+        with self.lock:
+            if levelno >= self.trigger_level:
+                self.dump()
+                self.dispatch(record, name)
+            elif self.pass_level is not None and levelno >= self.pass_level:
+                self.dispatch(record, name)
+            else:
+                self.__records__[self.__index__] = record
+                self.__names__[self.__index__] = name
+                self.__index__ = (self.__index__ + 1) % self.capacity
+                if self.__count__ < self.capacity:
+                    self.__count__ += 1
+
+    def get_logger_handler(self, name: str) -> 'RingBufferLoggerHandler':
+        """
+        Return handler passing records to the ring buffer as records of named logger
+        """
+        return RingBufferLoggerHandler(self, name)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Store record, or pass it to target handlers with stored records
+        """
+        self.process(record.name, record)
+
+    def close(self) -> None:
+        """
+        Drop stored records and close the handler
+        """
+        self.clear()
+        super().close()
+
+
+class RingBufferLoggerHandler(logging.Handler):
+    """
+    Handler attached to a logger in place of its handlers, passing records to ring buffer
+    as records of the logger
+
+    Records propagated from child loggers are passed as records of the logger the handler
+    is attached to, so they are dispatched to handlers of the logger.
+    """
+    def __init__(self, ring_buffer: RingBufferHandler, logger_name: str) -> None:
+        super().__init__()
+        self.ring_buffer = ring_buffer
+        self.logger_name = logger_name
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Pass record to ring buffer
+        """
+        self.ring_buffer.process(self.logger_name, record)
@@ -0,0 +1,259 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Rotating log file handler with background compression
+
+Rotation renames the active log file to a timestamped name with a single rename in
+the logging call. Compressing rotated files and removing old files is done in a
+background thread.
+"""
+import gzip
+import logging
+import logging.handlers
+import lzma
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import weakref
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Union
+
+from ..exceptions import LoggerError
+
+LOG_COMPRESSION_GZIP = 'gzip'
+LOG_COMPRESSION_XZ = 'xz'
+LOG_COMPRESSION_EXTENSIONS = {
+    LOG_COMPRESSION_GZIP: '.gz',
+    LOG_COMPRESSION_XZ: '.xz',
+}
+LOG_COMPRESSION_OPENERS = {
+    LOG_COMPRESSION_GZIP: gzip.open,
+    LOG_COMPRESSION_XZ: lzma.open,
+}
+
+ROTATED_LOG_TIMESTAMP_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler compressing rotated files in a background thread
+
+    The log file is rotated when it would exceed maxBytes or, if rotate_interval is set,
+    when rotate_interval seconds have passed since the file was opened or rotated.
+    Rotated files are named with the rotation time as <filename>.<timestamp> and
+    compressed with gzip or xz by a background thread.
+
+    After compression, the newest backupCount rotated files are kept, or all files if
+    backupCount is 0. If max_total_bytes is set, older rotated files are also removed
+    while the total size of rotated files exceeds it.
+
+    The background worker is not inherited by forked child processes. A child starts
+    a worker of its own when it rotates the file.
+    """
+    def __init__(self,
+                 filename: Union[str, Path],
+                 mode: str = 'a',
+                 maxBytes: int = 0,  # pylint: disable=invalid-name
+                 backupCount: int = 0,  # pylint: disable=invalid-name
+                 encoding: Optional[str] = None,
+                 delay: bool = False,
+                 compress: Optional[str] = LOG_COMPRESSION_GZIP,
+                 rotate_interval: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None) -> None:
+        if compress is not None and compress not in LOG_COMPRESSION_EXTENSIONS:
+            raise LoggerError(f'Unsupported log compression: {compress}')
+        self.__regular_file__ = True
+        super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
+        self.compress = compress
+        self.rotate_interval = rotate_interval
+        self.max_total_bytes = max_total_bytes
+        self.__rollover_at__ = self.__next_rollover__()
+        self.__rotated_pattern__ = re.compile(
+            rf'^{re.escape(os.path.basename(self.baseFilename))}\.(\d{{20}})(\.gz|\.xz)?$'
+        )
+        self.__jobs__ = queue.Queue()
+        self.__worker__ = None
+        self.__worker_lock__ = threading.Lock()
+
+        if hasattr(os, 'register_at_fork'):
+            after_fork = weakref.WeakMethod(self.after_fork)
+            os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def after_fork(self) -> None:
+        """
+        Reset background worker state in a forked child process
+
+        The worker thread does not exist in the child and files queued by the parent are
+        processed by the parent.
+        """
+        self.__jobs__ = queue.Queue()
+        self.__worker__ = None
+        self.__worker_lock__ = threading.Lock()
+
+    def __next_rollover__(self) -> Optional[float]:
+        """
+        Return time of next time based rollover
+        """
+        if not self.rotate_interval:
+            return None
+        return time.time() + self.rotate_interval
+
+    @property
+    def rotated_files(self) -> List[Path]:
+        """
+        Rotated log files, oldest first
+        """
+        directory = Path(self.baseFilename).parent
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted(
+            (directory.joinpath(name) for name in names if self.__rotated_pattern__.match(name)),
+            key=lambda path: self.__rotated_pattern__.match(path.name).group(1)
+        )
+
+    def _open(self):
+        """
+        Open log file and check if it's a regular file which can be rotated
+        """
+        stream = super()._open()
+        self.__regular_file__ = os.path.isfile(self.baseFilename)
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """
+        Check if log file should be rotated by time or size
+
+        Unlike RotatingFileHandler, the file type is checked only when the file is
+        opened instead of for every record. Files other than regular files are never
+        rotated.
+        """
+        if self.stream is None:
+            self.stream = self._open()
+        if not self.__regular_file__:
+            return False
+        if self.__rollover_at__ is not None and time.time() >= self.__rollover_at__:
+            return True
+        if self.maxBytes > 0:
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.maxBytes
+        return False
+
+    def doRollover(self) -> None:
+        """
+        Rename log file to a timestamped name and queue it for compression
+        """
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            now = datetime.now()
+            while True:
+                rotated = f'{self.baseFilename}.{now.strftime(ROTATED_LOG_TIMESTAMP_FORMAT)}'
+                if not any(
+                        os.path.exists(f'{rotated}{extension}')
+                        for extension in ('', *LOG_COMPRESSION_EXTENSIONS.values())):
+                    break
+                now += timedelta(microseconds=1)
+            os.rename(self.baseFilename, rotated)
+            self.__queue_job__()
+
+        if not self.delay:
+            self.stream = self._open()
+        self.__rollover_at__ = self.__next_rollover__()
+
+    def __queue_job__(self) -> None:
+        """
+        Queue processing of rotated files for background worker, starting the worker
+        """
+        with self.__worker_lock__:
+            if self.__worker__ is None:
+                self.__worker__ = threading.Thread(
+                    target=self.__run_worker__,
+                    name=f'{self.__class__.__name__} {self.baseFilename}',
+                    daemon=True
+                )
+                self.__worker__.start()
+        self.__jobs__.put(True)
+
+    def __run_worker__(self) -> None:
+        """
+        Background thread compressing and removing rotated files
+        """
+        while True:
+            job = self.__jobs__.get()
+            try:
+                if job is None:
+                    return
+                self.process_rotated_files()
+            finally:
+                self.__jobs__.task_done()
+
+    def __compress_file__(self, path: Path) -> None:
+        """
+        Compress rotated file and remove the uncompressed file
+        """
+        target = path.with_name(f'{path.name}{LOG_COMPRESSION_EXTENSIONS[self.compress]}')
+        tmpfile = path.with_name(f'.{target.name}.tmp')
+        with path.open('rb') as source:
+            with LOG_COMPRESSION_OPENERS[self.compress](tmpfile, 'wb') as destination:
+                shutil.copyfileobj(source, destination)
+        shutil.copystat(path, tmpfile)
+        os.replace(tmpfile, target)
+        path.unlink()
+
+    def process_rotated_files(self) -> None:
+        """
+        Compress uncompressed rotated files and remove rotated files exceeding
+        backupCount and max_total_bytes
+
+        Errors are reported with logging.lastResort, so the background worker keeps
+        running and wait_rotated() returns
+        """
+        try:
+            if self.compress is not None:
+                for path in self.rotated_files:
+                    if self.__rotated_pattern__.match(path.name).group(2) is None:
+                        self.__compress_file__(path)
+
+            total_size = 0
+            for count, path in enumerate(reversed(self.rotated_files), start=1):
+                total_size += path.stat().st_size
+                if (self.backupCount and count > self.backupCount) or \
+                        (self.max_total_bytes is not None and total_size > self.max_total_bytes):
+                    path.unlink()
+        except Exception as error:  # pylint: disable=broad-except
+            logging.lastResort.handle(
+                logging.makeLogRecord({
+                    'msg': f'Error processing rotated log files of {self.baseFilename}: {error}',
+                    'levelno': logging.ERROR,
+                    'levelname': 'ERROR',
+                })
+            )
+
+    def wait_rotated(self) -> None:
+        """
+        Wait until queued rotated files have been processed
+        """
+        self.__jobs__.join()
+
+    def close(self) -> None:
+        """
+        Close log file and stop background worker after processing queued files
+        """
+        with self.__worker_lock__:
+            worker = self.__worker__
+            self.__worker__ = None
+        if worker is not None:
+            self.__jobs__.put(None)
+            worker.join()
+        super().close()
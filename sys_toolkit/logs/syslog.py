@@ -0,0 +1,293 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Batched syslog log handler
+
+Records are sent to syslog in batches from a background thread. Stream sockets get
+a batch of octet counted frames in a single write and datagram sockets get a batch
+of datagrams with a single sendmmsg call where the C library provides it.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import logging.handlers
+import os
+import socket
+
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .batch import BatchHandler
+
+DEFAULT_SYSLOG_BATCH_SIZE = 256
+DEFAULT_SYSLOG_BATCH_LATENCY = 0.1
+DEFAULT_SYSLOG_TIMEOUT = 5.0
+DEFAULT_SYSLOG_RECONNECT_INTERVAL = 1.0
+
+# Maximum number of messages in one sendmmsg call (UIO_MAXIOV)
+SENDMMSG_MAX_MESSAGES = 1024
+
+
+class IOVec(ctypes.Structure):
+    """
+    C struct iovec
+    """
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+class MsgHdr(ctypes.Structure):
+    """
+    C struct msghdr
+    """
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class MMsgHdr(ctypes.Structure):
+    """
+    C struct mmsghdr
+    """
+    _fields_ = [
+        ('msg_hdr', MsgHdr),
+        ('msg_len', ctypes.c_uint),
+    ]
+
+
+def get_sendmmsg() -> Optional[Callable]:
+    """
+    Return sendmmsg function from C library or None if it's not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        function = libc.sendmmsg
+    except (AttributeError, OSError, TypeError):
+        return None
+    function.argtypes = [ctypes.c_int, ctypes.POINTER(MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    function.restype = ctypes.c_int
+    return function
+
+
+SENDMMSG = get_sendmmsg()
+
+
+def sendmmsg(sock: socket.socket, datagrams: List[bytes]) -> int:
+    """
+    Send datagrams to a connected socket with one sendmmsg system call
+
+    Returns number of datagrams sent, which may be less than number of datagrams. Raises
+    OSError if the first datagram can't be sent.
+    """
+    count = min(len(datagrams), SENDMMSG_MAX_MESSAGES)
+    buffers = [ctypes.create_string_buffer(datagram, len(datagram)) for datagram in datagrams[:count]]
+    vectors = (IOVec * count)()
+    messages = (MMsgHdr * count)()
+    for index, buffer in enumerate(buffers):
+        vectors[index].iov_base = ctypes.addressof(buffer)
+        vectors[index].iov_len = len(buffer)
+        messages[index].msg_hdr.msg_iov = ctypes.pointer(vectors[index])
+        messages[index].msg_hdr.msg_iovlen = 1
+    sent = SENDMMSG(sock.fileno(), messages, count, 0)  # pylint: disable=not-callable
+    if sent < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return sent
+
+
+class BatchSysLogHandler(BatchHandler):
+    """
+    Logging handler sending records to syslog in batches
+
+    Messages use the same format as logging.handlers.SysLogHandler. The priority and
+    ident prefix is rendered once per level name and cached. On stream sockets the
+    messages are framed with octet counting (RFC 6587) and a batch is written with one
+    sendall call. On datagram sockets each message is sent as a datagram, with one
+    sendmmsg call per batch where available.
+
+    The socket is connected lazily by the sender thread, so logging calls never wait
+    for the connection. If the connection fails, queued records are kept and connecting
+    is retried every reconnect_interval seconds.
+
+    :param address: unix socket path or (host, port) tuple
+    :param facility: syslog facility as number or name
+    :param socktype: socket type, unix sockets try datagram and stream sockets if not set
+    """
+    append_nul = True
+    """Append NUL byte to datagram messages like SysLogHandler"""
+
+    def __init__(self,
+                 address: Union[str, Tuple[str, int]],
+                 facility: Union[int, str] = logging.handlers.SysLogHandler.LOG_USER,
+                 socktype: Optional[int] = None,
+                 batch_size: int = DEFAULT_SYSLOG_BATCH_SIZE,
+                 max_latency: float = DEFAULT_SYSLOG_BATCH_LATENCY,
+                 timeout: float = DEFAULT_SYSLOG_TIMEOUT,
+                 reconnect_interval: float = DEFAULT_SYSLOG_RECONNECT_INTERVAL,
+                 ident: str = '') -> None:
+        super().__init__(batch_size, max_latency, retry_interval=reconnect_interval)
+        if isinstance(facility, str):
+            facility = logging.handlers.SysLogHandler.facility_names[facility]
+        self.address = address
+        self.facility = facility
+        self.socktype = socktype
+        self.timeout = timeout
+        self.ident = ident
+        self.unixsocket = isinstance(address, str)
+
+        self.sent_batches = 0
+        self.sent_records = 0
+        self.__socket__ = None
+        self.__stream__ = False
+        self.__prefixes__: Dict[str, bytes] = {}
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} {self.address}>'
+
+    @property
+    def connected(self) -> bool:
+        """
+        Check if the handler has a connected socket
+        """
+        return self.__socket__ is not None
+
+    def after_fork(self) -> None:
+        """
+        Reset state and drop socket inherited from parent process
+        """
+        super().after_fork()
+        self.__disconnect__()
+
+    def get_prefix(self, levelname: str) -> bytes:
+        """
+        Return cached priority and ident prefix for level name
+        """
+        prefix = self.__prefixes__.get(levelname, None)
+        if prefix is None:
+            priority = logging.handlers.SysLogHandler.priority_names[
+                logging.handlers.SysLogHandler.priority_map.get(levelname, 'warning')
+            ]
+            prefix = f'<{(self.facility << 3) | priority}>{self.ident}'.encode('utf-8')
+            self.__prefixes__[levelname] = prefix
+        return prefix
+
+    def encode_record(self, record: logging.LogRecord) -> bytes:
+        """
+        Encode record as syslog message
+
+        Framing for stream sockets is added when the batch is sent, because the socket
+        type of unix sockets is known only after connecting
+        """
+        return self.get_prefix(record.levelname) + self.format(record).encode('utf-8')
+
+    def __create_socket__(self, socktype: int) -> socket.socket:
+        """
+        Create socket of given type connected to the syslog address
+        """
+        if self.unixsocket:
+            sock = socket.socket(socket.AF_UNIX, socktype)
+            address = self.address
+        else:
+            host, port = self.address
+            family, socktype, proto, _name, address = socket.getaddrinfo(host, port, 0, socktype)[0]
+            sock = socket.socket(family, socktype, proto)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def __connect__(self) -> socket.socket:
+        """
+        Return connected socket, connecting if necessary
+        """
+        if self.__socket__ is None:
+            if self.socktype is not None:
+                socktypes = (self.socktype,)
+            elif self.unixsocket:
+                socktypes = (socket.SOCK_DGRAM, socket.SOCK_STREAM)
+            else:
+                socktypes = (socket.SOCK_DGRAM,)
+            for index, socktype in enumerate(socktypes):
+                try:
+                    self.__socket__ = self.__create_socket__(socktype)
+                    self.__stream__ = socktype == socket.SOCK_STREAM
+                    break
+                except OSError:
+                    if index == len(socktypes) - 1:
+                        raise
+        return self.__socket__
+
+    def __disconnect__(self) -> None:
+        """
+        Close connected socket
+        """
+        if self.__socket__ is not None:
+            self.__socket__.close()
+            self.__socket__ = None
+
+    def __send_datagrams__(self, sock: socket.socket, batch: List[bytes]) -> None:
+        """
+        Send messages as datagrams, removing sent messages from the batch
+
+        Messages too large for a datagram are dropped
+        """
+        datagrams = [message + b'\000' for message in batch] if self.append_nul else batch
+        offset = 0
+        try:
+            while offset < len(datagrams):
+                try:
+                    if SENDMMSG is not None:
+                        offset += sendmmsg(sock, datagrams[offset:])
+                    else:
+                        sock.send(datagrams[offset])
+                        offset += 1
+                except OSError as error:
+                    if error.errno != errno.EMSGSIZE:
+                        raise
+                    self.dropped += 1
+                    offset += 1
+        finally:
+            self.sent_records += offset
+            del batch[:offset]
+
+    def send_batch(self, batch: List[bytes]) -> bool:
+        """
+        Send batch of messages with as few system calls as the socket allows
+
+        Returns False if the socket can't be connected or sending fails. Messages of the
+        batch which were sent before a datagram send failed are not sent again.
+        """
+        try:
+            sock = self.__connect__()
+            if self.__stream__:
+                sock.sendall(b''.join(b'%d %s' % (len(message), message) for message in batch))
+                self.sent_records += len(batch)
+            else:
+                self.__send_datagrams__(sock, batch)
+        except OSError:
+            self.__disconnect__()
+            return False
+        self.sent_batches += 1
+        return True
+
+    def close(self) -> None:
+        """
+        Stop background sender, send queued records and close the socket
+        """
+        super().close()
+        with self.__send_lock__:
+            self.__disconnect__()
@@ -7,6 +7,8 @@
 Cached lookup for executable commands in user PATH
 """
 import os
+import threading
+import time
 
 from collections.abc import Collection
 from pathlib import Path
@@ -22,6 +24,11 @@ class Executables(Collection):
     Initializes a collections.abc.Collection lookup cache for commands on PATH
 
     Cache can be looked up by command name or with .get() method
+
+    The cache is reloaded when PATH environment variable changes or when modification
+    time of any directory on PATH changes. Directory modification times are checked at
+    most once in __check_interval_seconds__ seconds. Checks and reloads of the cache
+    shared by all instances are serialized with a lock.
     """
     __platform_family__: str = None
     """OS Platform family"""
@@ -31,35 +38,81 @@ class Executables(Collection):
     """List of all executables detected on path, including duplicate commands"""
     __commands__: Dict = None
     """List of active commands on path"""
+    __directory_mtimes__: Dict[str, Optional[int]] = {}
+    """Modification times of directories on path when commands were loaded"""
+    __checked__: Optional[float] = None
+    """Timestamp when directory modification times were last checked"""
+    __check_interval_seconds__: float = 1.0
+    """Minimum interval between directory modification time checks"""
+    __lock__ = threading.RLock()
+    """Lock for checking and reloading the cache"""
 
     def __init__(self):
         self.__platform_family__ = detect_platform_family()
-        if Executables.__commands__ is None:
-            Executables.__commands__ = Executables.__load__executables_on_path__(self)
+        self.__check_reload__()
 
     def __repr__(self) -> str:
         return self.__path__
 
     def __contains__(self, item: Union[str, Path]) -> bool:
+        self.__check_reload__()
         return item in self.__executables__ or item in self.__commands__
 
     def __iter__(self) -> Iterator[str]:
+        self.__check_reload__()
         return iter(self.__commands__.values())
 
     def __len__(self) -> int:
+        self.__check_reload__()
         return len(list(self.__commands__.keys()))
 
     def __getitem__(self, index: str) -> str:
+        self.__check_reload__()
         return self.__commands__[index]
 
+    @staticmethod
+    def __get_directory_mtimes__(path: str) -> Dict[str, Optional[int]]:
+        """
+        Get modification times of directories on path
+        """
+        mtimes = {}
+        for directory in path.split(os.pathsep):
+            try:
+                mtimes[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtimes[directory] = None
+        return mtimes
+
+    def __check_reload__(self, force_check: bool = False) -> None:
+        """
+        Reload executables if PATH or modification time of directories on PATH have changed
+
+        Directory modification times are checked if check interval has passed or
+        force_check is True
+        """
+        with Executables.__lock__:
+            if Executables.__commands__ is None or Executables.__path__ != os.environ.get('PATH', ''):
+                self.reload()
+                return
+
+            now = time.monotonic()
+            if not force_check and Executables.__checked__ is not None:
+                if now - Executables.__checked__ < self.__check_interval_seconds__:
+                    return
+            Executables.__checked__ = now
+            if self.__get_directory_mtimes__(Executables.__path__) != Executables.__directory_mtimes__:
+                self.reload()
+
     def __load__executables_on_path__(self) -> List[Path]:
         """
         Load executables available on user path
         """
-        self.__executables__ = []
+        executables = []
         commands = {}
-        self.__path__ = os.environ.get('PATH', '')
-        for path in self.__path__.split(os.pathsep):
+        Executables.__path__ = os.environ.get('PATH', '')
+        Executables.__directory_mtimes__ = self.__get_directory_mtimes__(Executables.__path__)
+        Executables.__checked__ = time.monotonic()
+        for path in Executables.__path__.split(os.pathsep):
             directory = Path(path)
             if not directory.is_dir():
                 continue
@@ -73,15 +126,30 @@ class Executables(Collection):
                             continue
                 except OSError:
                     continue
-                self.__executables__.append(command)
+                executables.append(command)
                 if filename.name not in commands:
                     commands[filename.name] = command
+        Executables.__executables__ = executables
         return commands
 
+    def reload(self) -> None:
+        """
+        Reload executables on path
+        """
+        with Executables.__lock__:
+            Executables.__commands__ = self.__load__executables_on_path__()
+
+    def refresh(self) -> None:
+        """
+        Check directory modification times immediately and reload changed executables
+        """
+        self.__check_reload__(force_check=True)
+
     def paths(self, name: str) -> List[Path]:
         """
         Return all detected paths for command with specific name
         """
+        self.__check_reload__()
         return [
             item
             for item in self.__executables__
@@ -9,11 +9,12 @@ List and manipulate OS processes
 import re
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .collection import CachedMutableSequence
 from .exceptions import CommandError
 from .subprocess import run_command_lineoutput
+from .tabular import Column, TableLayout
 
 DEFAULT_CACHE_SECONDS = 5
 
@@ -68,6 +69,26 @@ def parse_datetime(value: str) -> Optional[datetime]:
     return None
 
 
+def process_list_layout(attributes: Tuple[str]) -> TableLayout:
+    """
+    Return compiled table layout for ps output with specified attributes
+
+    The lstart field is parsed to 'started' datetime and command field is
+    parsed as rest of line
+    """
+    columns = []
+    for attr in attributes:
+        if attr == STARTED_FIELD:
+            columns.append(Column('started', parse_datetime, tokens=5))
+        elif attr == COMMAND_FIELD:
+            columns.append(Column(attr, rest=True))
+        elif attr in STRING_FIELDS:
+            columns.append(Column(attr))
+        else:
+            columns.append(Column(attr, int))
+    return TableLayout(*columns, header=True, record_name='ProcessRecord')
+
+
 class Process:
     """
     Process in process list as parsed from ps output line
@@ -83,46 +104,14 @@ class Process:
     def __repr__(self) -> str:
         return f'{self.username} {self.pid} {self.command}'
 
-    def __parse_started__(self, line: str) -> str:
-        """
-        Parse 'started' (lstart) timestamp from line
-        """
-        values = line.split()
-
-        if STARTED_FIELD not in self.__processes__.attributes:
-            self.started = None
-            return values
-
-        date_start = self.__processes__.attributes.index(STARTED_FIELD)
-        date_end = date_start + 5
-        self.started = parse_datetime(' '.join(values[date_start:date_end]))
-        # Trim date data out of parsed values
-        return values[:date_start] + values[date_end:]
-
     def __parse_line__(self, line: str) -> None:
         """
         Parse process info from line
         """
-        values = self.__parse_started__(line)
-        attributes = [
-            attr
-            for attr in self.__processes__.attributes
-            if attr != STARTED_FIELD
-        ]
-        for index, attr in enumerate(attributes):
-            try:
-                if attr == COMMAND_FIELD:
-                    value = ' '.join(values[index:])
-                else:
-                    value = values[index]
-            except IndexError:
-                value = None
-
-            if value is not None and attr not in STRING_FIELDS:
-                try:
-                    value = int(value)
-                except ValueError:
-                    pass
+        layout = self.__processes__.layout
+        if layout is None:
+            return
+        for attr, value in zip(layout.names, layout.decode(line)):
             setattr(self, attr, value)
 
     @property
@@ -150,8 +139,9 @@ class Processes(CachedMutableSequence):
     """
     List of operating system processes
     """
-    attributes: Tuple[str]
     __max_age_seconds__: int
+    __layouts__: Dict[Tuple[str], TableLayout] = {}
+    """Compiled table layouts by ps attributes"""
 
     def __init__(self,
                  attributes: Tuple[str] = PS_FIELDS,
@@ -159,6 +149,24 @@ class Processes(CachedMutableSequence):
         self.__max_age_seconds__ = cache_age_seconds
         self.attributes = attributes
 
+    @property
+    def attributes(self) -> Tuple[str]:
+        """
+        Attributes loaded for processes with ps
+        """
+        return self.__attributes__
+
+    @attributes.setter
+    def attributes(self, value: Tuple[str]) -> None:
+        """
+        Set attributes loaded for processes and compile the matching table layout
+        """
+        value = tuple(value)
+        if value not in Processes.__layouts__:
+            Processes.__layouts__[value] = process_list_layout(value) if value else None
+        self.__attributes__ = value
+        self.layout = Processes.__layouts__[value]
+
     @property
     def command(self) -> List[str]:
         """
@@ -199,18 +207,43 @@ class Processes(CachedMutableSequence):
     def update(self) -> None:
         """
         Update list of processes visible to current user
+
+        Load duration includes running the ps command
         """
         self.clear()
 
         self.__start_update__()
-        lines, errors = run_command_lineoutput(*self.command)
-        if errors:
+        try:
+            lines, errors = run_command_lineoutput(*self.command)
+            if errors:
+                raise CommandError(f'Error running {self.command}')
+            self.__load_lines__(lines)
+        except CommandError:
             self.__reset__()
-            raise CommandError(f'Error running {self.command}')
+            raise
+        self.__finish_update__()
+
+    def __load_lines__(self, lines: Iterable[str]) -> None:
+        """
+        Append processes parsed from ps output lines, including the header line
+        """
+        if self.layout is None:
+            raise CommandError('No process attributes defined')
+        for line in self.layout.lines(lines):
+            self.append(Process(self, line))
 
-        # Skip header line
-        for line in lines[1:]:
-            process = Process(self, line)
-            self.append(process)
+    def load(self, lines: Iterable[str]) -> None:
+        """
+        Load processes from ps output lines, including the header line, replacing
+        any loaded processes
 
+        Lines can be any iterable of strings, for example output streamed from a pipe
+        """
+        self.clear()
+        self.__start_update__()
+        try:
+            self.__load_lines__(lines)
+        except CommandError:
+            self.__reset__()
+            raise
         self.__finish_update__()
@@ -6,22 +6,120 @@
 """
 Execute shell commands and return output
 
-Wraps subprocess.run, linking error handling to ScriptError and handling
-common string output use cases.
+Wraps subprocess.Popen, linking error handling to CommandError, collecting resource
+usage of the commands and handling common string output use cases.
 """
+import ctypes
+import functools
+import logging
 import os
+import platform
+import selectors
+import signal
+import sys
+import threading
+import time
 
-from subprocess import run as run_real
-from subprocess import PIPE, CalledProcessError, TimeoutExpired, CompletedProcess
-from typing import Any, Dict, List, Optional, Tuple
+from bisect import bisect_left
+from subprocess import PIPE, Popen, SubprocessError, TimeoutExpired, CompletedProcess
+from shutil import which
+from tempfile import TemporaryFile
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
 
 from .constants import DEFAULT_ENCODING
 from .exceptions import CommandError
+from .path import Executables
 
 DEFAULT_ENCODINGS = (
     DEFAULT_ENCODING,
 )
 DEFAULT_RETURN_CODES_OK = [0]
+DEFAULT_STREAM_BUFFER_SIZE = 2**16
+
+# Upper bounds of command latency histogram buckets in seconds
+COMMAND_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Resource limits supported by ResourceLimits, mapped to resource module RLIMIT constants
+RESOURCE_LIMIT_NAMES = {
+    'cpu': 'RLIMIT_CPU',
+    'address_space': 'RLIMIT_AS',
+    'open_files': 'RLIMIT_NOFILE',
+    'file_size': 'RLIMIT_FSIZE',
+}
+# Signals sent to processes exceeding resource limits
+RESOURCE_LIMIT_SIGNALS = {
+    getattr(signal, 'SIGXCPU', None): 'cpu',
+    getattr(signal, 'SIGXFSZ', None): 'file_size',
+}
+# I/O scheduling classes for ionice
+IONICE_CLASSES = {
+    'realtime': 1,
+    'best-effort': 2,
+    'idle': 3,
+}
+# Linux ioprio_set system call numbers by machine architecture and pointer size in bits.
+# Architectures missing here, including 32-bit processes on 64-bit kernels, are not supported
+IOPRIO_SET_SYSCALLS = {
+    ('x86_64', 64): 251,
+    ('amd64', 64): 251,
+    ('i386', 32): 289,
+    ('i686', 32): 289,
+    ('aarch64', 64): 30,
+    ('arm64', 64): 30,
+    ('armv7l', 32): 314,
+    ('ppc64le', 64): 273,
+    ('s390x', 64): 282,
+}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+
+# Script run with python interpreter to apply resource limits before executing a command.
+# Arguments are file descriptor for errors, limits as repr of ResourceLimits.__settings__,
+# path to the executable or empty string to search argv[0] and the command. Errors are
+# written to the error file descriptor, which is closed on successful exec of the command.
+RESOURCE_LIMITS_WRAPPER = """
+import ast, os, signal, sys
+error_fd = int(sys.argv[1])
+os.set_inheritable(error_fd, False)
+try:
+    procs, nice, ioprio, rlimits = ast.literal_eval(sys.argv[2])
+    if procs is not None:
+        with open(procs, 'w') as handle:
+            handle.write('0')
+    if nice is not None:
+        os.nice(nice)
+    if ioprio is not None:
+        import ctypes
+        if ctypes.CDLL(None, use_errno=True).syscall(ioprio[0], ioprio[1], 0, ioprio[2]) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+    if rlimits:
+        import resource
+        for limit, soft, hard in rlimits:
+            resource.setrlimit(limit, (soft, hard))
+    # Restore signals ignored by python interpreter, as done by subprocess
+    for name in ('SIGPIPE', 'SIGXFZ', 'SIGXFSZ'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+    os.execvp(sys.argv[3] or sys.argv[4], sys.argv[4:])
+except BaseException as error:
+    os.write(error_fd, repr(error).encode('utf-8', 'replace'))
+    os._exit(127)
+"""
+
+# os.wait4 and its flag, bound to default arguments of AccountedPopen._internal_poll
+WAIT4 = getattr(os, 'wait4', None)
+WNOHANG = getattr(os, 'WNOHANG', 0)
+
+# ru_maxrss is reported in bytes on MacOS and in kilobytes on other platforms
+MAX_RSS_UNIT_BYTES = 1 if sys.platform == 'darwin' else 1024
 
 
 def prepare_run_arguments(
@@ -41,6 +139,720 @@ def prepare_run_arguments(
     return env, expected_return_codes
 
 
+def decode_line(line: bytes, encodings: List[str] = DEFAULT_ENCODINGS) -> str:
+    """
+    Decode line from bytes to str with list of encodings
+
+    Line is decoded with the first encoding that can decode it
+    """
+    for encoding in encodings:
+        try:
+            return str(line, encoding)
+        except ValueError:
+            pass
+    raise CommandError(f'Error parsing line {line}')
+
+
+class ResourceUsage(NamedTuple):
+    """
+    Resource usage of a finished child process
+
+    CPU and wall times are in seconds and max_rss is in bytes
+    """
+    user_time: float
+    system_time: float
+    max_rss: int
+    wall_time: float
+
+
+class AccountedPopen(Popen):
+    """
+    Popen collecting resource usage of the child process with os.wait4
+
+    Resource usage is available in resource_usage after the process has been
+    waited for or polled. On platforms without os.wait4 only wall time is recorded.
+    """
+    def __init__(self, *args: List[Any], **kwargs: Dict) -> None:
+        self.__rusage__ = None
+        self.__started__ = time.monotonic()
+        self.__finished__ = None
+        super().__init__(*args, **kwargs)
+
+    def _try_wait(self, wait_flags: int) -> Tuple[int, int]:
+        """
+        Wait for the child process, storing resource usage when it has exited
+        """
+        if not hasattr(os, 'wait4'):
+            pid, status = super()._try_wait(wait_flags)
+        else:
+            try:
+                pid, status, self.__rusage__ = os.wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                pid, status = self.pid, 0
+        if pid == self.pid:
+            self.__finished__ = time.monotonic()
+        return pid, status
+
+    # pylint: disable=arguments-differ
+    def _internal_poll(self,
+                       _deadstate: Optional[int] = None,
+                       _wait4: Optional[Callable] = WAIT4,
+                       _wnohang: int = WNOHANG,
+                       _monotonic: Callable = time.monotonic,
+                       **kwargs: Dict) -> Optional[int]:
+        """
+        Check if the child process has exited without blocking, reaping it with os.wait4
+        to store resource usage
+
+        Called by poll() and __del__, so only names bound as default arguments are used
+        """
+        if _wait4 is None or self.returncode is not None:
+            return super()._internal_poll(_deadstate, **kwargs)
+        if not self._waitpid_lock.acquire(False):
+            return None
+        try:
+            if self.returncode is not None:
+                return self.returncode
+            pid, status, rusage = _wait4(self.pid, _wnohang)
+            if pid == self.pid:
+                self.__rusage__ = rusage
+                self.__finished__ = _monotonic()
+                self._handle_exitstatus(status)
+        except OSError as error:
+            if _deadstate is not None:
+                self.returncode = _deadstate
+            elif isinstance(error, ChildProcessError):
+                self.__finished__ = _monotonic()
+                self.returncode = 0
+        finally:
+            self._waitpid_lock.release()
+        return self.returncode
+
+    @property
+    def resource_usage(self) -> Optional[ResourceUsage]:
+        """
+        Resource usage of the process or None if the process has not been reaped
+        """
+        if self.__finished__ is None:
+            return None
+        wall_time = self.__finished__ - self.__started__
+        if self.__rusage__ is None:
+            return ResourceUsage(0.0, 0.0, 0, wall_time)
+        return ResourceUsage(
+            user_time=self.__rusage__.ru_utime,
+            system_time=self.__rusage__.ru_stime,
+            max_rss=self.__rusage__.ru_maxrss * MAX_RSS_UNIT_BYTES,
+            wall_time=wall_time,
+        )
+
+    def kill_process_group(self) -> None:
+        """
+        Kill the process group of a process started with start_new_session=True
+        """
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            self.kill()
+
+
+class ResourceLimits:
+    """
+    Resource limits, scheduling priorities and cgroup placement for commands
+
+    Settings are applied before the command is executed by a python wrapper process,
+    which replaces itself with the command. The wrapper avoids running python code in
+    the forked child with preexec_fn, which is not safe in threaded programs, at the
+    cost of starting the interpreter for each command with limits:
+
+    - cpu: CPU time limit in seconds. Command gets SIGXCPU at the limit and
+      SIGKILL one second later
+    - address_space: maximum size of process virtual memory in bytes
+    - open_files: maximum number of open file descriptors
+    - file_size: maximum size of files written by the command in bytes
+    - nice: increment to process nice value
+    - ionice: I/O scheduling class name (realtime, best-effort, idle), with
+      ionice_level priority 0-7 in the class. Supported only on Linux
+    - cgroup: path to writable cgroup v2 directory the command is moved to
+
+    Limits exceeded by a command are detected from the exit signal, CPU usage and
+    cgroup OOM kill events. Exceeding address space or open files limits shows up as
+    allocation or open errors in the command and is not detected.
+    """
+    def __init__(self,
+                 cpu: Optional[int] = None,
+                 address_space: Optional[int] = None,
+                 open_files: Optional[int] = None,
+                 file_size: Optional[int] = None,
+                 nice: Optional[int] = None,
+                 ionice: Optional[str] = None,
+                 ionice_level: int = 4,
+                 cgroup: Optional[str] = None) -> None:
+        self.cpu = cpu
+        self.address_space = address_space
+        self.open_files = open_files
+        self.file_size = file_size
+        self.nice = nice
+        self.ionice = ionice
+        self.ionice_level = ionice_level
+        self.cgroup = cgroup
+        self.__rlimits__ = self.__prepare_rlimits__()
+        self.__ioprio__ = self.__prepare_ionice__()
+        self.__cgroup_procs__ = self.__prepare_cgroup__()
+
+    def __repr__(self) -> str:
+        return ' '.join(f'{attr}={value}' for attr, value in self.as_dict().items())
+
+    def as_dict(self) -> Dict:
+        """
+        Return configured limits as dictionary
+        """
+        data = {}
+        for attr in ('cpu', 'address_space', 'open_files', 'file_size', 'nice', 'ionice', 'cgroup'):
+            value = getattr(self, attr)
+            if value is not None:
+                data[attr] = value
+        return data
+
+    def __prepare_rlimits__(self) -> List[Tuple[int, int, int]]:
+        """
+        Validate resource limits, returning list of setrlimit arguments
+        """
+        rlimits = []
+        for attr, name in RESOURCE_LIMIT_NAMES.items():
+            value = getattr(self, attr)
+            if value is None:
+                continue
+            if resource is None or not hasattr(resource, name):
+                raise CommandError(f'Resource limit {attr} is not supported on this platform')
+            limit = getattr(resource, name)
+            value = int(value)
+            _soft, hard = resource.getrlimit(limit)
+            if hard != resource.RLIM_INFINITY and value > hard:
+                raise CommandError(f'Resource limit {attr}={value} exceeds hard limit {hard}')
+            soft = value
+            if attr == 'cpu':
+                # Deliver SIGXCPU at soft limit before SIGKILL at hard limit
+                value = value + 1 if hard == resource.RLIM_INFINITY else min(value + 1, hard)
+            rlimits.append((limit, soft, value))
+        return rlimits
+
+    def __prepare_ionice__(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Validate ionice settings, returning ioprio_set system call number and arguments
+        """
+        if self.ionice is None:
+            return None
+        if self.ionice not in IONICE_CLASSES:
+            raise CommandError(f'Invalid ionice class: {self.ionice}')
+        if not 0 <= self.ionice_level <= 7:
+            raise CommandError(f'Invalid ionice level: {self.ionice_level}')
+        machine = platform.machine()
+        syscall = IOPRIO_SET_SYSCALLS.get((machine, ctypes.sizeof(ctypes.c_void_p) * 8))
+        if not sys.platform.startswith('linux') or syscall is None:
+            raise CommandError(f'ionice is not supported on {sys.platform} {machine}')
+        priority = IONICE_CLASSES[self.ionice] << IOPRIO_CLASS_SHIFT | self.ionice_level
+        return syscall, IOPRIO_WHO_PROCESS, priority
+
+    def __prepare_cgroup__(self) -> Optional[str]:
+        """
+        Validate cgroup directory, returning path to cgroup.procs file
+        """
+        if self.cgroup is None:
+            return None
+        procs = os.path.join(self.cgroup, 'cgroup.procs')
+        if not os.path.isfile(procs) or not os.access(procs, os.W_OK):
+            raise CommandError(f'Not a writable cgroup directory: {self.cgroup}')
+        return procs
+
+    def __cgroup_oom_kills__(self) -> int:
+        """
+        Return count of OOM kills in the cgroup
+        """
+        try:
+            with open(os.path.join(self.cgroup, 'memory.events'), 'r', encoding=DEFAULT_ENCODING) as handle:
+                for line in handle:
+                    field, value = line.split()
+                    if field == 'oom_kill':
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def wrap(self, args: Tuple[str], error_fd: int, executable: Optional[str] = None) -> List[str]:
+        """
+        Return command line running args with the limits applied by a python wrapper
+
+        If executable is given, it is executed with args as arguments. Errors applying the
+        limits or executing the command are written to error_fd
+        """
+        if not sys.executable:
+            raise CommandError('Resource limits require path to python interpreter')
+        settings = (self.__cgroup_procs__, self.nice, self.__ioprio__, self.__rlimits__)
+        return [
+            sys.executable, '-I', '-S', '-c', RESOURCE_LIMITS_WRAPPER,
+            str(error_fd), repr(settings), executable or '', *(str(arg) for arg in args)
+        ]
+
+    def start(self) -> Dict:
+        """
+        Record state before starting a command, returned state is passed to exceeded()
+        """
+        return {
+            'oom_kills': self.__cgroup_oom_kills__() if self.cgroup is not None else 0
+        }
+
+    def exceeded(self, res: CompletedProcess, state: Dict) -> Optional[str]:
+        """
+        Detect resource limit exceeded by a finished command
+
+        Returns description of the exceeded limit or None. Only commands killed by a
+        signal are detected: exit codes above 128 reported by shells for children killed
+        by signal can't be told apart from normal exit codes and are not interpreted.
+        """
+        if res.returncode is None or res.returncode >= 0:
+            return None
+        signum = -res.returncode
+        if signum in RESOURCE_LIMIT_SIGNALS and getattr(self, RESOURCE_LIMIT_SIGNALS[signum]) is not None:
+            attr = RESOURCE_LIMIT_SIGNALS[signum]
+            return f'{attr}={getattr(self, attr)}'
+        if signum == signal.SIGKILL:
+            rusage = getattr(res, 'rusage', None)
+            if self.cpu is not None and rusage is not None:
+                if rusage.user_time + rusage.system_time >= self.cpu:
+                    return f'cpu={self.cpu}'
+            if self.cgroup is not None and self.__cgroup_oom_kills__() > state['oom_kills']:
+                return f'cgroup memory.max in {self.cgroup}'
+        return None
+
+
+def prepare_resource_limits(rlimits: Optional[Union[ResourceLimits, Dict]]) -> Optional[ResourceLimits]:
+    """
+    Return ResourceLimits for rlimits argument given as ResourceLimits or dictionary
+    """
+    if rlimits is None or isinstance(rlimits, ResourceLimits):
+        return rlimits
+    if isinstance(rlimits, dict):
+        try:
+            return ResourceLimits(**rlimits)
+        except TypeError as error:
+            raise CommandError(f'Invalid resource limits {rlimits}: {error}') from error
+    raise CommandError(f'Invalid resource limits: {rlimits}')
+
+
+def start_process(command: Tuple[str],
+                  rlimits: Optional[ResourceLimits],
+                  executable: Optional[str] = None,
+                  **kwargs: Dict) -> AccountedPopen:
+    """
+    Start command with AccountedPopen, applying resource limits with the rlimits wrapper
+
+    If executable is given, it is executed instead of searching argv[0] of the command.
+    Waits until the wrapper has executed the command. Raises CommandError if the limits
+    can't be applied or the command can't be executed.
+    """
+    if rlimits is None:
+        return AccountedPopen(command, executable=executable, **kwargs)
+    read_fd, write_fd = os.pipe()
+    try:
+        process = AccountedPopen(rlimits.wrap(command, write_fd, executable), pass_fds=(write_fd,), **kwargs)
+    finally:
+        os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as handle:
+        error = handle.read()
+    if error:
+        with process:
+            process.communicate()
+        raise CommandError(f'Error running {command[0]} with resource limits: {error.decode(errors="replace")}')
+    return process
+
+
+class CompletedCommand(CompletedProcess):
+    """
+    CompletedProcess with resource usage of the command
+    """
+    rusage: Optional[ResourceUsage] = None
+    limit_exceeded: Optional[str] = None
+    """Description of resource limit exceeded by the command"""
+
+    def __error_message__(self) -> str:
+        """
+        Return error message for unexpected return code of the command
+        """
+        message = f"""Error running {' '.join(str(arg) for arg in self.args)}: returns {self.returncode}"""
+        if self.limit_exceeded is not None:
+            message = f'{message}: exceeded resource limit {self.limit_exceeded}'
+        return message
+
+
+class CommandOutput(tuple):
+    """
+    Tuple of stdout and stderr of a command with return code, resource usage and
+    exceeded resource limit as attributes
+    """
+    returncode: int
+    rusage: Optional[ResourceUsage]
+    limit_exceeded: Optional[str]
+
+    def __new__(cls, stdout: Any, stderr: Any, returncode: int = 0,
+                rusage: Optional[ResourceUsage] = None,
+                limit_exceeded: Optional[str] = None) -> 'CommandOutput':
+        output = super().__new__(cls, (stdout, stderr))
+        output.returncode = returncode
+        output.rusage = rusage
+        output.limit_exceeded = limit_exceeded
+        return output
+
+    @property
+    def stdout(self) -> Any:
+        """
+        Standard output of the command
+        """
+        return self[0]
+
+    @property
+    def stderr(self) -> Any:
+        """
+        Standard error of the command
+        """
+        return self[1]
+
+
+class ExecutableResolver:
+    """
+    Resolve command names to absolute paths with the cached Executables lookup
+
+    When enabled, argv[0] of commands run with the helpers in this module is resolved
+    with the Executables cache of commands on PATH and the absolute path is executed,
+    avoiding a search of PATH directories for every command. The command is still
+    given argv[0] as passed by the caller. Missing commands raise CommandError without
+    attempting to start the command.
+
+    Commands given with a directory component are executed as is. Commands run with
+    a PATH in custom environment different from current PATH are looked up with
+    shutil.which.
+    """
+    enabled: bool = False
+    """Resolve commands with the cache. Disabled by default"""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.__executables__: Optional[Executables] = None
+        self.__lock__ = threading.Lock()
+
+    def __get_executables__(self) -> Executables:
+        """
+        Return Executables lookup of the resolver, loading it on first call
+        """
+        with self.__lock__:
+            if self.__executables__ is None:
+                self.__executables__ = Executables()
+            return self.__executables__
+
+    def resolve(self, args: Tuple[str], env: Optional[Dict] = None) -> Optional[str]:
+        """
+        Resolve argv[0] in args to absolute path of the command
+
+        Returns None if commands are not resolved or argv[0] is a path
+        """
+        if not self.enabled or not args:
+            return None
+
+        command = str(args[0])
+        if os.path.dirname(command):
+            return None
+
+        path = env.get('PATH', os.defpath) if env is not None else os.environ.get('PATH', '')
+        if path != os.environ.get('PATH', ''):
+            executable = which(command, path=path)
+        else:
+            executables = self.__get_executables__()
+            executable = executables.get(command)
+            if executable is None:
+                # Command may have been installed since the last modification time check
+                executables.refresh()
+                executable = executables.get(command)
+
+        if executable is None:
+            raise CommandError(f'Command not found: {command}')
+        return str(executable)
+
+
+COMMAND_RESOLVER = ExecutableResolver()
+"""Resolver used for commands run with the helpers in this module"""
+
+
+class CommandExecution:
+    """
+    Details of a single run, run_command or run_command_lineoutput call passed to
+    command observers
+
+    Times are seconds since epoch. Output sizes are in bytes as read from the command.
+    Error is the exception raised by the call or None.
+    """
+    __slots__ = (
+        'function',
+        'args',
+        'cwd',
+        'started',
+        'finished',
+        'returncode',
+        'stdout_size',
+        'stderr_size',
+        'rusage',
+        'error',
+    )
+
+    def __init__(self, function: str, args: Tuple[str], cwd: Optional[str]) -> None:
+        self.function = function
+        self.args = args
+        self.cwd = cwd
+        self.started = time.time()
+        self.finished = None
+        self.returncode = None
+        self.stdout_size = 0
+        self.stderr_size = 0
+        self.rusage = None
+        self.error = None
+
+    def __repr__(self) -> str:
+        return f'{self.function} {self.command} {self.duration}'
+
+    @property
+    def command(self) -> str:
+        """
+        Name of the command executed
+        """
+        return os.path.basename(str(self.args[0])) if self.args else ''
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        Duration of the call in seconds
+        """
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def record(self,
+               res: CompletedCommand,
+               stdout_size: Optional[int] = None,
+               stderr_size: Optional[int] = None) -> None:
+        """
+        Record details of a finished process
+
+        Output sizes are detected from captured output unless given as arguments
+        """
+        self.returncode = res.returncode
+        if stdout_size is None:
+            stdout_size = len(res.stdout) if isinstance(res.stdout, bytes) else 0
+        if stderr_size is None:
+            stderr_size = len(res.stderr) if isinstance(res.stderr, bytes) else 0
+        self.stdout_size = stdout_size
+        self.stderr_size = stderr_size
+        self.rusage = res.rusage
+
+
+COMMAND_OBSERVERS: List[Callable] = []
+"""Callbacks called with CommandExecution after each observed command"""
+COMMAND_OBSERVER_STATE = threading.local()
+"""Execution being observed in current thread"""
+
+
+def register_command_observer(callback: Callable) -> None:
+    """
+    Register a callback called with CommandExecution details after every run, run_command
+    and run_command_lineoutput call
+    """
+    if not callable(callback):
+        raise CommandError(f'Command observer is not callable: {callback}')
+    if callback not in COMMAND_OBSERVERS:
+        COMMAND_OBSERVERS.append(callback)
+
+
+def unregister_command_observer(callback: Callable) -> None:
+    """
+    Unregister a command observer callback
+    """
+    if callback in COMMAND_OBSERVERS:
+        COMMAND_OBSERVERS.remove(callback)
+
+
+def observed_command(function: Callable) -> Callable:
+    """
+    Decorator to pass details of command calls to registered command observers
+
+    When no observers are registered the command is called directly. Nested observed
+    calls (run_command called by run_command_lineoutput) are reported once by the
+    outermost call. Errors in observers are logged and don't affect the command result.
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args: List[str], **kwargs: Dict) -> Any:
+        if not COMMAND_OBSERVERS or getattr(COMMAND_OBSERVER_STATE, 'execution', None) is not None:
+            return function(*args, **kwargs)
+
+        execution = CommandExecution(name, args, kwargs.get('cwd', None))
+        COMMAND_OBSERVER_STATE.execution = execution
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            execution.error = error
+            raise
+        finally:
+            COMMAND_OBSERVER_STATE.execution = None
+            execution.finished = time.time()
+            for callback in list(COMMAND_OBSERVERS):
+                try:
+                    callback(execution)
+                except Exception:  # pylint: disable=broad-except
+                    logging.getLogger(__name__).exception('Error in command observer %s', callback)
+
+    return wrapper
+
+
+class CommandLatencyHistogram:
+    """
+    Latency histogram and counters for a single command
+    """
+    def __init__(self, command: str, buckets: Tuple[float] = COMMAND_LATENCY_BUCKETS) -> None:
+        self.command = command
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = None
+
+    def __repr__(self) -> str:
+        return f'{self.command} {self.count}'
+
+    def add(self, execution: CommandExecution) -> None:
+        """
+        Add command execution to the histogram
+        """
+        duration = execution.duration
+        self.count += 1
+        if execution.error is not None:
+            self.errors += 1
+        self.total_time += duration
+        self.min_time = duration if self.min_time is None else min(self.min_time, duration)
+        self.max_time = duration if self.max_time is None else max(self.max_time, duration)
+        self.counts[bisect_left(self.buckets, duration)] += 1
+
+    @property
+    def average_time(self) -> Optional[float]:
+        """
+        Average latency of the command in seconds
+        """
+        return self.total_time / self.count if self.count else None
+
+    def percentile(self, value: float) -> Optional[float]:
+        """
+        Estimate latency percentile (0-100) as upper bound of the matching histogram bucket
+        """
+        if not self.count:
+            return None
+        limit = self.count * value / 100
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= limit and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max_time
+        return self.max_time
+
+    def as_dict(self) -> Dict:
+        """
+        Return histogram as dictionary
+        """
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'average_time': self.average_time,
+            'min_time': self.min_time,
+            'max_time': self.max_time,
+            'buckets': dict(zip([*self.buckets, float('inf')], self.counts)),
+        }
+
+
+class CommandStatistics(dict):
+    """
+    Command observer aggregating call counts and latency histograms by command name
+
+    Register an instance with register_command_observer to collect statistics
+    """
+    def __init__(self, buckets: Tuple[float] = COMMAND_LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.buckets = buckets
+        self.__lock__ = threading.Lock()
+
+    def __call__(self, execution: CommandExecution) -> None:
+        with self.__lock__:
+            if execution.command not in self:
+                self[execution.command] = CommandLatencyHistogram(execution.command, self.buckets)
+            self[execution.command].add(execution)
+
+    def as_dict(self) -> Dict:
+        """
+        Return statistics for all commands as dictionary
+        """
+        with self.__lock__:
+            return {command: histogram.as_dict() for command, histogram in self.items()}
+
+
+def run_process(
+        args: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict] = None,
+        stdout: Any = None,
+        stderr: Any = None,
+        timeout: Optional[float] = None,
+        new_session: bool = False,
+        rlimits: Optional[ResourceLimits] = None) -> CompletedCommand:
+    """
+    Run command as subprocess, returning CompletedCommand with resource usage of the command
+
+    With new_session the command is started in a new session and process group, and the
+    whole process group is killed if the timeout is exceeded. Otherwise only the command
+    itself is killed.
+
+    Resource limits in rlimits are applied to the command before it is executed. If the
+    command is killed for exceeding a limit, the limit is stored in limit_exceeded of the
+    result.
+
+    Command name is resolved with COMMAND_RESOLVER when it is enabled. Return code of
+    the command is not checked
+    """
+    executable = COMMAND_RESOLVER.resolve(args, env)
+    limits_state = rlimits.start() if rlimits is not None else None
+    try:
+        with start_process(args, rlimits, executable, stdout=stdout, stderr=stderr, cwd=cwd, env=env,
+                           start_new_session=new_session) as process:
+            try:
+                output, errors = process.communicate(timeout=timeout)
+            except TimeoutExpired:
+                if new_session:
+                    process.kill_process_group()
+                else:
+                    process.kill()
+                process.communicate()
+                raise
+    except (SubprocessError, FileNotFoundError) as error:
+        raise CommandError(error) from error
+
+    res = CompletedCommand(args, process.returncode, output, errors)
+    res.rusage = process.resource_usage
+    if rlimits is not None:
+        res.limit_exceeded = rlimits.exceeded(res, limits_state)
+    execution = getattr(COMMAND_OBSERVER_STATE, 'execution', None)
+    if execution is not None:
+        execution.record(res)
+    return res
+
+
+@observed_command
 def run(
         *args: List[str],
         cwd: Optional[str] = None,
@@ -48,59 +860,78 @@ def run(
         stdout: Any = None,
         stderr: Any = None,
         env: Optional[Dict] = None,
-        timeout: Optional[float] = None) -> CompletedProcess:
+        timeout: Optional[float] = None,
+        new_session: bool = False,
+        rlimits: Optional[Union[ResourceLimits, Dict]] = None) -> CompletedCommand:
     """
-    Run command as subprocess with subprocess.run and matching against a list of expected
-    return codes
+    Run command as subprocess and matching against a list of expected return codes
+
+    Returns CompletedCommand with resource usage of the command in rusage attribute and
+    raises CommandError in case of errors running the commmand.
 
-    This version returns nothing and raises CommandError in case of errors running the commmand
+    With new_session the command runs in its own process group, which is killed as
+    whole on timeout. Resource limits can be given as ResourceLimits or dictionary of
+    ResourceLimits arguments.
     """
     env, expected_return_codes = prepare_run_arguments(cwd, env, expected_return_codes)
-    try:
-        # pylint: disable=subprocess-run-check
-        res = run_real(args, stdout=stdout, stderr=stderr, check=False, cwd=cwd, env=env, timeout=timeout)
-        if res.returncode not in expected_return_codes:
-            raise CommandError(
-                f"""Error running {' '.join(args)}: returns {res.returncode}: {res.stderr}"""
-            )
-        return res
-    except (CalledProcessError, FileNotFoundError, TimeoutExpired) as error:
-        raise CommandError(error) from error
+    res = run_process(
+        args,
+        cwd=cwd,
+        env=env,
+        stdout=stdout,
+        stderr=stderr,
+        timeout=timeout,
+        new_session=new_session,
+        rlimits=prepare_resource_limits(rlimits)
+    )
+    if res.returncode not in expected_return_codes:
+        raise CommandError(f'{res.__error_message__()}: {res.stderr}')
+    return res
 
 
+@observed_command
 def run_command(
         *args: List[str],
         cwd: Optional[str] = None,
         expected_return_codes: Optional[List[int]] = None,
         env: Optional[Dict] = None,
-        timeout: Optional[float] = None) -> Tuple[bytes, bytes]:
+        timeout: Optional[float] = None,
+        new_session: bool = False,
+        rlimits: Optional[Union[ResourceLimits, Dict]] = None) -> CommandOutput:
     """
     Run command as subprocess, checking return code is 0 and returning stdout
     and stderr as bytes
 
-    Optional timeout value can be set to cause command to abort after specified timeout
+    Optional timeout value can be set to cause command to abort after specified timeout.
+    Returned tuple has return code, resource usage and exceeded resource limit of the
+    command as attributes.
     """
     env, expected_return_codes = prepare_run_arguments(cwd, env, expected_return_codes)
-    try:
-        # pylint: disable=subprocess-run-check
-        res = run_real(args, stdout=PIPE, stderr=PIPE, check=False, cwd=cwd, env=env, timeout=timeout)
-        if res.returncode not in expected_return_codes:
-            raise CommandError(
-                f"""Error running {' '.join(args)}: returns {res.returncode}: {res.stderr}"""
-            )
-    except (CalledProcessError, FileNotFoundError, TimeoutExpired) as error:
-        raise CommandError(error) from error
-
-    return res.stdout, res.stderr
+    res = run_process(
+        args,
+        cwd=cwd,
+        env=env,
+        stdout=PIPE,
+        stderr=PIPE,
+        timeout=timeout,
+        new_session=new_session,
+        rlimits=prepare_resource_limits(rlimits)
+    )
+    if res.returncode not in expected_return_codes:
+        raise CommandError(f'{res.__error_message__()}: {res.stderr}')
+    return CommandOutput(res.stdout, res.stderr, res.returncode, res.rusage, res.limit_exceeded)
 
 
+@observed_command
 def run_command_lineoutput(
         *args: List[str],
         cwd: Optional[str] = None,
         expected_return_codes: Optional[List[int]] = None,
         timeout: Optional[float] = None,
         env: Optional[Dict] = None,
-        encodings: List[str] = DEFAULT_ENCODINGS) -> Tuple[List[str], List[str]]:
+        encodings: List[str] = DEFAULT_ENCODINGS,
+        new_session: bool = False,
+        rlimits: Optional[Union[ResourceLimits, Dict]] = None) -> Tuple[List[str], List[str]]:
     """
     Run command as subprocess, checking return code is 0 and returning stdout
     and stderr as split to lines
@@ -109,17 +940,6 @@ def run_command_lineoutput(
     encodings, i.e. mixed UTF-8 and latin1 strings. When multiple encodings are
     detected the line is returned encoded with first suitable encoder
     """
-    def parse_line(line, encodings):
-        """
-        Parse line from bytes to str with list of encodings
-        """
-        for encoding in encodings:
-            try:
-                return str(line, encoding)
-            except ValueError:
-                pass
-        raise CommandError(f'Error parsing line {line}')
-
     if expected_return_codes is None:
         expected_return_codes = DEFAULT_RETURN_CODES_OK
     stdout, stderr = run_command(
@@ -127,8 +947,443 @@ def run_command_lineoutput(
         cwd=cwd,
         timeout=timeout,
         expected_return_codes=expected_return_codes,
-        env=env
+        env=env,
+        new_session=new_session,
+        rlimits=rlimits
     )
-    stdout = [parse_line(line, encodings) for line in stdout.splitlines()]
-    stderr = [parse_line(line, encodings) for line in stderr.splitlines()]
+    stdout = [decode_line(line, encodings) for line in stdout.splitlines()]
+    stderr = [decode_line(line, encodings) for line in stderr.splitlines()]
     return stdout, stderr
+
+
+class OutputStreamReader:
+    """
+    Reader for a command output pipe passing received data to a callback
+
+    Data is read with readinto to a fixed size buffer allocated once per stream. In
+    line mode the callback is called with each complete line decoded to string. In
+    chunk mode the callback is called with a memoryview of the received data, which
+    is only valid until the callback returns.
+    """
+    def __init__(self,
+                 stream: Any,
+                 callback: Optional[Callable] = None,
+                 lines: bool = True,
+                 encodings: List[str] = DEFAULT_ENCODINGS,
+                 buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE) -> None:
+        self.stream = stream
+        self.callback = callback
+        self.lines = lines
+        self.encodings = encodings
+        self.size = 0
+        self.__buffer__ = bytearray(buffer_size)
+        self.__view__ = memoryview(self.__buffer__)
+        self.__pending__ = b''
+
+    def __emit_line__(self, line: bytes) -> None:
+        """
+        Pass a line without line terminators to the callback
+        """
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        self.callback(decode_line(line, self.encodings))
+
+    def __emit_lines__(self, count: int) -> None:
+        """
+        Pass complete lines in buffer to the callback, storing any partial line
+        """
+        buffer = self.__buffer__
+        start = 0
+        end = buffer.find(b'\n', 0, count)
+        while end != -1:
+            line = buffer[start:end]
+            if self.__pending__:
+                line = self.__pending__ + line
+                self.__pending__ = b''
+            self.__emit_line__(line)
+            start = end + 1
+            end = buffer.find(b'\n', start, count)
+        if start < count:
+            self.__pending__ += buffer[start:count]
+
+    def read(self) -> bool:
+        """
+        Read available data from the stream. Returns False when the stream is closed
+        """
+        count = self.stream.readinto(self.__view__)
+        if not count:
+            self.flush()
+            return False
+        self.size += count
+        if self.callback is not None:
+            if self.lines:
+                self.__emit_lines__(count)
+            else:
+                self.callback(self.__view__[:count])
+        return True
+
+    def flush(self) -> None:
+        """
+        Pass any partial line left in buffer to the callback
+        """
+        if self.__pending__ and self.callback is not None:
+            line = self.__pending__
+            self.__pending__ = b''
+            self.__emit_line__(line)
+
+
+@observed_command
+def run_command_streaming(
+        *args: List[str],
+        stdout_callback: Optional[Callable] = None,
+        stderr_callback: Optional[Callable] = None,
+        lines: bool = True,
+        encodings: List[str] = DEFAULT_ENCODINGS,
+        cwd: Optional[str] = None,
+        expected_return_codes: Optional[List[int]] = None,
+        env: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        new_session: bool = False,
+        rlimits: Optional[Union[ResourceLimits, Dict]] = None,
+        buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE) -> CompletedCommand:
+    """
+    Run command as subprocess, passing stdout and stderr to callbacks as data arrives
+
+    Both pipes are read concurrently with selectors, so the command can't block on a
+    full pipe. With lines=True callbacks are called with each decoded line, otherwise
+    with memoryview of each received chunk. Output of streams without callback is
+    discarded.
+
+    Returns CompletedCommand without output and with resource usage of the command.
+    Raises CommandError if the command fails, the timeout is exceeded or a callback
+    raises an exception. The timeout also applies to waiting for the command to exit
+    after it has closed its output streams.
+    """
+    env, expected_return_codes = prepare_run_arguments(cwd, env, expected_return_codes)
+    rlimits = prepare_resource_limits(rlimits)
+    executable = COMMAND_RESOLVER.resolve(args, env)
+    limits_state = rlimits.start() if rlimits is not None else None
+    try:
+        process = start_process(  # pylint: disable=consider-using-with
+            args,
+            rlimits,
+            executable,
+            stdout=PIPE,
+            stderr=PIPE,
+            bufsize=0,
+            cwd=cwd,
+            env=env,
+            start_new_session=new_session,
+        )
+    except (SubprocessError, OSError) as error:
+        raise CommandError(error) from error
+
+    readers = (
+        OutputStreamReader(process.stdout, stdout_callback, lines, encodings, buffer_size),
+        OutputStreamReader(process.stderr, stderr_callback, lines, encodings, buffer_size),
+    )
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    timed_out = False
+    completed = False
+    try:
+        with selectors.DefaultSelector() as selector:
+            for reader in readers:
+                selector.register(reader.stream, selectors.EVENT_READ, reader)
+            while selector.get_map():
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        timed_out = True
+                        break
+                for key, _events in selector.select(remaining):
+                    if not key.data.read():
+                        selector.unregister(key.fileobj)
+        completed = not timed_out
+    except CommandError:
+        raise
+    except Exception as error:
+        raise CommandError(f"Error processing output of {' '.join(args)}: {error}") from error
+    finally:
+        if completed and deadline is not None:
+            try:
+                process.wait(max(deadline - time.monotonic(), 0))
+            except TimeoutExpired:
+                timed_out = True
+                completed = False
+        if not completed:
+            if new_session:
+                process.kill_process_group()
+            else:
+                process.kill()
+        process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    res = CompletedCommand(args, process.returncode, None, None)
+    res.rusage = process.resource_usage
+    if rlimits is not None:
+        res.limit_exceeded = rlimits.exceeded(res, limits_state)
+    execution = getattr(COMMAND_OBSERVER_STATE, 'execution', None)
+    if execution is not None:
+        execution.record(res, readers[0].size, readers[1].size)
+
+    if timed_out:
+        raise CommandError(f"Timeout running {' '.join(args)} after {timeout} seconds")
+    if res.returncode not in expected_return_codes:
+        raise CommandError(res.__error_message__())
+    return res
+
+
+class PipelineStage:
+    """
+    Single command in a Pipeline
+
+    Standard error of the command is written to an anonymous temporary file so
+    that stages can't deadlock on full stderr pipes.
+    """
+    args: Tuple[str]
+    expected_return_codes: List[int]
+    process: Optional[AccountedPopen]
+    stderr: bytes
+
+    def __init__(self, args: List[str], expected_return_codes: Optional[List[int]] = None) -> None:
+        if not args:
+            raise CommandError('Pipeline stage has no command')
+        self.args = tuple(str(arg) for arg in args)
+        self.expected_return_codes = (
+            expected_return_codes if expected_return_codes is not None else DEFAULT_RETURN_CODES_OK
+        )
+        self.process = None
+        self.stderr = b''
+        self.__stderr_file__ = None
+
+    def __repr__(self) -> str:
+        return ' '.join(self.args)
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """
+        Return code of the stage process or None if it has not finished
+        """
+        return self.process.returncode if self.process is not None else None
+
+    @property
+    def rusage(self) -> Optional[ResourceUsage]:
+        """
+        Resource usage of the stage process or None if it has not finished
+        """
+        return self.process.resource_usage if self.process is not None else None
+
+    def start(self, stdin: Any, stdout: Any, cwd: Optional[str], env: Dict) -> AccountedPopen:
+        """
+        Start the stage process reading from stdin and writing to stdout
+        """
+        executable = COMMAND_RESOLVER.resolve(self.args, env)
+        self.__stderr_file__ = TemporaryFile()
+        try:
+            self.process = AccountedPopen(  # pylint: disable=consider-using-with
+                self.args,
+                executable=executable,
+                stdin=stdin,
+                stdout=stdout,
+                stderr=self.__stderr_file__,
+                cwd=cwd,
+                env=env,
+            )
+        except OSError as error:
+            self.__stderr_file__.close()
+            self.__stderr_file__ = None
+            raise CommandError(f'Error running {self}: {error}') from error
+        return self.process
+
+    def finish(self) -> None:
+        """
+        Wait for the stage process to exit and collect stderr output
+        """
+        if self.process is not None:
+            self.process.wait()
+        if self.__stderr_file__ is not None:
+            self.__stderr_file__.seek(0)
+            self.stderr = self.__stderr_file__.read()
+            self.__stderr_file__.close()
+            self.__stderr_file__ = None
+
+    def kill(self) -> bool:
+        """
+        Kill the stage process if it is still running
+
+        Returns True if the process was running and was killed
+        """
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.kill()
+                return True
+            except ProcessLookupError:
+                pass
+        return False
+
+
+class Pipeline:
+    """
+    Pipeline of commands connected with OS pipes, similar to 'a | b | c' in shell
+
+    Output of each command is connected directly to input of the next command, so
+    data passed between the commands never goes through python. Each stage has its
+    own list of expected return codes and the timeout applies to the whole pipeline.
+
+    Stages can be given as argument lists to the constructor or added with add():
+
+        Pipeline(['cat', path], ['grep', 'error']).add('wc', '-l').run()
+    """
+    stages: List[PipelineStage]
+
+    def __init__(self,
+                 *commands: List[List[str]],
+                 cwd: Optional[str] = None,
+                 env: Optional[Dict] = None,
+                 stdin: Any = None,
+                 timeout: Optional[float] = None) -> None:
+        self.cwd = cwd
+        self.env = env
+        self.stdin = stdin
+        self.timeout = timeout
+        self.stages = []
+        self.__timed_out__ = False
+        self.__finished__ = False
+        self.__watchdog_lock__ = threading.Lock()
+        for command in commands:
+            self.add(*command)
+
+    def __repr__(self) -> str:
+        return ' | '.join(str(stage) for stage in self.stages)
+
+    def add(self, *args: List[str], expected_return_codes: Optional[List[int]] = None) -> 'Pipeline':
+        """
+        Add a command to the end of the pipeline. Returns the pipeline to allow chaining
+        """
+        self.stages.append(PipelineStage(args, expected_return_codes))
+        return self
+
+    def __start__(self) -> AccountedPopen:
+        """
+        Start all stages of the pipeline, returning the last process
+
+        Stdout of the last stage is always a pipe read by the caller
+        """
+        if not self.stages:
+            raise CommandError('Pipeline has no commands')
+        env, _expected_return_codes = prepare_run_arguments(self.cwd, self.env)
+
+        self.__timed_out__ = False
+        self.__finished__ = False
+        stdin = self.stdin
+        try:
+            for stage in self.stages:
+                process = stage.start(stdin, PIPE, self.cwd, env)
+                # Parent copy of the previous pipe must be closed for SIGPIPE to reach writers
+                if stdin is not self.stdin:
+                    stdin.close()
+                stdin = process.stdout
+        except CommandError:
+            self.__terminate__()
+            raise
+        return process
+
+    def __start_watchdog__(self) -> Optional[threading.Timer]:
+        """
+        Start timer to kill the pipeline when the timeout is exceeded
+        """
+        if self.timeout is None:
+            return None
+        watchdog = threading.Timer(self.timeout, self.__kill_timed_out__)
+        watchdog.daemon = True
+        watchdog.start()
+        return watchdog
+
+    def __kill_timed_out__(self) -> None:
+        """
+        Kill all stages after pipeline timeout
+
+        The pipeline is marked as timed out only if it has not finished and some stage
+        was still running when the timer fired
+        """
+        with self.__watchdog_lock__:
+            if self.__finished__:
+                return
+            killed = [stage.kill() for stage in self.stages]
+            if any(killed):
+                self.__timed_out__ = True
+
+    def __terminate__(self) -> None:
+        """
+        Kill any remaining stages and reap the processes
+        """
+        for stage in self.stages:
+            stage.kill()
+        for stage in self.stages:
+            if stage.process is not None and stage.process.stdout is not None:
+                stage.process.stdout.close()
+            stage.finish()
+
+    def __finish__(self, watchdog: Optional[threading.Timer]) -> None:
+        """
+        Wait for all stages to exit and check the return codes
+        """
+        for stage in self.stages:
+            stage.finish()
+        with self.__watchdog_lock__:
+            self.__finished__ = True
+        if watchdog is not None:
+            watchdog.cancel()
+        if self.__timed_out__:
+            raise CommandError(f'Timeout running {self} after {self.timeout} seconds')
+        for stage in self.stages:
+            if stage.returncode not in stage.expected_return_codes:
+                raise CommandError(f'Error running {stage}: returns {stage.returncode}: {stage.stderr}')
+
+    @property
+    def stderr(self) -> bytes:
+        """
+        Standard error output of all pipeline stages
+        """
+        return b''.join(stage.stderr for stage in self.stages)
+
+    def run(self) -> Tuple[bytes, bytes]:
+        """
+        Run the pipeline, returning stdout of the last stage and stderr of all stages as bytes
+        """
+        process = self.__start__()
+        watchdog = self.__start_watchdog__()
+        try:
+            with process.stdout:
+                stdout = process.stdout.read()
+        except BaseException:
+            if watchdog is not None:
+                watchdog.cancel()
+            self.__terminate__()
+            raise
+        self.__finish__(watchdog)
+        return stdout, self.stderr
+
+    def lineoutput(self, encodings: List[str] = DEFAULT_ENCODINGS) -> Iterator[str]:
+        """
+        Run the pipeline, yielding lines of output from the last stage as they are received
+
+        Return codes are checked when the output has been read completely. If the caller
+        stops iterating early the pipeline is terminated.
+        """
+        process = self.__start__()
+        watchdog = self.__start_watchdog__()
+        completed = False
+        try:
+            for line in process.stdout:
+                yield decode_line(line.rstrip(b'\r\n'), encodings)
+            completed = True
+        finally:
+            if not completed:
+                if watchdog is not None:
+                    watchdog.cancel()
+                self.__terminate__()
+        process.stdout.close()
+        self.__finish__(watchdog)
@@ -0,0 +1,229 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Parser for whitespace separated tabular command output
+
+Column layout is defined as list of Column objects and compiled once by TableLayout
+to a line decoder. Parsed lines are returned as slotted records or as columnar lists
+of values. Lines can be read from any iterable, including output streamed from a pipe.
+"""
+import re
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .exceptions import FileParserError
+
+
+class Column:
+    """
+    Column in tabular output
+
+    :param name: name of the column in parsed records
+    :param converter: callable to convert the string value. If conversion raises
+                      ValueError or TypeError the string value is kept
+    :param tokens: number of whitespace separated tokens in the column value
+    :param rest: column value is rest of the line with original whitespace. Must be
+                 the last column of the layout
+    """
+    def __init__(self,
+                 name: str,
+                 converter: Optional[Callable] = None,
+                 tokens: int = 1,
+                 rest: bool = False) -> None:
+        if not isinstance(name, str) or not name.isidentifier():
+            raise FileParserError(f'Column name is not valid python identifier: {name}')
+        if tokens < 1:
+            raise FileParserError(f'Column {name} must have at least one token')
+        self.name = name
+        self.converter = converter
+        self.tokens = tokens
+        self.rest = rest
+
+    def __repr__(self) -> str:
+        return self.name
+
+    def convert(self, value: Optional[str]) -> Any:
+        """
+        Convert string value of the column
+        """
+        if value is None or self.converter is None:
+            return value
+        try:
+            return self.converter(value)
+        except (TypeError, ValueError):
+            return value
+
+
+class TableRecord:
+    """
+    Base class for slotted records created by TableLayout
+    """
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        values = ' '.join(f'{attr}={getattr(self, attr)!r}' for attr in self.__slots__)
+        return f'{self.__class__.__name__}({values})'
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, TableRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, attr) for attr in self.__slots__))
+
+    def as_dict(self) -> Dict:
+        """
+        Return record as dictionary
+        """
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+
+class TableLayout:
+    """
+    Compiled layout of whitespace separated columns
+
+    Lines are split with a single str.split() call limited to the number of tokens in
+    the layout and the tokens are mapped to columns with precomputed slices. Columns
+    missing from short lines are set to None.
+
+    :param columns: Column objects, or column names for string columns
+    :param header: skip first line of parsed lines as header
+    :param header_pattern: regular expression to detect and skip header lines anywhere
+                           in the output
+    :param record_name: class name for the slotted record class
+    """
+    columns: Tuple[Column]
+
+    def __init__(self,
+                 *columns: List[Union[Column, str]],
+                 header: bool = False,
+                 header_pattern: Optional[str] = None,
+                 record_name: str = 'Record') -> None:
+        self.columns = tuple(
+            column if isinstance(column, Column) else Column(column)
+            for column in columns
+        )
+        if not self.columns:
+            raise FileParserError('Table layout has no columns')
+        for column in self.columns[:-1]:
+            if column.rest:
+                raise FileParserError(f'Rest of line column {column} must be the last column')
+        names = self.names
+        if len(set(names)) != len(names):
+            raise FileParserError(f'Duplicate column names in layout: {names}')
+
+        self.header = header
+        self.header_pattern = re.compile(header_pattern) if header_pattern is not None else None
+        self.record_class = type(record_name, (TableRecord,), {'__slots__': names})
+        self.__decoder__ = self.__compile__()
+
+    def __repr__(self) -> str:
+        return ' '.join(self.names)
+
+    @property
+    def names(self) -> Tuple[str]:
+        """
+        Names of columns in layout
+        """
+        return tuple(column.name for column in self.columns)
+
+    def __compile__(self) -> Callable:
+        """
+        Compile layout to a function returning list of column values for a line
+        """
+        fields = []
+        offset = 0
+        for column in self.columns:
+            if column.rest:
+                fields.append((offset, None, column.convert))
+                offset += 1
+            elif column.tokens == 1:
+                fields.append((offset, offset + 1, column.convert))
+                offset += 1
+            else:
+                fields.append((offset, offset + column.tokens, column.convert))
+                offset += column.tokens
+        rest = self.columns[-1].rest
+        maxsplit = offset - 1 if rest else -1
+        count = len(fields)
+
+        def decode(line: str) -> List[Any]:
+            tokens = line.split(None, maxsplit)
+            available = len(tokens)
+            values = [None] * count
+            for index, (start, end, convert) in enumerate(fields):
+                if start >= available:
+                    break
+                if end is None:
+                    value = tokens[start].rstrip()
+                elif end - start == 1:
+                    value = tokens[start]
+                else:
+                    value = ' '.join(tokens[start:end])
+                values[index] = convert(value)
+            return values
+
+        return decode
+
+    def is_header(self, line: str) -> bool:
+        """
+        Check if line matches header pattern
+        """
+        return self.header_pattern is not None and self.header_pattern.match(line) is not None
+
+    def decode(self, line: str) -> List[Any]:
+        """
+        Decode line to list of column values in layout order
+        """
+        return self.__decoder__(line)
+
+    def parse_line(self, line: str) -> TableRecord:
+        """
+        Parse line to a slotted record
+        """
+        record = self.record_class()
+        for name, value in zip(self.record_class.__slots__, self.__decoder__(line)):
+            setattr(record, name, value)
+        return record
+
+    def lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Iterate data lines, skipping headers and empty lines
+        """
+        lines = iter(lines)
+        if self.header:
+            next(lines, None)
+        for line in lines:
+            if not line.strip() or self.is_header(line):
+                continue
+            yield line
+
+    def values(self, lines: Iterable[str]) -> Iterator[List[Any]]:
+        """
+        Iterate lists of column values for lines
+        """
+        decoder = self.__decoder__
+        for line in self.lines(lines):
+            yield decoder(line)
+
+    def records(self, lines: Iterable[str]) -> Iterator[TableRecord]:
+        """
+        Iterate slotted records parsed from lines
+        """
+        for line in self.lines(lines):
+            yield self.parse_line(line)
+
+    def as_columns(self, lines: Iterable[str]) -> Dict[str, List[Any]]:
+        """
+        Parse lines to columnar lists of values by column name
+        """
+        columns = [[] for _column in self.columns]
+        appenders = [column.append for column in columns]
+        for values in self.values(lines):
+            for append, value in zip(appenders, values):
+                append(value)
+        return dict(zip(self.names, columns))
@@ -0,0 +1,182 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for cache of parsed configuration file data
+"""
+import os
+
+from pathlib import Path
+
+import pytest
+import yaml
+
+from sys_toolkit.configuration import JsonConfiguration, YamlConfiguration
+from sys_toolkit.configuration.cache import ParsedDataCache, get_default_cache_directory
+from sys_toolkit.exceptions import ConfigurationError
+
+from .test_configuration_sections import validate_configuration_section, TEST_DEFAULT_DATA
+from .test_configuration_yaml import TEST_VALID
+
+
+class CountingParser:
+    """
+    Parser counting calls
+    """
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, content: bytes) -> dict:
+        self.calls += 1
+        return {'content': content.decode()}
+
+
+def test_configuration_cache_default_directory(monkeypatch) -> None:
+    """
+    Test default cache directory
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', '/tmp/cache')
+    assert get_default_cache_directory() == Path('/tmp/cache/sys-toolkit/configuration')
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert get_default_cache_directory() == Path('~/.cache/sys-toolkit/configuration').expanduser()
+
+
+def test_configuration_cache_load(tmpdir) -> None:
+    """
+    Test loading parsed data from cache and invalidating changed files
+    """
+    path = Path(tmpdir, 'test.conf')
+    path.write_text('first', encoding='utf-8')
+    cache = ParsedDataCache(Path(tmpdir, 'cache'))
+    parser = CountingParser()
+
+    assert cache.load(path, parser, 'test') == {'content': 'first'}
+    assert cache.load(path, parser, 'test') == {'content': 'first'}
+    assert parser.calls == 1
+    cache_path = cache.get_cache_path(path, 'test')
+    assert cache_path.is_file()
+    assert cache_path.parent.stat().st_mode & 0o777 == 0o700
+    assert list(cache.directory.glob('*.tmp')) == []
+
+    cache.load(path, parser, 'other')
+    assert parser.calls == 2
+
+    # Same size and modification time with changed contents must be detected
+    stat = path.stat()
+    path.write_text('other', encoding='utf-8')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.load(path, parser, 'test') == {'content': 'other'}
+    assert parser.calls == 3
+
+    cache.clear('test')
+    assert not cache_path.exists()
+    assert len(list(cache.directory.glob('*.cache'))) == 1
+    cache.clear()
+    assert list(cache.directory.glob('*.cache')) == []
+
+
+def test_configuration_cache_invalid_cache_file(tmpdir) -> None:
+    """
+    Test invalid cache files are replaced
+    """
+    path = Path(tmpdir, 'test.conf')
+    path.write_text('data', encoding='utf-8')
+    cache = ParsedDataCache(Path(tmpdir, 'cache'))
+    parser = CountingParser()
+    cache.directory.mkdir(mode=0o700)
+    cache.get_cache_path(path, 'test').write_bytes(b'invalid')
+
+    assert cache.load(path, parser, 'test') == {'content': 'data'}
+    assert cache.load(path, parser, 'test') == {'content': 'data'}
+    assert parser.calls == 1
+
+
+def test_configuration_cache_untrusted_directory(tmpdir) -> None:
+    """
+    Test cache files are not used from directory writable by others
+    """
+    path = Path(tmpdir, 'test.conf')
+    path.write_text('data', encoding='utf-8')
+    cache = ParsedDataCache(Path(tmpdir, 'cache'))
+    cache.directory.mkdir()
+    cache.directory.chmod(0o777)
+    parser = CountingParser()
+
+    cache.load(path, parser, 'test')
+    cache.load(path, parser, 'test')
+    assert parser.calls == 2
+    assert not cache.get_cache_path(path, 'test').exists()
+
+
+def test_configuration_cache_missing_file(tmpdir) -> None:
+    """
+    Test loading missing file with cache
+    """
+    cache = ParsedDataCache(Path(tmpdir, 'cache'))
+    with pytest.raises(ConfigurationError):
+        cache.load(Path(tmpdir, 'missing.conf'), CountingParser(), 'test')
+
+
+def test_configuration_cache_configuration_files(tmpdir) -> None:
+    """
+    Test configuration files with cache directory
+    """
+    class CachedYamlConfiguration(YamlConfiguration):
+        """
+        YAML configuration with cache directory
+        """
+        __cache_directory__ = Path(tmpdir, 'cache')
+
+    class CachedJsonConfiguration(JsonConfiguration):
+        """
+        JSON configuration with cache directory
+        """
+        __cache_directory__ = Path(tmpdir, 'cache')
+
+    for _attempt in range(2):
+        validate_configuration_section(CachedYamlConfiguration(TEST_VALID), TEST_DEFAULT_DATA)
+    cache_directory = CachedYamlConfiguration.__cache_directory__
+    assert len(list(cache_directory.glob('yaml-*.cache'))) == 1
+
+    path = Path(tmpdir, 'test.json')
+    path.write_text('{"test_key": "test value"}', encoding='utf-8')
+    for _attempt in range(2):
+        assert CachedJsonConfiguration(path).test_key == 'test value'  # pylint: disable=no-member
+    assert len(list(cache_directory.glob('json-*.cache'))) == 1
+
+    path.write_text('{"test_key": "other value"}', encoding='utf-8')
+    assert CachedJsonConfiguration(path).test_key == 'other value'  # pylint: disable=no-member
+
+    path.write_text('{"test_key": ', encoding='utf-8')
+    with pytest.raises(ConfigurationError):
+        CachedJsonConfiguration(path)
+
+
+def test_configuration_cache_parser_key(tmpdir) -> None:
+    """
+    Test classes parsing same file with different loaders do not share cache entries
+    """
+    cache_directory = Path(tmpdir, 'cache')
+
+    class CachedYamlConfiguration(YamlConfiguration):
+        """
+        YAML configuration with cache directory
+        """
+        __cache_directory__ = cache_directory
+
+    class CachedBaseLoaderConfiguration(YamlConfiguration):
+        """
+        YAML configuration loaded with BaseLoader with cache directory
+        """
+        __cache_directory__ = cache_directory
+        __yaml_loader__ = yaml.BaseLoader
+
+    path = Path(tmpdir, 'test.yml')
+    path.write_text('port: 80\n', encoding='utf-8')
+    # pylint: disable=no-member
+    assert CachedYamlConfiguration(path).port == 80
+    assert CachedBaseLoaderConfiguration(path).port == '80'
+    assert CachedYamlConfiguration(path).port == 80
+    assert len(list(cache_directory.glob('yaml-*.cache'))) == 2
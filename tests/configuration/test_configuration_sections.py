@@ -11,7 +11,15 @@ from typing import Any, Dict, Optional
 
 import pytest
 
-from sys_toolkit.configuration.base import ConfigurationList, ConfigurationSection
+from sys_toolkit.configuration import base
+from sys_toolkit.configuration.base import (
+    CompactConfigurationList,
+    CompactConfigurationSection,
+    ConfigurationList,
+    ConfigurationSchema,
+    ConfigurationSection,
+    LazyConfigurationSection,
+)
 from sys_toolkit.exceptions import ConfigurationError
 
 CALLABLE_SECTION_NAME = 'callme'
@@ -672,3 +680,275 @@ def test_configuration_section_callable_set_method() -> None:
 
     section.set(CALLABLE_SECTION_NAME, CALLABLE_SECTION_VALUE)
     assert called.set_call_count == 1
+
+
+class SchemaConfigurationSection(ConfigurationSection):
+    """
+    Configuration section with converters, key maps and callbacks of different kinds
+    """
+    __default_settings__ = {
+        'port': 80,
+        'name': 'default',
+        'label': 'label',
+    }
+    __integer_settings__ = ('port',)
+    __key_attribute_map__ = {
+        'host-name': 'host_name',
+        'hostname': 'host_name',
+    }
+
+    def validate_name(self, value: str) -> str:
+        """
+        Validate name with instance method
+        """
+        if not isinstance(self, SchemaConfigurationSection):
+            raise ValueError('Not bound to instance')
+        return value
+
+    @classmethod
+    def format_name(cls, value: str) -> str:
+        """
+        Format name with class method
+        """
+        return f'{cls.__name__}:{value}'
+
+    @staticmethod
+    def format_label(value: str) -> str:
+        """
+        Format label with static method
+        """
+        return value.upper()
+
+
+def test_configuration_section_schema() -> None:
+    """
+    Test configuration schema is compiled once per class
+    """
+    section = SchemaConfigurationSection({'host-name': 'example', 'port': '8080'})
+    schema = SchemaConfigurationSection.__configuration_schema__
+    assert isinstance(schema, ConfigurationSchema)
+    assert section.__schema__ is schema
+    assert SchemaConfigurationSection().__schema__ is schema
+    assert ConfigurationSection().__schema__ is not schema
+    assert schema.valid_settings == ['label', 'name', 'port']
+    assert sorted(schema.validators) == ['name']
+    assert sorted(schema.formatters) == ['label', 'name']
+
+    # pylint: disable=no-member
+    assert section.host_name == 'example'
+    assert section.port == 8080
+    assert section.name == 'SchemaConfigurationSection:default'
+    assert section.label == 'LABEL'
+    assert section.__key_from_attribute__('host_name') == 'host-name'
+    assert section.__key_from_attribute__('port') == 'port'
+
+
+def test_configuration_section_schema_instance_override() -> None:
+    """
+    Test replacing schema attributes on an instance does not change class schema
+    """
+    section = SchemaConfigurationSection()
+    section.__integer_settings__ = ()
+    section.__float_settings__ = ('port',)
+    section.set('port', '1.5')
+    # pylint: disable=no-member
+    assert section.port == 1.5
+    assert section.__schema__ is not SchemaConfigurationSection.__configuration_schema__
+
+    section.__key_attribute_map__ = {'other-name': 'host_name'}
+    assert section.__key_from_attribute__('host_name') == 'other-name'
+    assert SchemaConfigurationSection().__key_from_attribute__('host_name') == 'host-name'
+
+
+def test_configuration_section_schema_instance_callbacks() -> None:
+    """
+    Test validators and formatters set on an instance are used before class callbacks
+    """
+    def validate_label(value: str) -> str:
+        if len(value) > 5:
+            raise ValueError('Label is too long')
+        return value
+
+    section = SchemaConfigurationSection()
+    section.validate_label = validate_label
+    section.format_name = lambda value: f'instance:{value}'
+    section.set('name', 'test')
+    section.set('label', 'short')
+    # pylint: disable=no-member
+    assert section.name == 'instance:test'
+    assert section.label == 'SHORT'
+    with pytest.raises(ConfigurationError):
+        section.set('label', 'too long')
+    assert SchemaConfigurationSection().name == 'SchemaConfigurationSection:default'
+
+
+def test_configuration_section_schema_cache_size(monkeypatch) -> None:
+    """
+    Test attribute caches of configuration schema are bounded
+    """
+    class CachedConfigurationSection(ConfigurationSection):
+        """
+        Configuration section with a schema of its own
+        """
+
+    monkeypatch.setattr(base, 'CONFIGURATION_SCHEMA_CACHE_SIZE', 2)
+    section = CachedConfigurationSection()
+    for index in range(5):
+        section.set(f'setting_{index}', index)
+        section.__split_attribute_path__(f'key_{index}')
+    assert len(section.__schema__.valid_attributes) <= 2
+    assert len(section.__schema__.attribute_paths) <= 2
+
+
+def test_configuration_section_schema_invalid_defaults() -> None:
+    """
+    Test invalid default settings raise error on every instantiation
+    """
+    class InvalidDefaultsSection(ConfigurationSection):
+        """
+        Configuration section with invalid default setting name
+        """
+        __default_settings__ = {'invalid-name': 1}
+
+    for _attempt in range(2):
+        with pytest.raises(ConfigurationError):
+            InvalidDefaultsSection()
+
+
+class RequiredCompactConfigurationSection(CompactConfigurationSection):
+    """
+    Compact configuration section with required settings
+    """
+    __name__ = 'required'
+    __required_settings__ = ('name',)
+
+
+def test_configuration_section_compact_storage() -> None:
+    """
+    Test compact configuration sections store settings in a dictionary
+    """
+    section = CompactConfigurationSection(TEST_NESTED_LIST_DATA)
+    section.set('test_key', 'test value')
+    assert section.as_dict() == ConfigurationSection(section.as_dict()).as_dict()
+    assert '__attributes__' not in section.__dict__
+    assert 'test_key' not in section.__dict__
+    assert section.__storage__['test_key'] == 'test value'
+
+    # pylint: disable=no-member
+    assert section.test_key == 'test value'
+    nested = section.nested_item_1
+    assert isinstance(nested, CompactConfigurationSection)
+    assert isinstance(nested.list_field, CompactConfigurationList)
+    assert isinstance(nested.list_field[0], CompactConfigurationSection)
+    assert nested.list_field[0].list_nested_item.field == 1234
+
+    # Per-instance state is stored in slots instead of instance dictionary
+    for item in (section, nested, nested.list_field, nested.list_field[0]):
+        assert item.__dict__ == {}
+    assert repr(section) == ''
+    assert repr(nested) == 'nested_item_1'
+
+    with pytest.raises(AttributeError):
+        section.missing_setting  # pylint: disable=pointless-statement
+
+
+def test_configuration_section_compact_storage_validate() -> None:
+    """
+    Test validating required settings of compact configuration section
+    """
+    with pytest.raises(ConfigurationError):
+        RequiredCompactConfigurationSection()
+    section = RequiredCompactConfigurationSection({'name': 'test'})
+    assert section.name == 'test'  # pylint: disable=no-member
+    section.set('name', None)
+    with pytest.raises(ConfigurationError):
+        section.validate()
+
+
+class LazyValidatedConfigurationSection(LazyConfigurationSection):
+    """
+    Lazy configuration section with a setting validator
+    """
+    __name__ = 'lazy'
+
+    @staticmethod
+    def validate_port(value: Any) -> int:
+        """
+        Validate port setting
+        """
+        return int(value)
+
+
+def test_configuration_section_lazy_loading() -> None:
+    """
+    Test lazy configuration sections load nested dictionaries on first access
+    """
+    data = {
+        'test_key': 'test value',
+        'nested_level_1': {
+            'test_nested_key': 'test nested value',
+            'nested_level_2': {'field': 1234},
+        },
+        'other': {'field': 'other value'},
+        'path.to.item': {'field': 'path value'},
+    }
+    section = LazyConfigurationSection(data)
+    assert sorted(section.__pending__) == ['nested_level_1', 'other']
+    assert section.as_dict() == ConfigurationSection(data).as_dict()
+
+    section = LazyConfigurationSection(data)
+    # pylint: disable=no-member
+    nested = section.nested_level_1
+    assert isinstance(nested, LazyConfigurationSection)
+    assert sorted(section.__pending__) == ['other']
+    assert nested.test_nested_key == 'test nested value'
+    assert nested.nested_level_2.field == 1234
+    assert section.path.to.field == 'path value'
+
+    section.set('other.field', 'updated value')
+    assert not section.__pending__
+    assert section.other.field == 'updated value'
+
+    with pytest.raises(AttributeError):
+        section.missing_setting  # pylint: disable=pointless-statement
+
+
+def test_configuration_section_lazy_loading_merge() -> None:
+    """
+    Test data loaded to same lazy subsection multiple times is merged in order
+    """
+    section = LazyConfigurationSection({'nested': {'first': 1, 'second': 2}})
+    section.__load_dictionary__({'nested': {'second': 3}})
+    assert len(section.__pending__['nested']) == 2
+    assert not section.__subsections__
+    assert section.nested.as_dict() == {'first': 1, 'second': 3}  # pylint: disable=no-member
+
+
+def test_configuration_section_lazy_loading_validate() -> None:
+    """
+    Test validate with materialize loads all lazy subsections and raises errors
+    """
+    class LazyParentSection(LazyConfigurationSection):
+        """
+        Lazy configuration section with custom subsection loader
+        """
+        __section_loaders__ = (LazyValidatedConfigurationSection,)
+
+    class LazyRootSection(LazyConfigurationSection):
+        """
+        Lazy configuration section loading nested dictionaries with LazyParentSection
+        """
+        __dict_loader_class__ = LazyParentSection
+
+    section = LazyRootSection({'parent': {'lazy': {'port': 'invalid'}}, 'other': {'nested': {'field': 1}}})
+    assert sorted(section.__pending__) == ['other', 'parent']
+    with pytest.raises(ConfigurationError):
+        section.validate(materialize=True)
+
+    section = LazyRootSection({'parent': {'lazy': {'port': '80'}}, 'other': {'nested': {'field': 1}}})
+    section.validate(materialize=True)
+    assert not section.__pending__
+    # pylint: disable=no-member
+    assert not section.other.__pending__
+    assert section.other.nested.field == 1
+    assert section.parent.lazy.port == 80
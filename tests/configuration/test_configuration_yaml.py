@@ -9,10 +9,12 @@ Unit tests for yaml format configuration files
 from pathlib import Path
 
 import pytest
+import yaml
 
 from sys_toolkit.constants import DEFAULT_ENCODING
 from sys_toolkit.configuration.base import ConfigurationSection
 from sys_toolkit.configuration import YamlConfiguration
+from sys_toolkit.configuration.yaml import YamlSafeLoader
 from sys_toolkit.exceptions import ConfigurationError
 
 from ..conftest import MOCK_DATA, NONEXISTING_FILE
@@ -28,6 +30,13 @@ TEST_INVALID = TEST_CONFIGURATIONS.joinpath('test_invalid.yml')
 TEST_VALID = TEST_CONFIGURATIONS.joinpath('test_valid.yml')
 
 
+class PythonLoaderConfiguration(YamlConfiguration):
+    """
+    Configuration file loaded with python YAML loader
+    """
+    __yaml_loader__ = yaml.SafeLoader
+
+
 class DefaultsPathsConfiguration(YamlConfiguration):
     """
     Configuration file with valid default configurations
@@ -119,3 +128,38 @@ def test_configuration_yml_default_paths() -> None:
     """
     configuration = DefaultsPathsConfiguration()
     validate_configuration_section(configuration, TEST_DEFAULT_DATA)
+
+
+def test_configuration_yml_loader() -> None:
+    """
+    Test YAML loader is libyaml based when available and loads data equal to python
+    loader
+    """
+    if yaml.__with_libyaml__:
+        assert YamlSafeLoader is yaml.CSafeLoader
+    else:
+        assert YamlSafeLoader is yaml.SafeLoader
+    assert YamlConfiguration(TEST_VALID).as_dict() == PythonLoaderConfiguration(TEST_VALID).as_dict()
+
+    with pytest.raises(ConfigurationError):
+        PythonLoaderConfiguration(TEST_INVALID)
+
+
+def test_configuration_yml_loader_data(tmpdir) -> None:
+    """
+    Test libyaml and python loaders load equal data with various value types
+    """
+    path = Path(tmpdir).joinpath('test.yml')
+    with path.open('w', encoding=DEFAULT_ENCODING) as filedescriptor:
+        filedescriptor.write(
+            '---\n'
+            'text: "quoted \\u00e4 value"\n'
+            'multiline: |\n  first\n  second\n'
+            'date: 2020-01-02\n'
+            'values: [1, 2.5, null, true, 0x10]\n'
+            'anchor: &anchor\n  field: value\n'
+            'alias: *anchor\n'
+        )
+    configuration = YamlConfiguration(path)
+    assert configuration.as_dict() == PythonLoaderConfiguration(path).as_dict()
+    assert configuration.multiline == 'first\nsecond'  # pylint: disable=no-member
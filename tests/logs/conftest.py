@@ -0,0 +1,120 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit test configuration for sys_toolkit.logs module
+"""
+import gzip
+import logging
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+import pytest
+
+TEST_LOGGER_NAME = 'test-logs'
+
+
+def create_record(msg: str,
+                  *args,
+                  name: str = TEST_LOGGER_NAME,
+                  level: int = logging.ERROR,
+                  **extra) -> logging.LogRecord:
+    """
+    Create a log record for tests with extra attributes
+    """
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def wait_for(callback: Callable, timeout: float = 10.0) -> bool:
+    """
+    Wait for callback to return True
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if callback():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class MockLogRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP request handler storing received log requests to the server
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    # pylint: disable=invalid-name
+    def do_POST(self) -> None:
+        """
+        Store request body and respond with configured status code
+        """
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        with self.server.lock:
+            if self.server.status == 200:
+                self.server.requests.append((self.path, dict(self.headers), body))
+            else:
+                self.server.failures += 1
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format: str, *args) -> None:
+        """
+        Do not log requests
+        """
+
+
+class MockLogServer(ThreadingHTTPServer):
+    """
+    Local HTTP server standing in for a log collection endpoint
+    """
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), MockLogRequestHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.failures = 0
+        self.connections = 0
+        self.status = 200
+
+    @property
+    def url(self) -> str:
+        """
+        URL for posting logs to the server
+        """
+        return f'http://127.0.0.1:{self.server_address[1]}/logs'
+
+    def lines(self) -> list:
+        """
+        Return all received log lines
+        """
+        with self.lock:
+            return [line for _path, _headers, body in self.requests for line in body.splitlines()]
+
+
+@pytest.fixture
+def mock_log_server() -> Iterator[MockLogServer]:
+    """
+    Run a local HTTP server receiving log records
+    """
+    server = MockLogServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,120 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.benchmark module
+"""
+import json
+import logging
+
+import pytest
+
+from sys_toolkit.logs.benchmark import (
+    BENCHMARK_HANDLERS,
+    BENCHMARK_LOGGER_NAME,
+    BenchmarkEnvironment,
+    benchmark_formatters,
+    benchmark_handler,
+    benchmark_handlers,
+    get_percentile,
+    main,
+)
+
+
+def test_logs_benchmark_percentile() -> None:
+    """
+    Test nearest rank percentiles of sorted values
+    """
+    values = list(range(1, 101))
+    assert get_percentile(values, 50) == 50
+    assert get_percentile(values, 99) == 99
+    assert get_percentile(values, 100) == 100
+    assert get_percentile([5], 99) == 5
+    assert get_percentile([], 50) == 0
+
+
+def test_logs_benchmark_stream_handler_close() -> None:
+    """
+    Test closing benchmark stream handler closes the log file
+    """
+    with BenchmarkEnvironment() as environment:
+        handler = BENCHMARK_HANDLERS['stream'](environment)
+        handler.handle(logging.makeLogRecord({'msg': 'test message'}))
+        handler.close()
+        assert handler.stream.closed
+        handler.close()
+        assert environment.directory.joinpath('stream.log').read_text(encoding='utf-8') == 'test message\n'
+
+
+def test_logs_benchmark_handler_logger() -> None:
+    """
+    Test benchmark handlers are attached to a single logger and removed afterwards
+    """
+    with BenchmarkEnvironment() as environment:
+        for _attempt in range(2):
+            benchmark_handler(BENCHMARK_HANDLERS['stream'](environment), logging.INFO, 16, 5)
+    assert not [name for name in logging.root.manager.loggerDict if name.startswith(f'{BENCHMARK_LOGGER_NAME}.')]
+    assert logging.getLogger(BENCHMARK_LOGGER_NAME).handlers == []
+
+
+@pytest.mark.benchmark
+def test_logs_benchmark_formatters() -> None:
+    """
+    Test running formatter benchmarks
+    """
+    results = benchmark_formatters(100)
+    assert 'logging.Formatter' in results
+    assert 'CachedTimeFormatter' in results
+    assert 'JSONFormatter(json)' in results
+    for result in results.values():
+        assert result['records'] == 100
+        assert result['records_per_second'] > 0
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('name', list(BENCHMARK_HANDLERS))
+def test_logs_benchmark_handler(name) -> None:
+    """
+    Test benchmarking handlers against local log targets
+    """
+    with BenchmarkEnvironment() as environment:
+        handler = BENCHMARK_HANDLERS[name](environment)
+        result = benchmark_handler(handler, logging.INFO, 128, 20)
+        assert result['records'] == 20
+        assert result['records_per_second'] > 0
+        assert 0 < result['p50_us'] <= result['p99_us']
+    assert not environment.directory.exists()
+
+
+@pytest.mark.benchmark
+def test_logs_benchmark_handlers() -> None:
+    """
+    Test benchmarking handlers at levels and message sizes
+    """
+    results = benchmark_handlers(5, ['stream', 'batch_syslog'], ['DEBUG', 'ERROR'], [16, 256])
+    assert len(results) == 8
+    assert {(result['handler'], result['level'], result['message_size']) for result in results} == {
+        (handler, level, size)
+        for handler in ('stream', 'batch_syslog')
+        for level in ('DEBUG', 'ERROR')
+        for size in (16, 256)
+    }
+
+
+@pytest.mark.benchmark
+def test_logs_benchmark_main(capsys, tmpdir) -> None:
+    """
+    Test running benchmarks from command line
+    """
+    main(['10', '--handler-count', '5', '--handlers', 'stream', '--levels', 'INFO'])
+    results = json.loads(capsys.readouterr().out)
+    assert results['formatters']['logging.Formatter']['records'] == 10
+    assert results['handlers'][0]['handler'] == 'stream'
+    assert len(results['handlers']) == 2
+
+    output = tmpdir.join('results.json')
+    main(['10', '--handler-count', '5', '--handlers', 'http', '--message-sizes', '64', '--output', str(output)])
+    results = json.loads(output.read())
+    assert [result['level'] for result in results['handlers']] == ['DEBUG', 'INFO', 'ERROR']
@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.central module
+"""
+import marshal
+import multiprocessing
+import os
+import signal
+import struct
+
+from pathlib import Path
+
+import pytest
+
+from sys_toolkit.exceptions import LoggerError
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs import central
+from sys_toolkit.logs.central import (
+    CentralFileHandler,
+    LogWriter,
+    LOG_WRITER_SOCKET_ENV,
+    decode_frames,
+    encode_frame,
+    get_peer_uid,
+    is_log_writer_running,
+    start_log_writer,
+)
+
+from .conftest import create_record, wait_for
+
+RECORD_COUNT = 500
+
+
+def stop_writer(process) -> None:
+    """
+    Stop log writer process
+    """
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=10)
+
+
+def write_records(socket_path: str, filename: str, worker: int) -> None:
+    """
+    Write log records from a worker process
+    """
+    handler = CentralFileHandler(socket_path, filename, batch_size=50)
+    for index in range(RECORD_COUNT):
+        handler.handle(create_record(f'worker {worker} record {index} ' + 'x' * 100))
+    handler.close()
+
+
+def test_logs_central_frames() -> None:
+    """
+    Test encoding and decoding frames of records
+    """
+    buffer = bytearray(encode_frame('/tmp/test.log', {'max_bytes': 1}, b'first\n'))
+    second = encode_frame('/tmp/other.log', {}, b'second\n')
+    buffer.extend(second[:5])
+    assert decode_frames(buffer) == [('/tmp/test.log', {'max_bytes': 1}, b'first\n')]
+    assert buffer == second[:5]
+    buffer.extend(second[5:])
+    assert decode_frames(buffer) == [('/tmp/other.log', {}, b'second\n')]
+    assert buffer == bytearray()
+
+
+def test_logs_central_writer_write(tmpdir) -> None:
+    """
+    Test log writer joins and rotates batches for files
+    """
+    path = str(Path(tmpdir, 'test.log'))
+    writer = LogWriter(Path(tmpdir, 'writer.sock'), directories=[tmpdir])
+    options = {'max_bytes': 20, 'backup_count': 5}
+    writer.write([(path, options, b'first line\n'), (path, options, b'second line\n')])
+    writer.write([(path, options, b'third line\n')])
+    writer.close()
+    assert Path(path).read_text(encoding='utf-8') == 'third line\n'
+    rotated = list(Path(tmpdir).glob('test.log.*'))
+    assert len(rotated) == 1
+    assert rotated[0].read_text(encoding='utf-8') == 'first line\nsecond line\n'
+
+
+def test_logs_central_multiple_processes(tmpdir) -> None:
+    """
+    Test records from multiple processes are written by the log writer without
+    interleaving lines
+    """
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    filename = str(Path(tmpdir, 'test.log'))
+    process = start_log_writer(socket_path, [tmpdir])
+    try:
+        assert is_log_writer_running(socket_path)
+        assert start_log_writer(socket_path, [tmpdir]) is None
+
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=write_records, args=(socket_path, filename, index)) for index in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+            assert worker.exitcode == 0
+    finally:
+        stop_writer(process)
+
+    assert not Path(socket_path).exists()
+    lines = Path(filename).read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 4 * RECORD_COUNT
+    for worker in range(4):
+        worker_lines = [line for line in lines if line.startswith(f'worker {worker} ')]
+        assert [int(line.split()[3]) for line in worker_lines] == list(range(RECORD_COUNT))
+        assert all(line.endswith('x' * 100) for line in worker_lines)
+
+
+def test_logs_central_lazy_start(tmpdir, monkeypatch) -> None:
+    """
+    Test log writer is started by first process sending records and stops when idle
+    """
+    monkeypatch.setattr(central, 'DEFAULT_LOG_WRITER_IDLE_TIMEOUT', 0.5)
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    filename = Path(tmpdir, 'test.log')
+    handler = CentralFileHandler(socket_path, filename, max_latency=0.01)
+    handler.handle(create_record('lazy start'))
+    assert wait_for(lambda: filename.is_file() and filename.read_text(encoding='utf-8') == 'lazy start\n')
+    assert is_log_writer_running(socket_path)
+    handler.close()
+    assert wait_for(lambda: not Path(socket_path).exists())
+
+
+def test_logs_central_writer_not_started(tmpdir) -> None:
+    """
+    Test records are queued when writer is not running and not started
+    """
+    handler = CentralFileHandler(Path(tmpdir, 'writer.sock'), Path(tmpdir, 'test.log'), start_writer=False)
+    handler.flush()
+    handler.handle(create_record('queued'))
+    handler.flush()
+    assert handler.queued == 1
+    handler.close()
+    assert handler.dropped == 1
+
+
+def test_logs_central_writer_already_running(tmpdir) -> None:
+    """
+    Test log writer refuses to start when another writer is running
+    """
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    process = start_log_writer(socket_path, [tmpdir])
+    try:
+        with pytest.raises(LoggerError):
+            LogWriter(socket_path).serve_forever()
+    finally:
+        stop_writer(process)
+
+
+def test_logs_central_logger_mode(tmpdir) -> None:
+    """
+    Test registering file handlers in centralized file logging mode
+    """
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    process = Logger.enable_central_file_logging(socket_path, start_writer=True, directories=[tmpdir])
+    try:
+        assert LOG_WRITER_SOCKET_ENV not in os.environ
+        logger = Logger('test-central')
+        registered = logger.register_file_handler('test-central', tmpdir, logformat='%(message)s')
+        logger.register_file_handler('test-central', tmpdir)
+        handlers = [handler for handler in registered.handlers if isinstance(handler, CentralFileHandler)]
+        assert len(handlers) == 1
+        registered.error('central message')
+        registered.removeHandler(handlers[0])
+        handlers[0].close()
+    finally:
+        Logger.disable_central_file_logging()
+        stop_writer(process)
+    assert LOG_WRITER_SOCKET_ENV not in os.environ
+    assert Path(tmpdir, 'test-central.log').read_text(encoding='utf-8') == 'central message\n'
+
+
+def test_logs_central_invalid_frames() -> None:
+    """
+    Test decoding invalid frames raises LoggerError
+    """
+    with pytest.raises(LoggerError):
+        decode_frames(bytearray(b'\xff\xff\xff\xff'))
+    payload = marshal.dumps(['not', 'a', 'frame'])
+    with pytest.raises(LoggerError):
+        decode_frames(bytearray(struct.pack('!I', len(payload)) + payload))
+    with pytest.raises(LoggerError):
+        decode_frames(bytearray(struct.pack('!I', 3) + b'\x00\x01\x02'))
+
+
+def test_logs_central_writer_directories(tmpdir, capsys) -> None:
+    """
+    Test log writer discards batches for files outside its directories
+    """
+    directory = Path(tmpdir, 'logs')
+    directory.mkdir()
+    outside = Path(tmpdir, 'outside.log')
+    writer = LogWriter(Path(tmpdir, 'writer.sock'), directories=[directory])
+    allowed = str(directory.joinpath('test.log'))
+    assert writer.write([(str(outside), {}, b'rejected\n'), (allowed, {}, b'allowed\n')]) == {str(outside)}
+    writer.write([(str(directory.joinpath('..', 'outside.log')), {}, b'rejected\n')])
+    writer.close()
+    assert not outside.exists()
+    assert directory.joinpath('test.log').read_text(encoding='utf-8') == 'allowed\n'
+    assert 'Error opening log file' in capsys.readouterr().err
+
+    with pytest.raises(LoggerError):
+        start_log_writer(Path(tmpdir, 'writer.sock'), [])
+
+
+def test_logs_central_handlers_in_different_directories(tmpdir, monkeypatch) -> None:
+    """
+    Test records rejected by a lazily started log writer are written to the log file
+    of a handler in another directory directly
+    """
+    monkeypatch.setattr(central, 'DEFAULT_LOG_WRITER_IDLE_TIMEOUT', 2.0)
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    first = Path(tmpdir, 'first', 'test.log')
+    second = Path(tmpdir, 'second', 'test.log')
+    first.parent.mkdir()
+    second.parent.mkdir()
+    first_handler = CentralFileHandler(socket_path, first)
+    second_handler = CentralFileHandler(socket_path, second)
+    try:
+        first_handler.handle(create_record('first message'))
+        first_handler.flush()
+        second_handler.handle(create_record('second message'))
+        second_handler.flush()
+        assert first_handler.sent_records == 1
+        assert first_handler.local_records == 0
+        assert second_handler.sent_records == 0
+        assert second_handler.local_records == 1
+    finally:
+        first_handler.close()
+        second_handler.close()
+    assert wait_for(lambda: first.is_file() and first.read_text(encoding='utf-8') == 'first message\n')
+    assert second.read_text(encoding='utf-8') == 'second message\n'
+    assert wait_for(lambda: not Path(socket_path).exists())
+
+
+def test_logs_central_writer_socket_permissions(tmpdir) -> None:
+    """
+    Test log writer socket is accessible by owner only and peer is checked
+    """
+    socket_path = str(Path(tmpdir, 'writer.sock'))
+    process = start_log_writer(socket_path, [tmpdir])
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+        connection = central.connect_log_writer(socket_path)
+        assert get_peer_uid(connection) in (os.getuid(), None)
+        connection.close()
+    finally:
+        stop_writer(process)
@@ -0,0 +1,169 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.filters module
+"""
+import logging
+
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs import filters
+from sys_toolkit.logs.filters import RateLimitFilter, SamplingFilter
+
+from .conftest import create_record
+
+
+class RecordingHandler(logging.Handler):
+    """
+    Handler storing handled records
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+class UnformattableMessage:
+    """
+    Message object failing the test if it's formatted
+    """
+    __hash__ = None
+
+    def __str__(self) -> str:
+        raise AssertionError('Message was formatted')
+
+
+def test_logs_filters_rate_limit(monkeypatch) -> None:
+    """
+    Test token bucket rate limiting by logger, level and message template
+    """
+    now = [100.0]
+    monkeypatch.setattr(filters.time, 'monotonic', lambda: now[0])
+    log_filter = RateLimitFilter(rate=1, burst=2, summary_interval=None)
+
+    results = [log_filter.filter(create_record('failed %s', index)) for index in range(5)]
+    assert results == [True, True, False, False, False]
+    assert log_filter.filter(create_record('other %s', 1))
+    assert log_filter.filter(create_record('failed %s', 1, level=logging.WARNING))
+    assert log_filter.filter(create_record('failed %s', 1, name='test-filters-other'))
+    assert log_filter.suppressed == 3
+
+    now[0] += 1.5
+    assert log_filter.filter(create_record('failed %s', 6))
+    assert not log_filter.filter(create_record('failed %s', 7))
+
+
+def test_logs_filters_rate_limit_no_formatting() -> None:
+    """
+    Test rate limited records are not formatted
+    """
+    log_filter = RateLimitFilter(rate=0, burst=1, summary_interval=None)
+    message = UnformattableMessage()
+    assert log_filter.filter(create_record(message))
+    assert not log_filter.filter(create_record(message))
+
+
+def test_logs_filters_rate_limit_summaries(monkeypatch) -> None:
+    """
+    Test summaries of suppressed records are passed to the logger
+    """
+    now = [100.0]
+    monkeypatch.setattr(filters.time, 'monotonic', lambda: now[0])
+    logger = logging.getLogger('test-filters-summary')
+    logger.propagate = False
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    log_filter = RateLimitFilter(rate=0, burst=1, summary_interval=10)
+    logger.addFilter(log_filter)
+
+    for index in range(5):
+        logger.error('failed %s', index)
+    assert [record.getMessage() for record in handler.records] == ['failed 0']
+
+    now[0] += 11
+    logger.error('failed %s', 5)
+    assert [record.getMessage() for record in handler.records] == [
+        'failed 0',
+        '5 similar messages suppressed: failed 1',
+    ]
+    assert handler.records[-1].levelno == logging.ERROR
+
+    logger.error('failed %s', 6)
+    log_filter.send_summaries()
+    assert handler.records[-1].getMessage() == '1 similar messages suppressed: failed 6'
+    log_filter.send_summaries()
+    assert len(handler.records) == 3
+    logger.removeFilter(log_filter)
+    logger.removeHandler(handler)
+
+
+def test_logs_filters_rate_limit_max_keys() -> None:
+    """
+    Test number of rate limited keys is bounded
+    """
+    log_filter = RateLimitFilter(rate=0, burst=1, summary_interval=None, max_keys=10)
+    for index in range(100):
+        assert log_filter.filter(create_record(f'message {index}'))
+    assert len(log_filter.__buckets__) <= 10
+
+
+def test_logs_filters_rate_limit_prune_least_recently_used() -> None:
+    """
+    Test least recently used keys are pruned in batches at the key limit
+    """
+    log_filter = RateLimitFilter(rate=0, burst=1, summary_interval=None, max_keys=100)
+    records = [create_record(f'message {index}') for index in range(101)]
+    for record in records[:100]:
+        assert log_filter.filter(record)
+    assert not log_filter.filter(records[0])
+    assert log_filter.filter(records[100])
+
+    buckets = log_filter.__buckets__
+    assert len(buckets) == 91
+    assert log_filter.get_key(records[0]) in buckets
+    assert log_filter.get_key(records[1]) not in buckets
+    assert log_filter.get_key(records[11]) in buckets
+
+
+def test_logs_filters_sampling(monkeypatch) -> None:
+    """
+    Test sampling records by level
+    """
+    values = iter([0.05, 0.5, 0.2, 0.9])
+    log_filter = SamplingFilter()
+    monkeypatch.setattr(log_filter, '__random__', lambda: next(values))
+    assert log_filter.filter(create_record('debug', level=logging.DEBUG))
+    assert not log_filter.filter(create_record('debug', level=logging.DEBUG))
+    assert log_filter.filter(create_record('info', level=logging.INFO))
+    assert not log_filter.filter(create_record('info', level=logging.INFO))
+    assert log_filter.filter(create_record('error', level=logging.ERROR))
+    assert log_filter.dropped == 2
+
+
+def test_logs_filters_logger_group() -> None:
+    """
+    Test adding filters to loggers of a logger group
+    """
+    logger = Logger('test-filters-group')
+    log_filter = SamplingFilter({logging.ERROR: 0})
+    logger.add_filter(log_filter)
+    logger.add_filter(log_filter)
+    registered = logger.register_stream_handler('test-filters-group-other')
+    group_logger = logging.getLogger('test-filters-group')
+    assert group_logger.filters == [log_filter]
+    assert registered.filters == [log_filter]
+
+    handler = RecordingHandler()
+    registered.addHandler(handler)
+    registered.error('dropped')
+    assert not handler.records
+
+    logger.remove_filter(log_filter)
+    registered.error('passed')
+    assert len(handler.records) == 1
+    assert not group_logger.filters
+    registered.removeHandler(handler)
@@ -0,0 +1,210 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.formatters module
+"""
+import json
+import logging
+import sys
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sys_toolkit.exceptions import LoggerError
+from sys_toolkit.logger import Logger, create_formatter
+from sys_toolkit.logs import formatters
+from sys_toolkit.logger import DEFAULT_LOGFILE_FORMAT, DEFAULT_LOGFORMAT, DEFAULT_LOG_TIME_FORMAT
+from sys_toolkit.logs.formatters import CachedTimeFormatter, JSONFormatter, JSON_BACKENDS, get_record_extra
+
+from .conftest import TEST_LOGGER_NAME, create_record
+
+EXPECTED_BACKENDS = [
+    backend for backend in JSON_BACKENDS
+    if backend != formatters.JSON_BACKEND_ORJSON or formatters.orjson is not None
+]
+
+
+def test_logs_formatters_record_extra() -> None:
+    """
+    Test detecting extra fields of log records
+    """
+    assert get_record_extra(create_record('test')) == {}
+    assert get_record_extra(create_record('test', user='test', count=1)) == {'user': 'test', 'count': 1}
+
+
+@pytest.mark.parametrize('backend', EXPECTED_BACKENDS)
+def test_logs_formatters_json_defaults(backend) -> None:
+    """
+    Test formatting records with default fields
+    """
+    record = create_record(
+        'message %s', 'ä',
+        started=datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        elapsed=timedelta(seconds=5),
+        path=formatters,
+    )
+    record.created = 1672628645.5
+    formatter = JSONFormatter(backend=backend)
+    assert formatter.backend == backend
+    line = formatter.format(record)
+    assert '\n' not in line
+    assert json.loads(line) == {
+        'timestamp': '2023-01-02T03:04:05.500000+00:00',
+        'level': 'ERROR',
+        'logger': TEST_LOGGER_NAME,
+        'message': 'message ä',
+        'extra': {
+            'started': '2023-01-02T03:04:05+00:00',
+            'elapsed': '00:00:05',
+            'path': str(formatters),
+        },
+    }
+
+
+def test_logs_formatters_json_backends_identical() -> None:
+    """
+    Test JSON backends produce identical output
+    """
+    if formatters.orjson is None:
+        pytest.skip('orjson is not installed')
+    record = create_record('message ä', value=1.5, items=[1, 'two', None], day=datetime(2023, 1, 1).date())
+    assert JSONFormatter(backend='json').format(record) == JSONFormatter(backend='orjson').format(record)
+
+
+def test_logs_formatters_json_fields_exc_info() -> None:
+    """
+    Test formatting selected fields and exception info
+    """
+    formatter = JSONFormatter(fields=('level', 'message', 'lineno', 'exc_info'))
+    try:
+        raise ValueError('test error')
+    except ValueError:
+        record = logging.LogRecord('test-json', logging.ERROR, __file__, 10, 'failed', (), sys.exc_info())
+    data = json.loads(formatter.format(record))
+    assert list(data) == ['level', 'message', 'lineno', 'exc_info']
+    assert data['lineno'] == 10
+    assert 'ValueError: test error' in data['exc_info']
+    assert json.loads(formatter.format(create_record('ok'))) == {'level': 'ERROR', 'message': 'ok', 'lineno': 1}
+
+
+def test_logs_formatters_json_invalid() -> None:
+    """
+    Test invalid JSON formatter arguments
+    """
+    with pytest.raises(LoggerError):
+        JSONFormatter(fields=('timestamp', 'unknown'))
+    with pytest.raises(LoggerError):
+        JSONFormatter(backend='unknown')
+
+
+def test_logs_formatters_json_orjson_missing(monkeypatch) -> None:
+    """
+    Test JSON formatter falls back to json when orjson is not installed
+    """
+    monkeypatch.setattr(formatters, 'orjson', None)
+    assert JSONFormatter().backend == formatters.JSON_BACKEND_JSON
+    with pytest.raises(LoggerError):
+        JSONFormatter(backend=formatters.JSON_BACKEND_ORJSON)
+
+
+def test_logs_formatters_create_formatter() -> None:
+    """
+    Test creating formatters for registered handlers
+    """
+    formatter = JSONFormatter()
+    assert create_formatter(formatter) is formatter
+    assert isinstance(create_formatter('json'), JSONFormatter)
+    assert create_formatter('%(message)s', '%H').datefmt == '%H'
+
+
+def test_logs_formatters_register_json_file_handler(tmpdir) -> None:
+    """
+    Test registering file handler with JSON log format
+    """
+    logger = Logger('test-json-formatter')
+    registered = logger.register_file_handler('test-json-formatter', tmpdir.strpath, logformat='json')
+    registered.warning('json message', extra={'user': 'test'})
+    for handler in registered.handlers:
+        handler.flush()
+    lines = tmpdir.join('test-json-formatter.log').read().splitlines()
+    data = json.loads(lines[-1])
+    assert data['message'] == 'json message'
+    assert data['extra'] == {'user': 'test'}
+
+
+@pytest.mark.parametrize('logformat,timeformat', [
+    (DEFAULT_LOGFORMAT, DEFAULT_LOG_TIME_FORMAT),
+    (DEFAULT_LOGFILE_FORMAT, DEFAULT_LOG_TIME_FORMAT),
+    ('%(asctime)s.%(msecs)03d %(levelname)-8s %(lineno)5d %(name)r 100%% %(message)s', None),
+    ('%(message)s', None),
+])
+def test_logs_formatters_cached_time_output(logformat, timeformat) -> None:
+    """
+    Test cached time formatter output matches logging.Formatter
+    """
+    expected = logging.Formatter(logformat, timeformat)
+    formatter = CachedTimeFormatter(logformat, timeformat)
+    for offset in (0, 0.25, 1.5, 3601):
+        record = create_record('message %s', 'value', request_id=1)
+        record.created += offset
+        record.msecs = (record.created - int(record.created)) * 1000
+        assert formatter.format(record) == expected.format(record)
+
+
+def test_logs_formatters_cached_time_exception() -> None:
+    """
+    Test cached time formatter output with exception information
+    """
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = create_record('failed')
+    record.exc_info = exc_info
+    output = CachedTimeFormatter('%(levelname)s %(message)s').format(record)
+    assert output.startswith('ERROR failed\nTraceback')
+    assert output.endswith('ValueError: failed')
+
+
+def test_logs_formatters_cached_time_rendering(monkeypatch) -> None:
+    """
+    Test timestamps are rendered only when the second changes
+    """
+    calls = []
+
+    def strftime(timeformat, value):
+        calls.append(value)
+        return f'rendered {len(calls)}'
+
+    monkeypatch.setattr(formatters.time, 'strftime', strftime)
+    formatter = CachedTimeFormatter('%(asctime)s %(message)s', '%H:%M:%S')
+    record = create_record('message')
+    record.created = 1000.1
+    assert formatter.format(record) == 'rendered 1 message'
+    record.created = 1000.9
+    assert formatter.format(record) == 'rendered 1 message'
+    record.created = 1001.0
+    assert formatter.format(record) == 'rendered 2 message'
+    assert len(calls) == 2
+
+
+def test_logs_formatters_cached_time_styles() -> None:
+    """
+    Test cached time formatter with other format styles and missing fields
+    """
+    record = create_record('message')
+    assert CachedTimeFormatter('{levelname} {message}', style='{').format(record) == 'ERROR message'
+    assert CachedTimeFormatter('$levelname $message', style='$').format(record) == 'ERROR message'
+    with pytest.raises(ValueError):
+        CachedTimeFormatter('%(missing)s').format(record)
+
+
+def test_logs_formatters_create_formatter_cached_time() -> None:
+    """
+    Test log format strings create cached time formatters
+    """
+    assert isinstance(create_formatter(DEFAULT_LOGFORMAT, DEFAULT_LOG_TIME_FORMAT), CachedTimeFormatter)
@@ -0,0 +1,197 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.http module
+"""
+import json
+import logging
+
+from pathlib import Path
+
+import pytest
+
+from sys_toolkit.exceptions import LoggerError
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs.http import BatchHTTPHandler
+
+from .conftest import TEST_LOGGER_NAME, create_record, wait_for
+
+
+def test_logs_http_batch_size(mock_log_server) -> None:
+    """
+    Test records are sent in batches of batch size over one connection
+    """
+    handler = BatchHTTPHandler(mock_log_server.url, batch_size=5, max_latency=60)
+    assert repr(handler) == f'<BatchHTTPHandler POST {mock_log_server.url}>'
+    for index in range(10):
+        handler.handle(create_record(f'message {index}'))
+    assert wait_for(lambda: len(mock_log_server.requests) == 2)
+    handler.close()
+
+    assert mock_log_server.connections == 1
+    assert handler.sent_batches == 2
+    assert handler.sent_records == 10
+    for path, headers, body in mock_log_server.requests:
+        assert path == '/logs'
+        assert headers['Content-Type'] == 'application/x-ndjson'
+        assert len(body.splitlines()) == 5
+    record = json.loads(mock_log_server.lines()[0])
+    assert record['message'] == 'message 0'
+    assert record['level'] == 'ERROR'
+    assert record['logger'] == TEST_LOGGER_NAME
+    assert record['time'].endswith('+00:00')
+
+
+def test_logs_http_max_latency(mock_log_server) -> None:
+    """
+    Test partial batches are sent after max latency
+    """
+    handler = BatchHTTPHandler(mock_log_server.url, batch_size=100, max_latency=0.1)
+    for index in range(3):
+        handler.handle(create_record(f'message {index}'))
+    assert wait_for(lambda: len(mock_log_server.requests) == 1)
+    assert len(mock_log_server.lines()) == 3
+    handler.close()
+
+
+def test_logs_http_compress_flush_on_close(mock_log_server) -> None:
+    """
+    Test compressed batches and sending queued records when handler is closed
+    """
+    handler = BatchHTTPHandler(mock_log_server.url, batch_size=100, max_latency=60, compress=True)
+    handler.setFormatter(logging.Formatter('{"custom": "%(message)s"}'))
+    for index in range(3):
+        handler.handle(create_record(f'message {index}'))
+    handler.close()
+    assert len(mock_log_server.requests) == 1
+    assert mock_log_server.requests[0][1]['Content-Encoding'] == 'gzip'
+    assert json.loads(mock_log_server.lines()[2]) == {'custom': 'message 2'}
+
+
+def test_logs_http_spool_failed_batches(mock_log_server, tmpdir) -> None:
+    """
+    Test failed batches are spooled and sent when the endpoint recovers
+    """
+    mock_log_server.status = 500
+    handler = BatchHTTPHandler(
+        mock_log_server.url,
+        batch_size=2,
+        max_latency=60,
+        retries=1,
+        backoff=0.01,
+        spool_directory=tmpdir.strpath
+    )
+    handler.handle(create_record('message 1'))
+    handler.handle(create_record('message 2'))
+    assert wait_for(lambda: handler.spooled_batches == 1)
+    assert mock_log_server.failures == 2
+    assert len(handler.spooled_files) == 1
+
+    mock_log_server.status = 200
+    handler.handle(create_record('message 3'))
+    handler.handle(create_record('message 4'))
+    assert wait_for(lambda: len(mock_log_server.requests) == 2)
+    handler.close()
+    assert handler.spooled_files == []
+    assert sorted(json.loads(line)['message'] for line in mock_log_server.lines()) == [
+        'message 1', 'message 2', 'message 3', 'message 4'
+    ]
+
+
+def test_logs_http_spooled_files_removed(tmpdir, monkeypatch) -> None:
+    """
+    Test spooled files removed by another handler sharing the spool directory are skipped
+    """
+    handler = BatchHTTPHandler('http://localhost/logs', max_latency=60, spool_directory=tmpdir.strpath)
+    for index in range(2):
+        Path(tmpdir, f'{index:020d}-1.ndjson').write_bytes(b'{}\n')
+    bodies = []
+
+    def post(body: bytes, _compressed: bool) -> None:
+        bodies.append(body)
+        assert Path(tmpdir, f'.{0:020d}-1.ndjson.sending').is_file()
+        for path in handler.spooled_files:
+            path.unlink()
+
+    monkeypatch.setattr(handler, '__post__', post)
+    handler.__send_spooled__()
+    assert bodies == [b'{}\n']
+    assert handler.sent_batches == 1
+    assert handler.spooled_files == []
+    handler.close()
+
+
+def test_logs_http_spooled_files_claimed(tmpdir, monkeypatch) -> None:
+    """
+    Test spooled files failing to send are released to be sent again
+    """
+    handler = BatchHTTPHandler('http://localhost/logs', max_latency=60, spool_directory=tmpdir.strpath)
+    path = Path(tmpdir, f'{0:020d}-1.ndjson')
+    path.write_bytes(b'{}\n')
+
+    def post(_body: bytes, _compressed: bool) -> None:
+        assert handler.spooled_files == []
+        raise LoggerError('Error sending logs')
+
+    monkeypatch.setattr(handler, '__post__', post)
+    handler.__send_spooled__()
+    assert handler.spooled_files == [path]
+    assert handler.sent_batches == 0
+    handler.close()
+
+
+def test_logs_http_dropped_batches(mock_log_server, monkeypatch) -> None:
+    """
+    Test failed batches are dropped and reported when there is no spool directory
+    """
+    mock_log_server.status = 500
+    handler = BatchHTTPHandler(mock_log_server.url, batch_size=2, max_latency=60, retries=0)
+    errors = []
+    monkeypatch.setattr(handler, 'handleError', errors.append)
+    for index in range(4):
+        handler.handle(create_record(f'message {index}'))
+    assert wait_for(lambda: handler.dropped == 4)
+    handler.close()
+    assert handler.sent_records == 0
+    assert len(errors) == 2
+    assert errors[0].getMessage() == f'Dropped batch of 2 records to {mock_log_server.url}'
+
+
+def test_logs_http_register_handler(mock_log_server, monkeypatch) -> None:
+    """
+    Test registering batched HTTP handler to a logger group
+    """
+    created = []
+
+    class CountingBatchHTTPHandler(BatchHTTPHandler):
+        """
+        Batched HTTP handler counting created instances
+        """
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr('sys_toolkit.logger.BatchHTTPHandler', CountingBatchHTTPHandler)
+    logger = Logger('test-http-batch')
+    registered = logger.register_batch_http_handler('test-http-batch', mock_log_server.url, max_latency=0.01)
+    logger.register_batch_http_handler('test-http-batch', mock_log_server.url, method='post')
+    assert len(created) == 1
+    handlers = [handler for handler in registered.handlers if isinstance(handler, BatchHTTPHandler)]
+    assert len(handlers) == 1
+    registered.error('registered message')
+    assert wait_for(lambda: len(mock_log_server.requests) == 1)
+    registered.removeHandler(handlers[0])
+    handlers[0].close()
+
+
+def test_logs_http_invalid_url() -> None:
+    """
+    Test creating batched HTTP handler with invalid URL
+    """
+    with pytest.raises(LoggerError):
+        BatchHTTPHandler('')
+    with pytest.raises(LoggerError):
+        BatchHTTPHandler('ftp://example.com/logs')
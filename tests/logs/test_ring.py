@@ -0,0 +1,196 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.ring module
+"""
+import logging
+
+import pytest
+
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs.ring import RingBufferHandler, RingBufferLoggerHandler
+
+from .conftest import TEST_LOGGER_NAME, create_record
+
+
+class RecordingHandler(logging.Handler):
+    """
+    Handler storing handled records
+    """
+    def __init__(self, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+    @property
+    def messages(self):
+        """
+        Return messages of handled records
+        """
+        return [record.getMessage() for record in self.records]
+
+
+def test_logs_ring_buffer_keeps_last_records() -> None:
+    """
+    Test ring buffer keeps last capacity records and dumps them on trigger level
+    """
+    target = RecordingHandler()
+    handler = RingBufferHandler(capacity=3, handlers=[target])
+    for index in range(5):
+        handler.handle(create_record(f'debug {index}', level=logging.DEBUG))
+    assert len(handler) == 3
+    assert [record.getMessage() for record in handler.records] == ['debug 2', 'debug 3', 'debug 4']
+    assert not target.records
+
+    storage = handler.__records__
+    handler.handle(create_record('failed'))
+    assert target.messages == ['debug 2', 'debug 3', 'debug 4', 'failed']
+    assert len(handler) == 0
+    assert handler.__records__ is storage
+    assert storage == [None] * 3
+
+    handler.handle(create_record('debug 5', level=logging.DEBUG))
+    handler.handle(create_record('critical', level=logging.CRITICAL))
+    assert target.messages[-2:] == ['debug 5', 'critical']
+    handler.close()
+
+
+def test_logs_ring_buffer_pass_level() -> None:
+    """
+    Test records at pass level are passed immediately and target handler levels are
+    respected
+    """
+    target = RecordingHandler()
+    warnings = RecordingHandler(logging.WARNING)
+    handler = RingBufferHandler(capacity=10, pass_level=logging.WARNING)
+    handler.add_handler(TEST_LOGGER_NAME, target)
+    handler.add_handler(TEST_LOGGER_NAME, warnings)
+
+    handler.handle(create_record('debug', level=logging.DEBUG))
+    handler.handle(create_record('warning', level=logging.WARNING))
+    handler.handle(create_record('other', name='test-ring-other', level=logging.DEBUG))
+    assert target.messages == ['warning']
+    assert len(handler) == 2
+
+    handler.handle(create_record('failed'))
+    assert target.messages == ['warning', 'debug', 'failed']
+    assert warnings.messages == ['warning', 'failed']
+
+
+def test_logs_ring_buffer_logger_group() -> None:
+    """
+    Test ring buffer of a logger group
+    """
+    logger = Logger('test-ring-group')
+    logger.level = logging.WARNING
+    group_logger = logging.getLogger('test-ring-group')
+    handler = RecordingHandler()
+    group_logger.addHandler(handler)
+
+    logger.enable_ring_buffer(capacity=5)
+    logger.enable_ring_buffer(capacity=5)
+    ring_buffer = logger.groups['test-ring-group'].ring_buffer
+    assert len(group_logger.handlers) == 1
+    assert isinstance(group_logger.handlers[0], RingBufferLoggerHandler)
+    assert group_logger.handlers[0].ring_buffer is ring_buffer
+    assert group_logger.level == logging.DEBUG
+    assert not group_logger.propagate
+
+    registered = logger.register_stream_handler('test-ring-group-other')
+    assert len(registered.handlers) == 1
+    assert registered.handlers[0].ring_buffer is ring_buffer
+
+    group_logger.debug('debug')
+    group_logger.info('info')
+    group_logger.warning('warning')
+    assert handler.messages == ['warning']
+    group_logger.error('failed')
+    assert handler.messages == ['warning', 'debug', 'info', 'failed']
+
+    logger.level = logging.ERROR
+    assert group_logger.level == logging.DEBUG
+    group_logger.warning('stored')
+    assert handler.messages[-1] == 'failed'
+
+    logger.disable_ring_buffer()
+    assert logger.groups['test-ring-group'].ring_buffer is None
+    assert not any(isinstance(item, RingBufferLoggerHandler) for item in group_logger.handlers)
+    assert handler in group_logger.handlers
+    assert group_logger.level == logging.ERROR
+    assert group_logger.propagate
+    group_logger.removeHandler(handler)
+
+
+def test_logs_ring_buffer_logger_group_async() -> None:
+    """
+    Test ring buffer of a logger group combined with asynchronous mode
+    """
+    logger = Logger('test-ring-async')
+    logger.level = logging.WARNING
+    group_logger = logging.getLogger('test-ring-async')
+    handler = RecordingHandler()
+    group_logger.addHandler(handler)
+
+    logger.enable_async()
+    logger.enable_ring_buffer(capacity=5)
+    group_logger.debug('debug')
+    group_logger.error('failed')
+    logger.disable_async()
+    assert handler.messages == ['debug', 'failed']
+
+    logger.disable_ring_buffer()
+    assert handler in group_logger.handlers
+    group_logger.removeHandler(handler)
+
+
+@pytest.mark.parametrize('asynchronous', (False, True))
+def test_logs_ring_buffer_propagation(asynchronous) -> None:
+    """
+    Test captured records do not reach ancestor loggers and passed records propagate
+    from child loggers to parent and root handlers once
+    """
+    name = f'test-ring-propagation-{asynchronous}'
+    logger = Logger(name)
+    logger.level = logging.WARNING
+    logger.register_stream_handler(f'{name}.sub')
+    parent = logging.getLogger(name)
+    child = logging.getLogger(f'{name}.sub')
+    parent_handler = RecordingHandler()
+    child_handler = RecordingHandler()
+    root_handler = RecordingHandler()
+    parent.handlers = [parent_handler]
+    child.handlers = [child_handler]
+    logging.getLogger().addHandler(root_handler)
+    try:
+        if asynchronous:
+            logger.enable_async()
+        logger.enable_ring_buffer(capacity=5)
+        child.debug('child debug')
+        parent.info('parent info')
+        child.warning('child warning')
+        logging.getLogger(f'{name}.sub.unregistered').debug('unregistered debug')
+        if asynchronous:
+            logger.disable_async()
+            logger.enable_async()
+        assert root_handler.messages == ['child warning']
+        assert parent_handler.messages == ['child warning']
+        assert child_handler.messages == ['child warning']
+
+        child.error('child failed')
+        if asynchronous:
+            logger.disable_async()
+        assert child_handler.messages == ['child warning', 'child debug', 'unregistered debug', 'child failed']
+        assert parent_handler.messages == [
+            'child warning', 'child debug', 'parent info', 'unregistered debug', 'child failed'
+        ]
+        assert root_handler.messages == parent_handler.messages
+    finally:
+        logging.getLogger().removeHandler(root_handler)
+        logger.disable_async()
+        logger.disable_ring_buffer()
+    assert parent.propagate and child.propagate
@@ -0,0 +1,222 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.rotating module
+"""
+import gzip
+import lzma
+import multiprocessing
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from sys_toolkit.exceptions import LoggerError
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs import rotating
+from sys_toolkit.logs.rotating import CompressingRotatingFileHandler
+
+from .conftest import create_record
+
+
+def test_logs_rotating_gzip(tmpdir) -> None:
+    """
+    Test rotated files are compressed with gzip
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=100, backupCount=10)
+    for index in range(10):
+        handler.handle(create_record(f'message {index:02d} ' + 'x' * 30))
+    handler.wait_rotated()
+
+    rotated = handler.rotated_files
+    assert len(rotated) == 4
+    assert all(item.name.endswith('.gz') for item in rotated)
+    assert not list(Path(tmpdir).glob('.*.tmp'))
+    contents = ''.join(gzip.decompress(item.read_bytes()).decode() for item in rotated)
+    contents += path.read_text(encoding='utf-8')
+    assert [line.split()[1] for line in contents.splitlines()] == [f'{index:02d}' for index in range(10)]
+    handler.close()
+
+
+def test_logs_rotating_xz_backup_count(tmpdir) -> None:
+    """
+    Test rotated files are compressed with xz and limited by backup count
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=40, backupCount=2, compress='xz')
+    for index in range(6):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.close()
+
+    rotated = handler.rotated_files
+    assert len(rotated) == 2
+    assert lzma.decompress(rotated[-1].read_bytes()).decode().startswith('message 4')
+    assert path.read_text(encoding='utf-8').startswith('message 5')
+
+
+def test_logs_rotating_max_total_bytes(tmpdir) -> None:
+    """
+    Test rotated files are removed when total size exceeds limit
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=40, compress=None, max_total_bytes=100)
+    for index in range(10):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.wait_rotated()
+    rotated = handler.rotated_files
+    assert len(rotated) == 2
+    assert sum(item.stat().st_size for item in rotated) <= 100
+    handler.close()
+
+
+def test_logs_rotating_interval(tmpdir) -> None:
+    """
+    Test time based rotation
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, rotate_interval=0.05)
+    handler.handle(create_record('first'))
+    handler.handle(create_record('second'))
+    assert handler.rotated_files == []
+    time.sleep(0.1)
+    handler.handle(create_record('third'))
+    handler.wait_rotated()
+    rotated = handler.rotated_files
+    assert len(rotated) == 1
+    assert gzip.decompress(rotated[0].read_bytes()) == b'first\nsecond\n'
+    assert path.read_text(encoding='utf-8') == 'third\n'
+    handler.close()
+
+
+def test_logs_rotating_compress_existing(tmpdir) -> None:
+    """
+    Test uncompressed rotated files left from earlier runs are compressed
+    """
+    path = Path(tmpdir, 'test.log')
+    Path(tmpdir, 'test.log.20230101000000000000').write_text('old\n', encoding='utf-8')
+    Path(tmpdir, 'test.log.other').write_text('other\n', encoding='utf-8')
+    handler = CompressingRotatingFileHandler(path, maxBytes=10)
+    handler.handle(create_record('message 1'))
+    handler.handle(create_record('message 2'))
+    handler.wait_rotated()
+    rotated = handler.rotated_files
+    assert [item.name for item in rotated][0] == 'test.log.20230101000000000000.gz'
+    assert len(rotated) == 2
+    assert Path(tmpdir, 'test.log.other').is_file()
+    handler.close()
+
+
+def test_logs_rotating_invalid_compression(tmpdir) -> None:
+    """
+    Test creating handler with unsupported compression
+    """
+    with pytest.raises(LoggerError):
+        CompressingRotatingFileHandler(Path(tmpdir, 'test.log'), compress='zip')
+
+
+def test_logs_rotating_register_file_handler(tmpdir) -> None:
+    """
+    Test registering compressing file handler to a logger group
+    """
+    logger = Logger('test-rotating')
+    registered = logger.register_file_handler('test-rotating', tmpdir, max_bytes=10, compress='gzip')
+    logger.register_file_handler('test-rotating', tmpdir, max_bytes=10, compress='gzip')
+    handlers = [
+        handler for handler in registered.handlers
+        if isinstance(handler, CompressingRotatingFileHandler)
+    ]
+    assert len(handlers) == 1
+    registered.error('first message')
+    registered.error('second message')
+    handlers[0].wait_rotated()
+    assert len(handlers[0].rotated_files) == 1
+    registered.removeHandler(handlers[0])
+    handlers[0].close()
+
+
+def test_logs_rotating_worker_errors(tmpdir, monkeypatch) -> None:
+    """
+    Test unexpected errors processing rotated files don't stop the background worker
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=40, backupCount=10)
+    compress_file = handler.__compress_file__
+    errors = [ValueError('test error')]
+
+    def failing_compress_file(rotated: Path) -> None:
+        if errors:
+            raise errors.pop()
+        compress_file(rotated)
+
+    monkeypatch.setattr(handler, '__compress_file__', failing_compress_file)
+    for index in range(2):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.wait_rotated()
+    assert [item.name.endswith('.gz') for item in handler.rotated_files] == [False]
+
+    for index in range(2, 4):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.wait_rotated()
+    assert [item.name.endswith('.gz') for item in handler.rotated_files] == [True] * 3
+    handler.close()
+
+
+def test_logs_rotating_name_collision(tmpdir, monkeypatch) -> None:
+    """
+    Test rotated file names colliding with existing files sort after them
+    """
+    class FixedDatetime(datetime):
+        """
+        Datetime returning a fixed time at the end of a second
+        """
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2023, 1, 1, 12, 0, 0, 999999)
+
+    monkeypatch.setattr(rotating, 'datetime', FixedDatetime)
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=40, backupCount=10, compress=None)
+    for index in range(3):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.wait_rotated()
+    assert [item.name for item in handler.rotated_files] == [
+        'test.log.20230101120000999999',
+        'test.log.20230101120001000000',
+    ]
+    handler.close()
+
+
+def rotate_in_child(handler: CompressingRotatingFileHandler) -> None:
+    """
+    Rotate log file of handler inherited from parent in a forked child process
+    """
+    handler.handle(create_record('child ' + 'x' * 30))
+    handler.doRollover()
+    handler.wait_rotated()
+
+
+def test_logs_rotating_fork(tmpdir) -> None:
+    """
+    Test forked child process starts a background worker of its own
+    """
+    path = Path(tmpdir, 'test.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=40, backupCount=10)
+    for index in range(2):
+        handler.handle(create_record(f'message {index} ' + 'x' * 30))
+    handler.wait_rotated()
+
+    process = multiprocessing.get_context('fork').Process(target=rotate_in_child, args=(handler,))
+    process.start()
+    process.join(timeout=10)
+    if process.exitcode is None:
+        process.kill()
+        process.join()
+    assert process.exitcode == 0
+    assert [item.name.endswith('.gz') for item in handler.rotated_files] == [True] * 3
+    handler.close()
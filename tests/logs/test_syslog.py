@@ -0,0 +1,215 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.logs.syslog module
+"""
+import logging
+import logging.handlers
+import socket
+import time
+
+from sys_toolkit.logger import Logger
+from sys_toolkit.logs import syslog
+from sys_toolkit.logs.syslog import BatchSysLogHandler
+
+from .conftest import create_record
+
+# <11> is LOG_USER facility with LOG_ERR priority
+ERROR_PREFIX = b'<11>'
+
+
+def receive_datagrams(sock: socket.socket, count: int) -> list:
+    """
+    Receive datagrams from socket
+    """
+    sock.settimeout(5)
+    return [sock.recv(65536) for _index in range(count)]
+
+
+def receive_stream(sock: socket.socket, size: int) -> bytes:
+    """
+    Accept connection and read size bytes from a stream socket
+    """
+    sock.settimeout(5)
+    connection, _address = sock.accept()
+    connection.settimeout(5)
+    data = b''
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    connection.close()
+    return data
+
+
+def test_logs_syslog_prefix_cache() -> None:
+    """
+    Test priority prefixes are cached per level name
+    """
+    handler = BatchSysLogHandler('/nonexistent/log', facility='local0', ident='test: ')
+    assert handler.facility == logging.handlers.SysLogHandler.LOG_LOCAL0
+    assert handler.get_prefix('ERROR') == b'<131>test: '
+    assert handler.get_prefix('DEBUG') == b'<135>test: '
+    assert handler.get_prefix('ERROR') is handler.get_prefix('ERROR')
+    assert handler.encode_record(create_record('hello')) == b'<131>test: hello'
+    handler.close()
+
+
+def test_logs_syslog_unix_datagram_batch(tmpdir, monkeypatch) -> None:
+    """
+    Test sending a batch of datagrams to unix socket with one sendmmsg call
+    """
+    path = tmpdir.join('log').strpath
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+    calls = []
+
+    def counted_sendmmsg(sock, datagrams):
+        calls.append(len(datagrams))
+        return sendmmsg(sock, datagrams)
+
+    sendmmsg = syslog.sendmmsg
+    monkeypatch.setattr(syslog, 'sendmmsg', counted_sendmmsg)
+
+    handler = BatchSysLogHandler(path, batch_size=5, max_latency=60)
+    for index in range(5):
+        handler.handle(create_record(f'message {index}'))
+    datagrams = receive_datagrams(server, 5)
+    handler.close()
+    server.close()
+
+    assert datagrams == [ERROR_PREFIX + f'message {index}'.encode() + b'\000' for index in range(5)]
+    assert handler.sent_batches == 1
+    assert handler.sent_records == 5
+    if syslog.SENDMMSG is not None:
+        assert calls == [5]
+
+
+def test_logs_syslog_unix_datagram_without_sendmmsg(tmpdir, monkeypatch) -> None:
+    """
+    Test sending datagrams when sendmmsg is not available
+    """
+    monkeypatch.setattr(syslog, 'SENDMMSG', None)
+    path = tmpdir.join('log').strpath
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+
+    handler = BatchSysLogHandler(path, batch_size=100, max_latency=0.01)
+    for index in range(3):
+        handler.handle(create_record(f'message {index}'))
+    datagrams = receive_datagrams(server, 3)
+    handler.close()
+    server.close()
+    assert datagrams[2] == ERROR_PREFIX + b'message 2\000'
+
+
+def test_logs_syslog_unix_stream_octet_counting(tmpdir) -> None:
+    """
+    Test sending octet counted frames to unix stream socket
+    """
+    path = tmpdir.join('log').strpath
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    handler = BatchSysLogHandler(path, batch_size=2, max_latency=60)
+    handler.handle(create_record('first'))
+    handler.handle(create_record('second message'))
+    data = receive_stream(server, 32)
+    handler.close()
+    server.close()
+    assert data == b'9 <11>first18 <11>second message'
+
+
+def test_logs_syslog_tcp_octet_counting() -> None:
+    """
+    Test sending octet counted frames to TCP socket
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    handler = BatchSysLogHandler(server.getsockname(), socktype=socket.SOCK_STREAM, max_latency=0.01)
+    handler.handle(create_record('tcp'))
+    data = receive_stream(server, 9)
+    handler.close()
+    server.close()
+    assert data == b'7 <11>tcp'
+
+
+def test_logs_syslog_reconnect(tmpdir) -> None:
+    """
+    Test records are kept while syslog is not available and sent after reconnecting
+    """
+    path = tmpdir.join('log').strpath
+    handler = BatchSysLogHandler(path, batch_size=1, max_latency=0.01, reconnect_interval=0.05)
+
+    start = time.monotonic()
+    for index in range(3):
+        handler.handle(create_record(f'message {index}'))
+    assert time.monotonic() - start < 0.5
+    time.sleep(0.1)
+    assert not handler.connected
+    assert handler.queued == 3
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+    datagrams = receive_datagrams(server, 3)
+    handler.close()
+    server.close()
+    assert datagrams == [ERROR_PREFIX + f'message {index}'.encode() + b'\000' for index in range(3)]
+    assert handler.dropped == 0
+
+
+def test_logs_syslog_max_queued(tmpdir) -> None:
+    """
+    Test records exceeding max queued are dropped
+    """
+    handler = BatchSysLogHandler(tmpdir.join('log').strpath, batch_size=100, max_latency=60)
+    handler.max_queued = 2
+    for index in range(3):
+        handler.handle(create_record(f'message {index}'))
+    assert handler.queued == 2
+    assert handler.dropped == 1
+    handler.close()
+    assert handler.dropped == 3
+
+
+def test_logs_syslog_register_handler(tmpdir, monkeypatch) -> None:
+    """
+    Test registering batched syslog handler to a logger group
+    """
+    path = tmpdir.join('log').strpath
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+
+    created = []
+
+    class CountingBatchSysLogHandler(BatchSysLogHandler):
+        """
+        Batched syslog handler counting created instances
+        """
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr('sys_toolkit.logger.BatchSysLogHandler', CountingBatchSysLogHandler)
+    logger = Logger('test-syslog-batch')
+    registered = logger.register_batch_syslog_handler('test-syslog-batch', path, max_latency=0.01)
+    logger.register_batch_syslog_handler('test-syslog-batch', path)
+    logger.register_batch_syslog_handler('test-syslog-batch', path, facility='user')
+    assert len(created) == 1
+    handlers = [handler for handler in registered.handlers if isinstance(handler, BatchSysLogHandler)]
+    assert len(handlers) == 1
+    assert handlers[0].level == logging.handlers.SysLogHandler.LOG_WARNING
+
+    registered.error('registered message')
+    datagrams = receive_datagrams(server, 1)
+    registered.removeHandler(handlers[0])
+    handlers[0].close()
+    server.close()
+    assert datagrams == [ERROR_PREFIX + b'registered message\000']
@@ -6,7 +6,29 @@
 """
 Unit tests for sys_toolkit.base module
 """
-from sys_toolkit.base import LoggingBaseClass
+import io
+import sys
+
+import pytest
+
+from sys_toolkit.base import (
+    CONSOLE_OUTPUT_BUFFERS,
+    LOGGERS,
+    LoggingBaseClass,
+    flush_console_output,
+    refresh_environment_flags,
+)
+from sys_toolkit.logger import Logger
+
+
+@pytest.fixture
+def refresh_environment():
+    """
+    Refresh cached environment flags before and after the test
+    """
+    refresh_environment_flags()
+    yield
+    refresh_environment_flags()
 
 
 def test_logging_base_class_defaults(capsys) -> None:
@@ -47,3 +69,145 @@ def test_logging_base_class_silent_debug(capsys) -> None:
     captured = capsys.readouterr()
     assert captured.err.splitlines() == [debug, error]
     assert captured.out == ''
+
+
+class CountingStream(io.StringIO):
+    """
+    String stream counting write calls
+    """
+    tty = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = 0
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def write(self, data: str) -> int:
+        self.writes += 1
+        return super().write(data)
+
+
+def test_logging_base_class_buffered_output(monkeypatch) -> None:
+    """
+    Test buffered console output is written when flushed
+    """
+    stdout = CountingStream()
+    stderr = CountingStream()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(sys, 'stderr', stderr)
+
+    obj = LoggingBaseClass(buffered=True)
+    assert obj.__is_buffered__ is True
+    for index in range(100):
+        obj.message(f'line {index}')
+    assert stdout.getvalue() == ''
+    assert CONSOLE_OUTPUT_BUFFERS['stdout'].pending == 800 - 10
+
+    obj.error('error')
+    assert stdout.writes == 1
+    assert len(stdout.getvalue().splitlines()) == 100
+    assert stderr.getvalue() == ''
+
+    obj.flush_output()
+    assert stderr.getvalue() == 'error\n'
+    assert CONSOLE_OUTPUT_BUFFERS['stdout'].pending == 0
+
+
+def test_logging_base_class_buffered_output_size(monkeypatch) -> None:
+    """
+    Test buffered console output is flushed when buffer size is exceeded
+    """
+    stdout = CountingStream()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(CONSOLE_OUTPUT_BUFFERS['stdout'], 'size', 100)
+
+    obj = LoggingBaseClass(buffered=True)
+    for index in range(30):
+        obj.message(f'line {index:02d}')
+    assert stdout.writes == 2
+    assert len(stdout.getvalue().splitlines()) == 26
+    flush_console_output()
+    assert len(stdout.getvalue().splitlines()) == 30
+
+
+def test_logging_base_class_buffered_output_tty(monkeypatch) -> None:
+    """
+    Test buffered console output is flushed on each line for TTY
+    """
+    stdout = CountingStream()
+    stdout.tty = True
+    monkeypatch.setattr(sys, 'stdout', stdout)
+
+    obj = LoggingBaseClass(buffered=True)
+    obj.message('first')
+    obj.message('second')
+    assert stdout.getvalue() == 'first\nsecond\n'
+    assert CONSOLE_OUTPUT_BUFFERS['stdout'].pending == 0
+
+
+def test_logging_base_class_buffered_env(monkeypatch, refresh_environment) -> None:
+    """
+    Test enabling buffered console output with environment variable
+    """
+    monkeypatch.setenv('BUFFERED_OUTPUT', '1')
+    assert LoggingBaseClass().__is_buffered__
+    monkeypatch.delenv('BUFFERED_OUTPUT')
+
+
+def test_logging_base_class_messages(monkeypatch) -> None:
+    """
+    Test writing multiple messages with one write call
+    """
+    stdout = CountingStream()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+
+    obj = LoggingBaseClass()
+    obj.messages(f'line {index} ' for index in range(1000))
+    obj.messages([])
+    assert stdout.writes == 1
+    assert stdout.getvalue().splitlines()[-1] == 'line 999'
+
+    LoggingBaseClass(silent=True).messages(['silent'])
+    assert stdout.writes == 1
+
+
+def test_logging_base_class_environment_cached(monkeypatch, refresh_environment) -> None:
+    """
+    Test environment flags are read once until refreshed
+    """
+    monkeypatch.delenv('DEBUG', raising=False)
+    assert LoggingBaseClass().__is_debug_enabled__ is False
+    monkeypatch.setenv('DEBUG', '1')
+    assert LoggingBaseClass().__is_debug_enabled__ is False
+    refresh_environment_flags()
+    assert LoggingBaseClass().__is_debug_enabled__ == '1'
+    monkeypatch.delenv('DEBUG')
+
+
+def test_logging_base_class_lazy_logger() -> None:
+    """
+    Test Logger is created on first access and shared by objects with same logger name
+    """
+    obj = LoggingBaseClass(logger='test-lazy-logger')
+    assert 'test-lazy-logger' not in LOGGERS
+    assert isinstance(obj.logger, Logger)
+    assert obj.logger.name == 'test-lazy-logger'
+    assert LoggingBaseClass(logger='test-lazy-logger').logger is obj.logger
+    assert LoggingBaseClass().logger is not obj.logger
+
+    logger = Logger('test-lazy-logger-other')
+    obj.logger = logger
+    assert obj.logger is logger
+
+
+def test_logging_base_class_logger_registered_after_access() -> None:
+    """
+    Test loggers registered after the Logger of the object was accessed are available
+    """
+    obj = LoggingBaseClass(logger='test-lazy-logger-registered')
+    assert not hasattr(obj.logger, 'test_lazy_logger_late')
+    registered = Logger('test-lazy-logger-registered').register_stream_handler('test_lazy_logger_late')
+    assert obj.logger.test_lazy_logger_late is registered
+    assert LoggingBaseClass(logger='test-lazy-logger-registered').logger.test_lazy_logger_late is registered
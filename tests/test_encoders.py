@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 import pytest
+import yaml
 
 from sys_toolkit.encoders import DateTimeEncoder, format_timedelta, yaml_dump
 
@@ -33,6 +34,35 @@ b:
   - 3
 """
 
+TEST_NESTED_DICT = {
+    'name': 'test',
+    'items': [
+        {'values': [1, 2.5, None, True], 'text': 'multiple\nlines'},
+        [[1, 2], []],
+    ],
+    'nested': {'empty': {}, 'list': ['a', 'b: c']},
+}
+YAML_NESTED_DUMP_RESULT = """---
+items:
+  - text: 'multiple
+
+      lines'
+    values:
+      - 1
+      - 2.5
+      - null
+      - true
+  - - - 1
+      - 2
+    - []
+name: test
+nested:
+  empty: {}
+  list:
+    - a
+    - 'b: c'
+"""
+
 TIMEDELTA_VALID = (
     {
         'values': ['0', 0, 0.0, timedelta(seconds=0)],
@@ -149,3 +179,15 @@ def test_encoders_yaml_dump() -> None:
     Test yaml_dump method returns expected document
     """
     assert yaml_dump(TEST_DICT) == YAML_DUMP_RESULT
+
+
+def test_encoders_yaml_dump_nested() -> None:
+    """
+    Test yaml_dump output of nested data is stable and loads equally with python and
+    libyaml loaders
+    """
+    value = yaml_dump(TEST_NESTED_DICT)
+    assert value == YAML_NESTED_DUMP_RESULT
+    assert yaml.load(value, Loader=yaml.SafeLoader) == TEST_NESTED_DICT
+    if yaml.__with_libyaml__:
+        assert yaml.load(value, Loader=yaml.CSafeLoader) == TEST_NESTED_DICT
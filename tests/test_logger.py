@@ -8,7 +8,9 @@ Unit tests for sys_toolkit.loggerr class
 """
 
 import logging
+import queue
 import sys
+import threading
 
 from pathlib import Path
 
@@ -16,6 +18,8 @@ import pytest
 
 from sys_toolkit.logger import (
     get_default_syslog_address,
+    get_handler_key,
+    AsyncQueueHandler,
     Logger,
     LoggerError,
     DEFAULT_TARGET_NAME
@@ -207,6 +211,78 @@ def test_logger_register_file_handler(tmpdir) -> None:
     assert test.__hash__() == reregister.__hash__()
 
 
+def test_logger_handler_index(tmpdir) -> None:
+    """
+    Test duplicate handlers are detected with handler identity index
+    """
+    logger = Logger('handler-index')
+    registered = logger.register_file_handler('handler-index', tmpdir)
+    logger.register_file_handler('handler-index', str(tmpdir))
+    file_handlers = [
+        handler for handler in registered.handlers
+        if isinstance(handler, logging.handlers.RotatingFileHandler)
+    ]
+    assert len(file_handlers) == 1
+    assert get_handler_key(file_handlers[0]) == (
+        logging.FileHandler,
+        str(Path(tmpdir, 'handler-index.log'))
+    )
+
+    # Same file is not registered again with a different handler type
+    handlers = list(registered.handlers)
+    logger.register_file_handler('handler-index', tmpdir, compress='gzip')
+    assert registered.handlers == handlers
+
+    logger.register_http_handler('handler-index', 'http://localhost/logs', method='post')
+    logger.register_http_handler('handler-index', 'http://localhost/logs', method='POST')
+    assert len(registered.handlers) == 3
+
+    # Handlers removed outside of the logger group are registered again
+    registered.removeHandler(file_handlers[0])
+    file_handlers[0].close()
+    logger.register_file_handler('handler-index', tmpdir)
+    assert len(registered.handlers) == 3
+    assert file_handlers[0] not in registered.handlers
+
+    # Handlers added outside of the logger group are detected
+    other = logging.StreamHandler()
+    logging.getLogger('handler-index-other').addHandler(other)
+    logger.register_stream_handler('handler-index-other')
+    assert logging.getLogger('handler-index-other').handlers == [other]
+
+
+def test_logger_handler_index_shared_key(tmpdir) -> None:
+    """
+    Test handler index is kept when handlers share a key and updated on remove_handler
+    """
+    logger = Logger('handler-index-shared')
+    registered = logger.register_file_handler('handler-index-shared', tmpdir)
+    registered.addHandler(logging.StreamHandler())
+    group = Logger.groups['handler-index-shared']
+    index = group.__get_handler_index__(registered)
+    assert group.__get_handler_index__(registered) is index
+
+    file_handler = index[(logging.FileHandler, str(Path(tmpdir, 'handler-index-shared.log')))]
+    logger.remove_handler('handler-index-shared', file_handler)
+    file_handler.close()
+    assert file_handler not in registered.handlers
+    logger.register_file_handler('handler-index-shared', tmpdir)
+    assert len(registered.handlers) == 3
+
+
+def test_logger_register_many_loggers() -> None:
+    """
+    Test registering handlers for many loggers
+    """
+    logger = Logger('handler-index-many')
+    for index in range(1000):
+        logger.register_stream_handler(f'handler-index-many-{index}')
+        logger.register_stream_handler(f'handler-index-many-{index}')
+    group = Logger.groups['handler-index-many']
+    assert len(group) == 1001
+    assert all(len(item.handlers) == 1 for item in group.values())
+
+
 def test_logger_register_syslog_handler_invalid_level() -> None:
     """
     Test registering additional HTTP handler to logger with invalid URL
@@ -273,3 +349,149 @@ def test_logger_mock_platform_windows(monkeypatch) -> None:
     monkeypatch.setattr(sys, 'platform', 'windows')
     assert sys.platform == 'windows'
     assert isinstance(get_default_syslog_address(), tuple)
+
+
+class BlockingHandler(logging.Handler):
+    """
+    Logging handler blocking until released
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.records = []
+        self.unblock = threading.Event()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.unblock.wait(timeout=10)
+        self.records.append(record)
+
+
+def test_logger_async_file_handler(tmpdir) -> None:
+    """
+    Test asynchronous logging to a file handler registered before and after
+    enabling asynchronous mode
+    """
+    logger = Logger('async-test', asynchronous=True)
+    group = Logger.groups['async-test']
+    assert group.asynchronous
+    # pylint: disable=no-member
+    default = logger.__dict__['async-test']
+    assert len(default.handlers) == 1
+    assert isinstance(default.handlers[0], AsyncQueueHandler)
+
+    logger.register_file_handler('async-test', tmpdir)
+    logger.register_file_handler('async-test', tmpdir)
+    logger.register_file_handler('async-test-other', tmpdir)
+    other = logger.__dict__['async-test-other']
+    assert len(other.handlers) == 1
+    assert isinstance(other.handlers[0], AsyncQueueHandler)
+    assert other.handlers[0] is not default.handlers[0]
+
+    default.error('first message')
+    other.error('other message')
+    logger.disable_async()
+    assert not group.asynchronous
+    assert not any(isinstance(handler, AsyncQueueHandler) for handler in default.handlers)
+    assert len(default.handlers) == 2
+
+    assert 'first message' in Path(tmpdir, 'async-test.log').read_text(encoding='utf-8')
+    assert 'other message' in Path(tmpdir, 'async-test-other.log').read_text(encoding='utf-8')
+    assert 'first message' not in Path(tmpdir, 'async-test-other.log').read_text(encoding='utf-8')
+    logger.disable_async()
+
+
+def test_logger_async_drop_policy() -> None:
+    """
+    Test asynchronous logging with full queue drops records
+    """
+    logger = Logger('async-drop')
+    logging.getLogger('async-drop').removeHandler(logging.getLogger('async-drop').handlers[0])
+    handler = BlockingHandler()
+    logging.getLogger('async-drop').addHandler(handler)
+    logger.enable_async(queue_size=1)
+    logger.enable_async(queue_size=1)
+    try:
+        for index in range(10):
+            logging.getLogger('async-drop').error('message %d', index)
+        assert logger.dropped_records >= 8
+    finally:
+        handler.unblock.set()
+        logger.disable_async()
+    assert len(handler.records) + logger.dropped_records == 10
+
+
+def test_logger_async_block_policy() -> None:
+    """
+    Test asynchronous logging with block policy does not drop records
+    """
+    logger = Logger('async-block')
+    logging.getLogger('async-block').removeHandler(logging.getLogger('async-block').handlers[0])
+    handler = BlockingHandler()
+    handler.unblock.set()
+    logging.getLogger('async-block').addHandler(handler)
+    logger.enable_async(queue_size=1, policy='block')
+    for index in range(100):
+        logging.getLogger('async-block').error('message %d', index)
+    logger.disable_async()
+    assert logger.dropped_records == 0
+    assert len(handler.records) == 100
+    assert handler.records[-1].getMessage() == 'message 99'
+
+
+def test_logger_async_invalid_policy() -> None:
+    """
+    Test enabling asynchronous logging with invalid queue policy
+    """
+    with pytest.raises(LoggerError):
+        Logger('async-invalid', asynchronous=True, queue_policy='invalid')
+
+
+class LabelingHandler(logging.Handler):
+    """
+    Logging handler storing messages with a label to a shared list
+    """
+    def __init__(self, label: str, messages: list) -> None:
+        super().__init__()
+        self.label = label
+        self.messages = messages
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(f'{self.label} {record.getMessage()}')
+
+
+@pytest.mark.parametrize('asynchronous', (False, True))
+def test_logger_async_propagation(asynchronous) -> None:
+    """
+    Test records propagated from child logger reach handlers of parent and child
+    logger once in both synchronous and asynchronous mode
+    """
+    name = f'async-propagation-{asynchronous}'
+    logger = Logger(name)
+    logger.register_stream_handler(f'{name}.sub')
+    messages = []
+    parent = logging.getLogger(name)
+    child = logging.getLogger(f'{name}.sub')
+    parent.handlers = [LabelingHandler('APP', messages)]
+    child.handlers = [LabelingHandler('SUB', messages)]
+
+    if asynchronous:
+        logger.enable_async()
+    child.error('child message')
+    parent.error('parent message')
+    logger.disable_async()
+    assert sorted(messages) == ['APP child message', 'APP parent message', 'SUB child message']
+
+
+def test_logger_async_queue_handler_format_level() -> None:
+    """
+    Test queue handler formats only records at format level and above
+    """
+    handler = AsyncQueueHandler(queue.Queue())
+    handler.format_level = logging.INFO
+    debug = logging.LogRecord('test', logging.DEBUG, __file__, 1, 'value %s', ('debug',), None)
+    info = logging.LogRecord('test', logging.INFO, __file__, 1, 'value %s', ('info',), None)
+    prepared = handler.prepare(debug)
+    assert prepared is not debug
+    assert prepared.args == ('debug',)
+    prepared = handler.prepare(info)
+    assert prepared.msg == 'value info'
+    assert prepared.args is None
@@ -140,3 +140,28 @@ def test_path_executables_invalid_directories(monkeypatch, tmpdir) -> None:
     Executables.__commands__ = None
     executables = Executables()
     assert len(executables) == 0
+
+
+# pylint: disable=redefined-outer-name, unused-argument
+def test_path_executables_reload_changes(mock_system_path, monkeypatch) -> None:
+    """
+    Test executables are reloaded when PATH or directories on PATH change
+    """
+    Executables.__commands__ = None
+    executables = Executables()
+    assert executables.get('test-command') is None
+
+    directory = mock_system_path.joinpath('bin')
+    command = directory.joinpath('test-command')
+    command.touch()
+    command.chmod(MOCK_PERM_EXECUTABLE)
+    os.utime(directory, ns=(0, 0))
+
+    # Modification times are not checked again before check interval has passed
+    assert executables.get('test-command') is None
+    executables.refresh()
+    assert executables.get('test-command') == command
+
+    monkeypatch.setenv('PATH', str(mock_system_path.joinpath('opt/bin')))
+    assert len(executables) == 1
+    assert executables.__repr__() == os.environ['PATH']
@@ -6,6 +6,7 @@
 """
 Test system process list parser module
 """
+import time
 
 import pytest
 
@@ -87,6 +88,24 @@ def test_process_list_load_freebsd(monkeypatch) -> None:
         validate_process_attributes(process)
 
 
+def test_process_list_update_duration(monkeypatch) -> None:
+    """
+    Test load duration of process list update includes running the ps command
+    """
+    mock_data = MockRunCommandLineOutput(MOCK_DATA.joinpath('processes.linux.txt'))
+
+    def slow_command(*args, **kwargs):
+        time.sleep(0.2)
+        return mock_data(*args, **kwargs)
+
+    monkeypatch.setattr('sys_toolkit.process.run_command_lineoutput', slow_command)
+    processes = Processes()
+    processes.update()
+    assert len(processes.__items__) == MOCK_PROCESSES_COUNT_LINUX
+    assert processes.__load_duration__ >= 0.2
+    assert not processes.__loading__
+
+
 def test_process_list_load_linux(monkeypatch) -> None:
     """
     Test loading a process list when operating system is linux
@@ -160,3 +179,18 @@ def test_process_list_errors(monkeypatch) -> None:
     processes = Processes()
     with pytest.raises(CommandError):
         list(processes)
+
+
+def test_process_list_load_lines_iterator() -> None:
+    """
+    Test loading process list from an iterator of lines
+    """
+    processes = Processes()
+    with MOCK_DATA.joinpath('processes.linux.txt').open('r', encoding='utf-8') as handle:
+        processes.load(handle)
+    assert len(processes.__items__) == MOCK_PROCESSES_COUNT_LINUX
+    process = processes.__items__[0]
+    assert process.pid == 1
+    assert process.started.year == 2021
+    assert process.command == '/sbin/init'
+    validate_process_attributes(process)
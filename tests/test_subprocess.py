@@ -8,14 +8,36 @@ Unit tests for cli_toolkit.subprocess module
 """
 
 import os
+import signal
+import subprocess
+import sys
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
 from sys_toolkit.constants import DEFAULT_ENCODING
-from sys_toolkit.subprocess import run, run_command, run_command_lineoutput
+from sys_toolkit.path import Executables
+from sys_toolkit.subprocess import (
+    COMMAND_OBSERVERS,
+    AccountedPopen,
+    COMMAND_RESOLVER,
+    CommandExecution,
+    CommandStatistics,
+    Pipeline,
+    ResourceLimits,
+    ResourceUsage,
+    register_command_observer,
+    run,
+    run_command,
+    run_command_lineoutput,
+    run_command_streaming,
+    unregister_command_observer,
+)
 from sys_toolkit.exceptions import CommandError
+from sys_toolkit.tests.mock import MockCalledMethod
 
 MIXED__ENCODINGS_FILE = Path(__file__).parent.joinpath('data/linefile_mixed_encodings')
 VALID_COMMAND = 'uname'
@@ -76,6 +98,65 @@ def test_subprocess_run_timeout_exceeded() -> None:
         run(*args, timeout=0.5)
 
 
+def test_subprocess_run_resource_usage() -> None:
+    """
+    Test resource usage is returned with the result of 'run'
+    """
+    res = run('sleep', '0.1')
+    assert res.returncode == 0
+    assert isinstance(res.rusage, ResourceUsage)
+    assert res.rusage.wall_time >= 0.1
+    assert res.rusage.user_time >= 0
+    assert res.rusage.system_time >= 0
+    assert res.rusage.max_rss > 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'wait4'), reason='os.wait4 is not available')
+def test_subprocess_killed_process_resource_usage() -> None:
+    """
+    Test resource usage is stored for killed processes reaped with poll
+    """
+    script = 'import time\nwhile time.process_time() < 0.2: pass\nprint(flush=True)\ntime.sleep(30)'
+    with AccountedPopen([sys.executable, '-c', script], stdout=subprocess.PIPE) as process:
+        process.stdout.readline()
+        process.kill()
+        while process.poll() is None:
+            time.sleep(0.01)
+        assert process.returncode == -signal.SIGKILL
+        assert process.resource_usage.user_time + process.resource_usage.system_time >= 0.2
+        assert process.resource_usage.max_rss > 0
+
+    pipeline = Pipeline([sys.executable, '-c', script], ['cat'], timeout=1)
+    with pytest.raises(CommandError):
+        pipeline.run()
+    rusage = pipeline.stages[0].rusage
+    assert rusage.user_time + rusage.system_time >= 0.2
+    assert rusage.max_rss > 0
+
+
+def test_subprocess_run_command_resource_usage() -> None:
+    """
+    Test resource usage is returned as attribute of the 'run_command' output tuple
+    """
+    output = run_command(VALID_COMMAND)
+    stdout, stderr = output
+    assert output.stdout == stdout
+    assert output.stderr == stderr
+    assert output.returncode == 0
+    assert isinstance(output.rusage, ResourceUsage)
+    assert output.rusage.max_rss > 0
+
+
+def test_subprocess_run_command_new_session_timeout_kills_group() -> None:
+    """
+    Test timeout of command started in new session kills child processes of the command
+    """
+    start = time.monotonic()
+    with pytest.raises(CommandError):
+        run_command('sh', '-c', 'sleep 30 & wait', timeout=0.5, new_session=True)
+    assert time.monotonic() - start < 10
+
+
 def test_subprocess_run_command_uname_as_string() -> None:
     """
     Test running uname with 'run_command'
@@ -218,3 +299,480 @@ def test_subprocess_process_lineoutput_mixed_encoding_file_read() -> None:
     assert len(stderr) == 0
     for line in stdout:
         assert isinstance(line, str)
+
+
+def test_subprocess_pipeline_run() -> None:
+    """
+    Test running a pipeline of commands and returning output of the last command
+    """
+    pipeline = Pipeline(['printf', 'b\\na\\nc\\n'], ['sort']).add('head', '-n', '2')
+    assert len(pipeline.stages) == 3
+    assert repr(pipeline) == 'printf b\\na\\nc\\n | sort | head -n 2'
+    stdout, stderr = pipeline.run()
+    assert stdout == b'a\nb\n'
+    assert stderr == b''
+
+
+def test_subprocess_pipeline_stdin_file() -> None:
+    """
+    Test running a pipeline reading input from an open file
+    """
+    with MIXED__ENCODINGS_FILE.open('rb') as handle:
+        stdout, _stderr = Pipeline(['cat'], ['wc', '-l'], stdin=handle).run()
+    assert int(stdout) == 2
+
+
+def test_subprocess_pipeline_lineoutput() -> None:
+    """
+    Test streaming lines from a pipeline with custom encodings
+    """
+    pipeline = Pipeline(['cat', str(MIXED__ENCODINGS_FILE)], ['cat'])
+    with pytest.raises(CommandError):
+        list(pipeline.lineoutput())
+
+    lines = list(pipeline.lineoutput(encodings=[DEFAULT_ENCODING, 'latin1']))
+    assert len(lines) == 2
+    for line in lines:
+        assert isinstance(line, str)
+        assert not line.endswith('\n')
+
+
+def test_subprocess_pipeline_lineoutput_stop_early() -> None:
+    """
+    Test stopping iteration of pipeline output terminates the pipeline
+    """
+    pipeline = Pipeline(['yes'], ['cat'])
+    for index, line in enumerate(pipeline.lineoutput()):
+        assert line == 'y'
+        if index == 10:
+            break
+    for stage in pipeline.stages:
+        assert stage.returncode is not None
+        assert isinstance(stage.rusage, ResourceUsage)
+
+
+def test_subprocess_pipeline_return_codes() -> None:
+    """
+    Test pipeline stage return codes are checked per stage
+    """
+    with pytest.raises(CommandError):
+        Pipeline(['uname'], ['grep', '3ACF5A8C-D7C5-4D8E-9C1B-4F1E5A6E9B2D']).run()
+
+    pipeline = Pipeline(['uname']).add('grep', '3ACF5A8C-D7C5-4D8E-9C1B-4F1E5A6E9B2D', expected_return_codes=[1])
+    stdout, _stderr = pipeline.run()
+    assert stdout == b''
+
+
+def test_subprocess_pipeline_stderr() -> None:
+    """
+    Test stderr of failing pipeline stage is collected
+    """
+    pipeline = Pipeline(INVALID_ARGS, ['cat'])
+    with pytest.raises(CommandError):
+        pipeline.run()
+    assert pipeline.stages[0].stderr != b''
+    assert pipeline.stderr == pipeline.stages[0].stderr
+
+
+def test_subprocess_pipeline_timeout() -> None:
+    """
+    Test pipeline timeout kills all stages
+    """
+    with pytest.raises(CommandError):
+        Pipeline(['sleep', '5'], ['cat'], timeout=0.5).run()
+    with pytest.raises(CommandError):
+        list(Pipeline(['sleep', '5'], ['cat'], timeout=0.5).lineoutput())
+
+
+def test_subprocess_pipeline_timeout_after_exit() -> None:
+    """
+    Test pipeline watchdog firing after the stages have exited is not a timeout
+    """
+    pipeline = Pipeline([VALID_COMMAND], ['cat'], timeout=60)
+    process = pipeline.__start__()
+    with process.stdout:
+        process.stdout.read()
+    for stage in pipeline.stages:
+        stage.process.wait()
+    pipeline.__kill_timed_out__()
+    pipeline.__finish__(None)
+    assert all(stage.returncode == 0 for stage in pipeline.stages)
+
+    pipeline.__kill_timed_out__()
+    pipeline.__finish__(None)
+
+
+def test_subprocess_pipeline_errors(tmpdir) -> None:
+    """
+    Test errors starting pipelines
+    """
+    with pytest.raises(CommandError):
+        Pipeline().run()
+    with pytest.raises(CommandError):
+        Pipeline().add()
+    with pytest.raises(CommandError):
+        Pipeline(['uname'], ['49FC61D4-F21B-4A0D-941D-9CC52F163CFF']).run()
+    with pytest.raises(CommandError):
+        Pipeline(['uname'], cwd=Path(tmpdir.strpath, 'missing_directory')).run()
+
+
+def test_subprocess_command_observers() -> None:
+    """
+    Test command observer callbacks receive details of command calls
+    """
+    executions = []
+    register_command_observer(executions.append)
+    register_command_observer(executions.append)
+    assert len(COMMAND_OBSERVERS) == 1
+    try:
+        run_command(VALID_COMMAND, cwd='/')
+        run_command_lineoutput(VALID_COMMAND)
+        with pytest.raises(CommandError):
+            run(*INVALID_ARGS, stderr=subprocess.PIPE)
+        with pytest.raises(CommandError):
+            run_command('49FC61D4-F21B-4A0D-941D-9CC52F163CFF')
+    finally:
+        unregister_command_observer(executions.append)
+    # pylint: disable=use-implicit-booleaness-not-comparison
+    assert COMMAND_OBSERVERS == []
+
+    assert [execution.function for execution in executions] == [
+        'run_command', 'run_command_lineoutput', 'run', 'run_command'
+    ]
+    for execution in executions:
+        assert isinstance(execution, CommandExecution)
+        assert execution.duration >= 0
+
+    assert executions[0].args == (VALID_COMMAND,)
+    assert executions[0].cwd == '/'
+    assert executions[0].returncode == 0
+    assert executions[0].stdout_size > 0
+    assert executions[0].error is None
+    assert isinstance(executions[0].rusage, ResourceUsage)
+
+    assert executions[1].stdout_size > 0
+    assert executions[2].returncode != 0
+    assert executions[2].stderr_size > 0
+    assert isinstance(executions[2].error, CommandError)
+    assert executions[3].returncode is None
+    assert isinstance(executions[3].error, CommandError)
+
+    run_command(VALID_COMMAND)
+    assert len(executions) == 4
+
+
+def test_subprocess_command_observer_not_callable() -> None:
+    """
+    Test registering invalid command observer
+    """
+    with pytest.raises(CommandError):
+        register_command_observer('observer')
+
+
+def test_subprocess_command_observer_errors(caplog) -> None:
+    """
+    Test errors in command observers are logged and don't change command results
+    """
+    def failing_observer(execution):
+        raise ValueError(execution)
+
+    executions = []
+    register_command_observer(failing_observer)
+    register_command_observer(executions.append)
+    try:
+        stdout, _stderr = run_command('echo', 'test')
+        assert stdout == b'test\n'
+        with pytest.raises(CommandError):
+            run_command(*INVALID_ARGS)
+    finally:
+        unregister_command_observer(failing_observer)
+        unregister_command_observer(executions.append)
+
+    assert len(executions) == 2
+    errors = [record for record in caplog.records if record.name == 'sys_toolkit.subprocess']
+    assert len(errors) == 2
+    assert all(record.exc_info[0] is ValueError for record in errors)
+
+
+def test_subprocess_command_statistics() -> None:
+    """
+    Test command statistics aggregator
+    """
+    statistics = CommandStatistics()
+    register_command_observer(statistics)
+    try:
+        for _count in range(3):
+            run_command(VALID_COMMAND)
+        with pytest.raises(CommandError):
+            run_command(*INVALID_ARGS)
+        run_command('sleep', '0.1')
+    finally:
+        unregister_command_observer(statistics)
+
+    histogram = statistics[VALID_COMMAND]
+    assert histogram.count == 4
+    assert histogram.errors == 1
+    assert sum(histogram.counts) == 4
+    assert histogram.min_time <= histogram.average_time <= histogram.max_time
+    assert histogram.percentile(50) <= histogram.percentile(99)
+    assert statistics['sleep'].percentile(50) >= 0.1
+
+    data = statistics.as_dict()
+    assert sorted(data.keys()) == ['sleep', VALID_COMMAND]
+    assert data['sleep']['count'] == 1
+    assert sum(data[VALID_COMMAND]['buckets'].values()) == 4
+
+
+def test_subprocess_command_resolver(monkeypatch) -> None:
+    """
+    Test resolving commands with cached executables lookup
+    """
+    monkeypatch.setattr(COMMAND_RESOLVER, 'enabled', True)
+    executable = str(Executables().get(VALID_COMMAND))
+    assert COMMAND_RESOLVER.resolve((VALID_COMMAND, '-a')) == executable
+    assert COMMAND_RESOLVER.resolve((executable,)) is None
+    assert COMMAND_RESOLVER.__get_executables__() is COMMAND_RESOLVER.__get_executables__()
+
+    res = run(VALID_COMMAND, stdout=subprocess.PIPE)
+    assert res.args == (VALID_COMMAND,)
+    assert res.stdout != b''
+    stdout, _stderr = Pipeline([VALID_COMMAND], ['cat']).run()
+    assert stdout == res.stdout
+
+    # Resolved command is executed with argv[0] given by the caller
+    if Path('/proc/self/cmdline').is_file():
+        for rlimits in (None, ResourceLimits(nice=1)):
+            res = run('cat', '/proc/self/cmdline', stdout=subprocess.PIPE, rlimits=rlimits)
+            assert res.stdout.split(b'\0')[0] == b'cat'
+
+
+def test_subprocess_command_resolver_missing_command(monkeypatch) -> None:
+    """
+    Test resolving missing commands with cached executables lookup raises CommandError
+    without running the command
+    """
+    monkeypatch.setattr(COMMAND_RESOLVER, 'enabled', True)
+    mock_popen = MockCalledMethod()
+    monkeypatch.setattr('sys_toolkit.subprocess.AccountedPopen', mock_popen)
+    with pytest.raises(CommandError):
+        run_command('49FC61D4-F21B-4A0D-941D-9CC52F163CFF')
+
+    env = os.environ.copy()
+    env['PATH'] = '/foo:/bar'
+    with pytest.raises(CommandError):
+        run_command(VALID_COMMAND, env=env)
+    assert mock_popen.call_count == 0
+
+
+def test_subprocess_command_resolver_new_command(monkeypatch, tmpdir) -> None:
+    """
+    Test resolving a command installed after executables were loaded
+    """
+    monkeypatch.setattr(COMMAND_RESOLVER, 'enabled', True)
+    directory = Path(tmpdir.strpath)
+    monkeypatch.setenv('PATH', os.pathsep.join((str(directory), os.environ['PATH'])))
+    assert Executables().get('test-command') is None
+
+    command = directory.joinpath('test-command')
+    command.write_text('#!/bin/sh\necho test\n', encoding=DEFAULT_ENCODING)
+    command.chmod(int('0755', 8))
+    # Directory mtime resolution may be coarse, force detection of the change
+    os.utime(directory, ns=(0, 0))
+    stdout, _stderr = run_command_lineoutput('test-command')
+    assert stdout == ['test']
+
+
+def test_subprocess_run_command_streaming_lines() -> None:
+    """
+    Test streaming stdout and stderr lines of a command to separate callbacks
+    """
+    stdout = []
+    stderr = []
+    script = 'for i in 1 2 3; do echo out$i; echo err$i >&2; done; printf partial'
+    res = run_command_streaming(
+        'sh', '-c', script,
+        stdout_callback=stdout.append,
+        stderr_callback=stderr.append,
+        buffer_size=4,
+    )
+    assert res.returncode == 0
+    assert res.stdout is None
+    assert isinstance(res.rusage, ResourceUsage)
+    assert stdout == ['out1', 'out2', 'out3', 'partial']
+    assert stderr == ['err1', 'err2', 'err3']
+
+
+def test_subprocess_run_command_streaming_chunks() -> None:
+    """
+    Test streaming large output in chunks without deadlocking on stderr
+    """
+    chunks = []
+    script = 'head -c 1000000 /dev/zero; head -c 1000000 /dev/zero >&2'
+    executions = []
+    register_command_observer(executions.append)
+    try:
+        run_command_streaming(
+            'sh', '-c', script,
+            stdout_callback=lambda chunk: chunks.append(len(chunk)),
+            lines=False,
+        )
+    finally:
+        unregister_command_observer(executions.append)
+    assert sum(chunks) == 1000000
+    assert max(chunks) <= 2**16
+    assert executions[0].stdout_size == 1000000
+    assert executions[0].stderr_size == 1000000
+
+
+def test_subprocess_run_command_streaming_encodings() -> None:
+    """
+    Test streaming lines with mixed encodings
+    """
+    command = ('cat', MIXED__ENCODINGS_FILE.absolute())
+    with pytest.raises(CommandError):
+        run_command_streaming(*command, stdout_callback=lambda line: None)
+    lines = []
+    run_command_streaming(*command, stdout_callback=lines.append, encodings=[DEFAULT_ENCODING, 'latin1'])
+    assert len(lines) == 2
+
+
+def test_subprocess_run_command_streaming_errors() -> None:
+    """
+    Test errors running commands with streaming output
+    """
+    with pytest.raises(CommandError):
+        run_command_streaming(*INVALID_ARGS)
+    run_command_streaming(*INVALID_ARGS, expected_return_codes=[1, 2])
+    with pytest.raises(CommandError):
+        run_command_streaming('49FC61D4-F21B-4A0D-941D-9CC52F163CFF')
+
+    def callback(line):
+        raise ValueError(line)
+
+    with pytest.raises(CommandError):
+        run_command_streaming('yes', stdout_callback=callback)
+
+    start = time.monotonic()
+    with pytest.raises(CommandError):
+        run_command_streaming('sh', '-c', 'sleep 30 & wait', timeout=0.5, new_session=True)
+    assert time.monotonic() - start < 10
+
+    # Command closing its output streams is killed when the timeout is exceeded
+    start = time.monotonic()
+    with pytest.raises(CommandError):
+        run_command_streaming('sh', '-c', 'exec >&- 2>&-; sleep 30', timeout=0.5)
+    assert time.monotonic() - start < 10
+
+
+def test_subprocess_resource_limits_cpu() -> None:
+    """
+    Test command exceeding CPU time limit is reported
+    """
+    with pytest.raises(CommandError) as error:
+        run_command('sh', '-c', 'while :; do :; done', rlimits={'cpu': 1}, timeout=30)
+    assert 'exceeded resource limit cpu=1' in str(error.value)
+
+
+def test_subprocess_resource_limits_file_size(tmpdir) -> None:
+    """
+    Test command exceeding file size limit is reported
+    """
+    path = Path(tmpdir.strpath, 'output')
+    limits = ResourceLimits(file_size=1000)
+    with pytest.raises(CommandError) as error:
+        run('dd', 'if=/dev/zero', f'of={path}', 'bs=100000', 'count=1', rlimits=limits)
+    assert 'exceeded resource limit file_size=1000' in str(error.value)
+    assert path.stat().st_size == 1000
+
+    res = run('sh', '-c', 'exit 3', rlimits=limits, expected_return_codes=[3])
+    assert res.limit_exceeded is None
+
+    # Shell exit code for child killed by signal is not interpreted as exceeded limit
+    res = run('sh', '-c', f'head -c 100000 /dev/zero > {path}', rlimits=limits, expected_return_codes=[153])
+    assert res.limit_exceeded is None
+    res = run('sh', '-c', 'exit 153', rlimits=limits, expected_return_codes=[153])
+    assert res.limit_exceeded is None
+
+    output = run_command(
+        'dd', 'if=/dev/zero', f'of={path}', 'bs=100000', 'count=1',
+        rlimits=limits,
+        expected_return_codes=[-signal.SIGXFSZ]
+    )
+    assert output.limit_exceeded == 'file_size=1000'
+
+
+def test_subprocess_resource_limits_applied() -> None:
+    """
+    Test resource limits, nice and ionice settings are applied to commands
+    """
+    limits = ResourceLimits(open_files=64, address_space=2**32, nice=5)
+    assert repr(limits) == f'address_space={2**32} open_files=64 nice=5'
+    stdout, _stderr = run_command_lineoutput('sh', '-c', 'ulimit -n; nice', rlimits=limits)
+    assert stdout == ['64', str(os.nice(0) + 5)]
+
+    lines = []
+    run_command_streaming('sh', '-c', 'ulimit -n', rlimits={'open_files': 32}, stdout_callback=lines.append)
+    assert lines == ['32']
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='ionice is supported only on linux')
+def test_subprocess_resource_limits_ionice() -> None:
+    """
+    Test ionice settings are applied to commands
+    """
+    stdout, _stderr = run_command_lineoutput('ionice', rlimits={'ionice': 'idle'})
+    assert stdout == ['idle']
+    stdout, _stderr = run_command_lineoutput('ionice', rlimits={'ionice': 'best-effort', 'ionice_level': 7})
+    assert stdout == ['best-effort: prio 7']
+
+
+def test_subprocess_resource_limits_cgroup(tmpdir) -> None:
+    """
+    Test commands are moved to cgroup by writing to cgroup.procs
+    """
+    with pytest.raises(CommandError):
+        ResourceLimits(cgroup=tmpdir.strpath)
+    procs = Path(tmpdir.strpath, 'cgroup.procs')
+    procs.touch()
+    run_command(VALID_COMMAND, rlimits={'cgroup': tmpdir.strpath})
+    assert procs.read_text(encoding=DEFAULT_ENCODING) == '0'
+
+
+def test_subprocess_resource_limits_errors() -> None:
+    """
+    Test invalid resource limits
+    """
+    with pytest.raises(CommandError):
+        run_command(VALID_COMMAND, rlimits={'invalid': 1})
+    with pytest.raises(CommandError):
+        run_command(VALID_COMMAND, rlimits=[1])
+    with pytest.raises(CommandError):
+        ResourceLimits(ionice='invalid')
+    with pytest.raises(CommandError):
+        ResourceLimits(ionice='idle', ionice_level=8)
+    with pytest.raises(CommandError):
+        ResourceLimits(open_files=2**62)
+    with pytest.raises(CommandError) as error:
+        run_command('49FC61D4-F21B-4A0D-941D-9CC52F163CFF', rlimits={'open_files': 64})
+    assert 'FileNotFoundError' in str(error.value)
+
+
+def test_subprocess_resource_limits_ionice_unknown_architecture(monkeypatch) -> None:
+    """
+    Test ionice is rejected on architectures without known ioprio_set system call number
+    """
+    monkeypatch.setattr('platform.machine', lambda: 'unknown')
+    with pytest.raises(CommandError):
+        ResourceLimits(ionice='idle')
+
+
+def test_subprocess_resource_limits_threads() -> None:
+    """
+    Test commands with resource limits can be run concurrently from threads
+    """
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(
+            lambda _index: run_command_lineoutput('sh', '-c', 'ulimit -n', rlimits={'open_files': 48}),
+            range(16)
+        ))
+    assert all(stdout == ['48'] for stdout, _stderr in results)
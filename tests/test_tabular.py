@@ -0,0 +1,133 @@
+#
+# Copyright (C) 2020-2023 by Ilkka Tuohela <hile@iki.fi>
+#
+# SPDX-License-Identifier: BSD-3-Clause
+#
+"""
+Unit tests for sys_toolkit.tabular module
+"""
+import pytest
+
+from sys_toolkit.exceptions import FileParserError
+from sys_toolkit.process import parse_datetime
+from sys_toolkit.tabular import Column, TableLayout, TableRecord
+
+from .conftest import MOCK_DATA
+
+MOCK_DF_OUTPUT = """Filesystem     1K-blocks     Used Available Use% Mounted on
+/dev/sda1       41152736 10486428  28553216  27% /
+tmpfs            8192000        0   8192000   0% /dev/shm
+/dev/sdb1      103081248 60213204  37608780  62% /mnt/my  data
+"""
+
+
+def df_layout() -> TableLayout:
+    """
+    Return layout for parsing df output
+    """
+    return TableLayout(
+        'filesystem',
+        Column('blocks', int),
+        Column('used', int),
+        Column('available', int),
+        Column('capacity', lambda value: int(value.rstrip('%'))),
+        Column('mountpoint', rest=True),
+        header_pattern=r'^Filesystem\s',
+        record_name='DiskUsage',
+    )
+
+
+def test_tabular_layout_records() -> None:
+    """
+    Test parsing df output as records
+    """
+    layout = df_layout()
+    assert repr(layout) == 'filesystem blocks used available capacity mountpoint'
+    records = list(layout.records(MOCK_DF_OUTPUT.splitlines()))
+    assert len(records) == 3
+    for record in records:
+        assert isinstance(record, TableRecord)
+        assert record.__class__.__name__ == 'DiskUsage'
+        assert not hasattr(record, '__dict__')
+        assert isinstance(repr(record), str)
+
+    assert records[0].filesystem == '/dev/sda1'
+    assert records[0].blocks == 41152736
+    assert records[0].capacity == 27
+    assert records[0].mountpoint == '/'
+    # Rest of line column keeps original whitespace
+    assert records[2].mountpoint == '/mnt/my  data'
+    assert records[2].as_dict()['used'] == 60213204
+    assert records[0] == layout.parse_line(MOCK_DF_OUTPUT.splitlines()[1])
+    assert records[0] != records[1]
+    assert len({records[0], records[1]}) == 2
+
+
+def test_tabular_layout_columns() -> None:
+    """
+    Test parsing df output as columnar lists from an iterator of lines
+    """
+    layout = df_layout()
+    columns = layout.as_columns(iter(MOCK_DF_OUTPUT.splitlines()))
+    assert list(columns.keys()) == list(layout.names)
+    assert columns['available'] == [28553216, 8192000, 37608780]
+    assert columns['mountpoint'] == ['/', '/dev/shm', '/mnt/my  data']
+
+
+def test_tabular_layout_multiple_tokens_and_short_lines() -> None:
+    """
+    Test parsing columns with multiple tokens and lines with missing columns
+    """
+    layout = TableLayout(
+        Column('started', parse_datetime, tokens=5),
+        Column('pid', int),
+        Column('command', rest=True),
+        header=True,
+    )
+    lines = [
+        'STARTED PID COMMAND',
+        'Fri Nov 19 18:31:26 2021 1 /sbin/init splash',
+        '',
+        'Fri Nov 19 18:31:26 2021 two',
+        'invalid',
+    ]
+    values = list(layout.values(lines))
+    assert len(values) == 3
+    assert values[0][0].year == 2021
+    assert values[0][1:] == [1, '/sbin/init splash']
+    # Values failing conversion are kept as strings
+    assert values[1][1:] == ['two', None]
+    assert values[2] == [None, None, None]
+
+
+def test_tabular_layout_process_list() -> None:
+    """
+    Test parsing process list data file with a layout
+    """
+    layout = TableLayout(
+        Column('started', parse_datetime, tokens=5),
+        *[Column(name, int) for name in ('ppid', 'pid', 'ruid', 'rgid')],
+        'ruser',
+        header=True,
+    )
+    with MOCK_DATA.joinpath('processes.linux.txt').open('r', encoding='utf-8') as handle:
+        records = list(layout.records(handle))
+    assert len(records) == 220
+    assert records[0].pid == 1
+    assert records[0].ruser == 'root'
+
+
+def test_tabular_layout_errors() -> None:
+    """
+    Test errors in table layout definitions
+    """
+    with pytest.raises(FileParserError):
+        TableLayout()
+    with pytest.raises(FileParserError):
+        TableLayout(Column('rest', rest=True), 'name')
+    with pytest.raises(FileParserError):
+        TableLayout('name', 'name')
+    with pytest.raises(FileParserError):
+        Column('invalid name')
+    with pytest.raises(FileParserError):
+        Column('name', tokens=0)